@@ -1,8 +1,12 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import argparse
+import sys
 import zipfile
+import zlib
 from contextlib import contextmanager
+from multiprocessing import Pool
 from tempfile import mkdtemp
 from path import path
 
@@ -12,6 +16,14 @@ PROJECT_FILES = [
     'README.md', 'changelog.txt',
 ]
 
+# files that are already compressed, so deflating them only wastes time
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.sgz', '.zip')
+# all entries get the same time and permissions, so that building the same
+# files always gives the same package
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+FILE_ATTRIBUTES = 0o100644 << 16
+DIR_ATTRIBUTES = (0o40755 << 16) | 0x10
+
 
 @contextmanager
 def tmp():
@@ -58,31 +70,132 @@ def clean(directory):
         f.rmtree_p()
 
 
-def zip_file(to_zip, zip_name):
-    """Zip the given file without compression.
+def zip_info(name, attributes):
+    """Get the ZipInfo of an empty entry, with the fixed time."""
+    info = zipfile.ZipInfo(name, ZIP_DATE)
+    info.create_system = 3  # unix, so that the permissions are used
+    info.external_attr = attributes
+    info.file_size = info.compress_size = info.CRC = 0
+    return info
 
-    If a directory is specified, it will be recursively zipped.
 
-    :param path.path to_zipped: what is to be zipped
-    :param str zip_name: the name of the resulting archive
-    """
-    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_STORED) as zf:
-        for f in to_zip.walk():
-            zf.write(f, to_zip.relpathto(f))
+def compress_entry(entry):
+    """Compress a single file of the package.
+
+    Files that are already compressed, and ones that deflating wouldn't make
+    smaller, are stored as they are.
 
+    :param tuple entry: the (file, name in the archive) of the file
+    :returns: the ZipInfo of the file, and its (compressed) contents
+    """
+    filename, name = entry
+    info = zip_info(name, FILE_ATTRIBUTES)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    info.file_size = len(data)
+    info.CRC = zlib.crc32(data) & 0xffffffff
+
+    info.compress_type = zipfile.ZIP_STORED
+    if not name.lower().endswith(STORED_EXTENSIONS):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            info.compress_type = zipfile.ZIP_DEFLATED
+            data = compressed
+    info.compress_size = len(data)
+    return info, data
+
+
+class PackageZipFile(zipfile.ZipFile):
+
+    """An archive that takes entries which have already been compressed.
+
+    `ZipFile` can only compress entries itself, one at a time, so this
+    writes the local header and data the way Python 2.7's `writestr` does.
+    That means using the internals of that version's `ZipFile`, which is
+    why other versions are refused.
+    """
 
-def make_package(package_name):
+    def __init__(self, *args, **kwargs):
+        if sys.version_info[:2] != (2, 7):
+            raise RuntimeError('PackageZipFile needs Python 2.7')
+        super(PackageZipFile, self).__init__(*args, **kwargs)
+
+    def write_compressed(self, info, data):
+        """Add an entry whose data has already been compressed.
+
+        :param zipfile.ZipInfo info: the entry, with its sizes and CRC set
+        :param str data: the entry's (compressed) contents
+        :raises zipfile.LargeZipFile: if the entry needs ZIP64 extensions, \
+            but they aren't allowed
+        """
+        info.header_offset = self.fp.tell()
+        self._writecheck(info)
+        self._didModify = True
+        # the sizes are known up front, so only large entries need ZIP64
+        zip64 = self._allowZip64 and (
+            info.file_size > zipfile.ZIP64_LIMIT or
+            info.compress_size > zipfile.ZIP64_LIMIT)
+        self.fp.write(info.FileHeader(zip64))
+        self.fp.write(data)
+        self.filelist.append(info)
+        self.NameToInfo[info.filename] = info
+
+
+def zip_file(to_zip, zip_name, processes=None):
+    """Zip the given directory, compressing its files in parallel.
+
+    Entries are added in the order of their names, with a fixed time and
+    permissions, so that zipping the same files always gives the same bytes.
+
+    :param path.path to_zip: the directory to be zipped
+    :param str zip_name: the name of the resulting archive
+    :param int processes: how many processes to use. 1 compresses \
+        everything in this process, None uses all cores
+    """
+    entries = sorted(
+        (to_zip.relpathto(f) + ('/' if f.isdir() else ''), f)
+        for f in to_zip.walk()
+    )
+    files = [(f, name) for name, f in entries if not name.endswith('/')]
+    if processes == 1:
+        compressed = iter(map(compress_entry, files))
+    else:
+        pool = Pool(processes)
+        compressed = pool.imap(compress_entry, files, chunksize=4)
+
+    try:
+        with PackageZipFile(zip_name, 'w') as zf:
+            for name, _ in entries:
+                if name.endswith('/'):
+                    zf.write_compressed(zip_info(name, DIR_ATTRIBUTES), '')
+                else:
+                    zf.write_compressed(*next(compressed))
+    finally:
+        if processes != 1:
+            pool.terminate()
+            pool.join()
+
+
+def make_package(package_name, processes=None):
     """Make a package out of the directory where this script resides.
 
     :param str package_name: the name of the resulting package
+    :param int processes: how many processes should compress files
     """
     with tmp() as temp:
         repo = path(__file__).parent
 
         copy(PROJECT_FILES, repo, temp / package_name)
         clean(temp)
-        zip_file(temp, '%s.zip' % package_name)
+        zip_file(temp, '%s.zip' % package_name, processes)
 
 
-make_package('script.game.tsumego')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Package the addon.')
+    parser.add_argument(
+        '-j', '--processes', type=int, default=None,
+        help='how many processes to use (default: all cores)',
+    )
+    make_package('script.game.tsumego', parser.parse_args().processes)
 
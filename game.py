@@ -6,6 +6,7 @@ import thread
 import sys
 
 import traceback
+from functools import wraps
 
 import xbmcaddon
 import xbmcgui
@@ -15,6 +16,8 @@ from xbmcgui import (
     ACTION_SHOW_INFO,
 )
 
+from resources.lib.browser import ProblemBrowser
+from resources.lib.caches import registry
 from resources.lib.goban import GobanGrid
 from resources.lib.log_utils import log, _
 
@@ -41,11 +44,14 @@ class ControlIds(object):
 
 class KeyCodes(object):
     a = 61505
+    b = 61506
     d = 61508
     g = 61511
+    j = 61514
     l = 61516
     n = 61518
     o = 61519
+    s = 61523
     t = 61524
     u = 61515
     v = 61526
@@ -54,7 +60,24 @@ class KeyCodes(object):
     z = 61530
 
 
+def flushes_grid(handler):
+    """Send all changes buffered by the grid once the handler is done.
+
+    All GUI changes made while handling an event are collected by the grid,
+    so that they can be sent to Kodi in one go.
+    """
+    @wraps(handler)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return handler(self, *args, **kwargs)
+        finally:
+            if getattr(self, 'grid', None):
+                self.grid.flush()
+    return wrapper
+
+
 class Game(xbmcgui.WindowXML):
+    @flushes_grid
     def onInit(self):
         log('initialising')
         # get controls
@@ -67,6 +90,7 @@ class Game(xbmcgui.WindowXML):
         # init the grid
         self.grid = self.get_grid()
 
+    @flushes_grid
     def onAction(self, action):
         """Handle the given action.
 
@@ -84,6 +108,12 @@ class Game(xbmcgui.WindowXML):
             elif action.getButtonCode() == KeyCodes.n:
                 self.solution_control.setLabel(_('show_solution'))
                 self.grid.next()
+            elif action.getButtonCode() == KeyCodes.b:
+                self.browse()
+            elif action.getButtonCode() == KeyCodes.s:
+                self.browse(search=True)
+            elif action.getButtonCode() == KeyCodes.j:
+                self.jump_to_move()
         except Exception:
             traceback.print_exc()
         super(Game, self).onAction(action)
@@ -91,6 +121,7 @@ class Game(xbmcgui.WindowXML):
     def onFocus(self, control_id):
         pass
 
+    @flushes_grid
     def onClick(self, control_id):
         if control_id == ControlIds.restart:
             self.restart_game()
@@ -127,7 +158,7 @@ class Game(xbmcgui.WindowXML):
 
     def restart_game(self):
         self.solution_control.setLabel(_('show_solution'))
-        self.grid.load(self.grid.sgf)
+        self.grid.restart()
         self.grid.problem_solved(False)
         self.grid.update_messages()
 
@@ -142,11 +173,39 @@ class Game(xbmcgui.WindowXML):
             self.grid.load_problems(problems_dir)
             self.grid.next()
 
+    def browse(self, search=False):
+        """Let the user choose the next problem.
+
+        :param boolean search: whether to pick from the problems whose \
+            comments match a query, rather than from a rank
+        """
+        try:
+            browser = self.browser
+        except AttributeError:
+            browser = self.browser = ProblemBrowser(self.grid.problems)
+        # the problems get replaced when the problems folder is changed
+        browser.problems = self.grid.problems
+        problem = browser.search() if search else browser.browse()
+        if problem:
+            self.solution_control.setLabel(_('show_solution'))
+            self.grid.show_problem(problem)
+
+    def jump_to_move(self):
+        """Ask which move of the current line should be shown, and go there."""
+        move_number = xbmcgui.Dialog().numeric(
+            0, _('jump_to_move'), str(self.grid.move_number))
+        if move_number:
+            self.grid.jump(int(move_number))
+
     def exit(self):
         dialog = xbmcgui.Dialog()
         confirmed = dialog.yesno(_('exit_head'), _('exit_text'))
         if confirmed:
+            if getattr(self, 'browser', None):
+                self.browser.close()
             self.grid.remove_controls(self)
+            for line in registry.report():
+                log(line)
             self.close()
 
     def clock_ticker(self):
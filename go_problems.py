@@ -6,6 +6,9 @@ import time
 from path import path
 from lxml import etree
 
+NEWEST_ID_URL = 'http://www.goproblems.com/api/dt_problems.php?iColumns=9&sColumns=id%2C%2Cprobauthorid%2Cprobauthor%2Cgenre%2Celo%2Cdate&iDisplayStart=0&iDisplayLength=1&sSortDir_0=desc'
+SYNC_FILE = 'sync.json'
+
 
 def parse_problem(html):
     """Parse the given HTML for problem components.
@@ -41,13 +44,20 @@ def check_directory(checked_dir):
     return checked_dir
 
 
-def get_problem(base_dir, problem_id, goproblems_url, save_html=False):
+def get_problem(base_dir, problem_id, goproblems_url, save_html=False,
+                session=None, cache=None):
     """Get the given problem.
 
+    If a cache entry is provided, the problem is only downloaded if it has
+    changed since it was last fetched, and the entry gets updated.
+
     :param str base_dir: the base dir where the problem is to be saved
     :param int problem_id: the id of the problem to be downloaded
     :param str goproblems_url: the url where the problems can be found
     :param boolean save_html: save the downloaded HTML
+    :param requests.Session session: the session to be used, if any
+    :param dict cache: the cache entry of this problem, if any
+    :returns: whether the problem was saved
     """
     if save_html:
         html_dir = check_directory(path(base_dir) / 'html')
@@ -56,14 +66,23 @@ def get_problem(base_dir, problem_id, goproblems_url, save_html=False):
             print "already downloaded %d" % problem_id
         return False
 
-    response = requests.get(goproblems_url % problem_id)
+    headers = {}
+    if cache is not None:
+        if cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+
+    response = (session or requests).get(goproblems_url % problem_id, headers=headers)
+    if response.status_code == 304:
+        return False
 
     if save_html:
         with open(html_file, 'w') as f:
             f.write(response.text)
 
     if not response.ok:
-        raise requests.HTTPError(response.text)
+        raise requests.HTTPError(response.text, response=response)
 
     problem, difficulty, sgf, rating = parse_problem(response.text)
 
@@ -73,19 +92,34 @@ def get_problem(base_dir, problem_id, goproblems_url, save_html=False):
     if rating:
         problem_name = '[%s]' % rating + problem_name
 
-    with open(problem_dir / problem_name, 'w') as f:
+    problem_file = problem_dir / problem_name
+    with open(problem_file, 'w') as f:
         f.write(sgf)
+
+    if cache is not None:
+        # the rating is part of the name, so a changed problem can move
+        old_file = cache.get('problem_file')
+        if old_file and path(base_dir) / old_file != problem_file:
+            (path(base_dir) / old_file).remove_p()
+        cache.update({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'problem_file': str(path(base_dir).relpathto(problem_file)),
+        })
     return True
 
 
-def get_newest_id():
+def get_newest_id(session=None, api_url=NEWEST_ID_URL):
     """Get the id of the newest id on the website.
 
     As the problem ids appear to be incrementing with time, a simple
     way of getting all problems is to get the newest id (which is also
     the highest) and check all numbers from 0 up to that number.
+
+    :param requests.Session session: the session to be used, if any
+    :param str api_url: the url of the problems list
     """
-    response = requests.get('http://www.goproblems.com/api/dt_problems.php?iColumns=9&sColumns=id%2C%2Cprobauthorid%2Cprobauthor%2Cgenre%2Celo%2Cdate&iDisplayStart=0&iDisplayLength=1&sSortDir_0=desc')
+    response = (session or requests).get(api_url)
     try:
         return json.loads(response.text)['aaData'][0][0]
     except (TypeError, ValueError, KeyError) as e:
@@ -118,3 +152,122 @@ def download_all_problems(base_dir='problems',
         except requests.HTTPError as e:
             print "couldn't parse problem no. %d: html is %s" % (problem_id, e.message)
 
+
+
+class SyncState(object):
+    """What was fetched by previous syncs of a problems mirror."""
+
+    def __init__(self, newest_id=-1, pages=None, failed=None):
+        """Initialise the state.
+
+        :param int newest_id: the highest problem id that was fetched
+        :param dict pages: {problem id: cache entry}, where each entry has \
+            the ETag and Last-Modified headers of the problem's page, and \
+            the file it was saved to
+        :param list failed: the ids of new problems that couldn't be \
+            fetched because of network or server errors, to be retried
+        """
+        self.newest_id = newest_id
+        self.pages = pages or {}
+        self.failed = failed or []
+
+    @classmethod
+    def load(cls, state_file):
+        """Load the state from the given file, or return an empty one."""
+        try:
+            with open(state_file) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return cls()
+        return cls(data.get('newest_id', -1), data.get('pages'), data.get('failed'))
+
+    def save(self, state_file):
+        """Save the state to the given file."""
+        with open(state_file, 'w') as f:
+            json.dump({
+                'newest_id': self.newest_id,
+                'pages': self.pages,
+                'failed': self.failed,
+            }, f)
+
+
+def make_session(pool_size=4):
+    """Get a session that keeps its connections alive between requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def sync_problems(base_dir='problems', base_url='http://www.goproblems.com/%d',
+                  api_url=NEWEST_ID_URL, revalidate=True, delay=2.0, save_every=100):
+    """Bring a mirror of the goproblems.com problems up to date.
+
+    Problems newer than any fetched by previous syncs are downloaded first,
+    along with any new ones that previous syncs couldn't get because of
+    network or server errors. After that all problems that were fetched before are checked with
+    conditional requests, so only the ones that changed are downloaded again.
+
+    :param str base_dir: where the problems are saved
+    :param str base_url: the url where the problems can be found
+    :param str api_url: the url of the problems list
+    :param boolean revalidate: whether to check for changed problems
+    :param float delay: the longest pause after each download, in seconds
+    :param int save_every: how many problems to check between saving the state
+    :returns: a (new problems, changed problems) tuple
+    """
+    base_dir = check_directory(path(base_dir))
+    state_file = base_dir / SYNC_FILE
+    state = SyncState.load(state_file)
+    session = make_session()
+
+    newest_id = get_newest_id(session, api_url)
+    known_ids = sorted(int(problem_id) for problem_id in state.pages)
+    new_ids = sorted(
+        set(state.failed).union(xrange(state.newest_id + 1, newest_id + 1)))
+
+    counts = {'new': 0, 'changed': 0}
+
+    def fetch(problem_id, count):
+        # returns whether the problem is done with (fetched, or missing),
+        # rather than to be tried again. Only problems that were actually
+        # saved get remembered
+        entry = dict(state.pages.get(str(problem_id), {}))
+        try:
+            if get_problem(base_dir, problem_id, base_url,
+                           session=session, cache=entry):
+                state.pages[str(problem_id)] = entry
+                counts[count] += 1
+                time.sleep(random.uniform(0, delay))
+        except (ValueError, AttributeError) as e:
+            # missing problems get an error page instead
+            print "couldn't parse problem no. %d: %r" % (problem_id, e)
+        except requests.HTTPError as e:
+            print "couldn't get problem no. %d: %s" % (problem_id, e)
+            # server errors can go away, but the rest won't
+            return e.response is not None and e.response.status_code < 500
+        except requests.RequestException as e:
+            print "couldn't get problem no. %d: %s" % (problem_id, e)
+            return False
+        return True
+
+    for i, problem_id in enumerate(new_ids):
+        if fetch(problem_id, 'new'):
+            if problem_id in state.failed:
+                state.failed.remove(problem_id)
+            state.newest_id = max(state.newest_id, problem_id)
+        elif problem_id not in state.failed:
+            state.failed.append(problem_id)
+        if i % save_every == 0:
+            state.save(state_file)
+    state.save(state_file)
+
+    if revalidate:
+        for i, problem_id in enumerate(known_ids):
+            fetch(problem_id, 'changed')
+            if i % save_every == 0:
+                state.save(state_file)
+        state.save(state_file)
+
+    return counts['new'], counts['changed']
@@ -0,0 +1,269 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Offline tools for maintaining a tsumego library."""
+
+import argparse
+
+from path import path
+
+from resources.lib.board import Goban
+from resources.lib.caches import DEFAULT_BUDGET, MB, registry
+from resources.lib.comments import COMMENTS_FILE, CommentIndex
+from resources.lib.library import benchmark_loading, iter_problem_files
+from resources.lib.problems import Problems
+from resources.lib.refutations import refute_library
+from resources.lib.server import DEFAULT_PORT, ProblemServer
+from resources.lib.sessions import EVENTS, replay_session
+from resources.lib.stats import STATS_FILE, ProblemStats
+from resources.lib.storage import compress_library
+from resources.lib.verify import REPORT_FILE, save_report, verify_library
+
+
+def index_positions(args):
+    """Build the transposition index of the library."""
+    # numpy is only needed here
+    from resources.lib.positions import INDEX_FILE, PositionIndex
+
+    index = PositionIndex.build(args.problems_dir, args.processes)
+    output = args.output or path(args.problems_dir) / INDEX_FILE
+    index.save(output)
+    print "indexed %d positions from %d problems (%d transpositions)" % (
+        len(index.positions), len(index.problems), len(index.transpositions())
+    )
+
+
+def dedup_problems(args):
+    """Find problems that are rotated, mirrored or colour swapped copies."""
+    # numpy is only needed here, so don't require it for the other commands
+    from resources.lib.dedup import find_duplicates, save_duplicates
+
+    duplicates = find_duplicates(args.problems_dir, args.processes)
+    save_duplicates(args.problems_dir, duplicates)
+    print "found %d groups of duplicates (%d problems to skip)" % (
+        len(duplicates), sum(len(files) - 1 for files in duplicates.values())
+    )
+
+
+def collect_stats(args):
+    """Collect the tree statistics of all problems."""
+    stats = ProblemStats.collect(args.problems_dir, args.processes)
+    stats.save(args.output or path(args.problems_dir) / STATS_FILE)
+    print "collected stats of %d problems" % len(stats)
+
+
+def verify_problems(args):
+    """Replay all problems, reporting broken moves and solutions."""
+    report = verify_library(args.problems_dir, args.processes)
+    save_report(report, args.output or path(args.problems_dir) / REPORT_FILE)
+    print "found issues in %d problems" % len(report)
+
+
+def refute_problems(args):
+    """Search for refutations of wrong moves missing from the problems."""
+    added = refute_library(
+        args.problems_dir, args.output_dir, args.time, args.processes)
+    print "added %d refutations" % added
+
+
+def compress_problems(args):
+    """Compress all problems with a dictionary trained on the library."""
+    before, after = compress_library(
+        iter_problem_files(args.problems_dir), args.problems_dir,
+        args.sample, args.keep,
+    )
+    print "compressed %d bytes into %d (%.1fx)" % (
+        before, after, float(before) / (after or 1))
+
+
+def sync_mirror(args):
+    """Download new and changed problems from goproblems.com."""
+    # requests and lxml are only needed here
+    from go_problems import sync_problems
+
+    new, changed = sync_problems(
+        args.problems_dir, revalidate=not args.new_only, delay=args.delay)
+    print "downloaded %d new and %d changed problems" % (new, changed)
+
+
+def benchmark_parsers(args):
+    """Compare how quickly problems are loaded by gomill and the small parser."""
+    problem_files = iter_problem_files(args.problems_dir)
+    timings, fallbacks = benchmark_loading(problem_files, args.repeat)
+    print "loaded %d problems, %d of them through gomill" % (
+        len(problem_files), fallbacks)
+    baseline = timings[0][1]
+    for name, seconds, failures in timings:
+        print "%-8s %8.3fs %6.1fx (%d failed)" % (
+            name, seconds, baseline / (seconds or 1e-9), failures)
+
+
+def rate_problems(args):
+    """Fit the difficulty of problems to the attempts of players."""
+    # numpy is only needed here
+    from resources.lib.ratings import rate_library
+
+    players = rate_library(args.problems_dir, args.attempts)
+    for attempts, (level, deviation) in zip(args.attempts, players):
+        print "%s: level %.1f (+/- %.1f)" % (attempts, level, deviation)
+
+
+def index_comments(args):
+    """Update the full text index of the problems' comments."""
+    index = CommentIndex(args.output or path(args.problems_dir) / COMMENTS_FILE)
+    changed, removed = index.update(args.problems_dir, args.processes)
+    print "indexed %d new or changed problems, removed %d (%d in total)" % (
+        changed, removed, len(index))
+    for problem_file in index.search(args.search) if args.search else []:
+        print problem_file
+    index.close()
+
+
+def serve_problems(args):
+    """Serve the library to Kodi boxes over HTTP."""
+    server = ProblemServer((args.host, args.port), Problems(args.problems_dir))
+    print "serving %s at %s" % (args.problems_dir, server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def replay_sessions(args):
+    """Replay recorded sessions as fast as possible, timing every event."""
+    registry.budget = args.cache_size * MB
+    problems = Problems(args.problems_dir)
+    for log_file in args.sessions:
+        stats = replay_session(log_file, problems, args.search_time)
+        print "%s: %.0fms (%d replies diverged, %d events skipped)" % (
+            log_file, stats.total, stats.diverged, stats.skipped)
+        print "  %-8s %5s %12s %12s %12s" % (
+            'event', 'count', 'recorded', 'replayed', 'slowest')
+        for event in EVENTS:
+            if stats.counts[event]:
+                print "  %-8s %5d %10.1fms %10.1fms %10.1fms" % (
+                    event, stats.counts[event], stats.recorded[event],
+                    stats.replayed[event], stats.slowest[event])
+    for line in registry.report():
+        print line
+
+
+def get_parser():
+    """Get the command line parser with all available commands."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-j', '--processes', type=int, default=None,
+        help='how many processes to use (default: all cores)',
+    )
+    commands = parser.add_subparsers()
+
+    index = commands.add_parser('index', help=index_positions.__doc__)
+    index.add_argument('problems_dir')
+    index.add_argument('-o', '--output', help='where to save the index')
+    index.set_defaults(func=index_positions)
+
+    dedup = commands.add_parser('dedup', help=dedup_problems.__doc__)
+    dedup.add_argument('problems_dir')
+    dedup.set_defaults(func=dedup_problems)
+
+    stats = commands.add_parser('stats', help=collect_stats.__doc__)
+    stats.add_argument('problems_dir')
+    stats.add_argument('-o', '--output', help='where to save the stats')
+    stats.set_defaults(func=collect_stats)
+
+    verify = commands.add_parser('verify', help=verify_problems.__doc__)
+    verify.add_argument('problems_dir')
+    verify.add_argument('-o', '--output', help='where to save the report')
+    verify.set_defaults(func=verify_problems)
+
+    refute = commands.add_parser('refute', help=refute_problems.__doc__)
+    refute.add_argument('problems_dir')
+    refute.add_argument(
+        'output_dir', help='where to save the problems with new refutations')
+    refute.add_argument(
+        '-t', '--time', type=float, default=0.1,
+        help='how many seconds to search for each refutation',
+    )
+    refute.set_defaults(func=refute_problems)
+
+    compress = commands.add_parser('compress', help=compress_problems.__doc__)
+    compress.add_argument('problems_dir')
+    compress.add_argument(
+        '-s', '--sample', type=int, default=None,
+        help='how many problems to train the dictionary on (default: all)',
+    )
+    compress.add_argument(
+        '-k', '--keep', action='store_true',
+        help='keep the uncompressed problems',
+    )
+    compress.set_defaults(func=compress_problems)
+
+    sync = commands.add_parser('sync', help=sync_mirror.__doc__)
+    sync.add_argument('problems_dir')
+    sync.add_argument(
+        '-n', '--new-only', action='store_true',
+        help="don't check previously downloaded problems for changes",
+    )
+    sync.add_argument(
+        '-d', '--delay', type=float, default=2.0,
+        help='the longest pause between downloads, in seconds',
+    )
+    sync.set_defaults(func=sync_mirror)
+
+    rate = commands.add_parser('rate', help=rate_problems.__doc__)
+    rate.add_argument('problems_dir')
+    rate.add_argument(
+        'attempts', nargs='+',
+        help="the attempts logs (attempts.txt in the addon's data folder) "
+             "of all players",
+    )
+    rate.set_defaults(func=rate_problems)
+
+    comments = commands.add_parser('comments', help=index_comments.__doc__)
+    comments.add_argument('problems_dir')
+    comments.add_argument('-o', '--output', help='where to save the index')
+    comments.add_argument(
+        '-s', '--search', help='list the problems that match this query')
+    comments.set_defaults(func=index_comments)
+
+    serve = commands.add_parser('serve', help=serve_problems.__doc__)
+    serve.add_argument('problems_dir')
+    serve.add_argument(
+        '-H', '--host', default='0.0.0.0',
+        help='the address to listen on (default: all of them)',
+    )
+    serve.add_argument(
+        '-p', '--port', type=int, default=DEFAULT_PORT,
+        help='the port to listen on (default: %d)' % DEFAULT_PORT,
+    )
+    serve.set_defaults(func=serve_problems)
+
+    replay = commands.add_parser('replay', help=replay_sessions.__doc__)
+    replay.add_argument('problems_dir')
+    replay.add_argument(
+        'sessions', nargs='+',
+        help="the session logs (in the sessions folder of the addon's data)",
+    )
+    replay.add_argument(
+        '-t', '--search-time', type=float, default=Goban.search_time,
+        help='how many seconds to search for replies to moves off the path',
+    )
+    replay.add_argument(
+        '-c', '--cache-size', type=int, default=DEFAULT_BUDGET // MB,
+        help='how many MB the caches may use (default: %(default)d)',
+    )
+    replay.set_defaults(func=replay_sessions)
+
+    bench = commands.add_parser('bench', help=benchmark_parsers.__doc__)
+    bench.add_argument('problems_dir')
+    bench.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='how many times to load the library (the best time is kept)',
+    )
+    bench.set_defaults(func=benchmark_parsers)
+
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_parser().parse_args()
+    args.func(args)
@@ -0,0 +1,85 @@
+"""The history of attempted problems, and the difficulties fitted from it.
+
+Every solved or failed problem is appended to an attempts log, which the
+offline rating engine (see `ratings`) uses to work out how hard each
+problem really is. The fitted difficulties are saved in the library, and
+used instead of the ranks from the problems' names.
+"""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import time
+
+RATINGS_FILE = 'ratings.json'
+
+
+class AttemptLog(object):
+
+    """An append only log of (problem, solved, time) attempts."""
+
+    def __init__(self, log_file=None):
+        """Initialise the log.
+
+        :param str log_file: where the attempts are saved. If not given, \
+            nothing is recorded
+        """
+        self.log_file = log_file
+
+    def record(self, problem_key, solved, now=None):
+        """Note that the given problem was attempted.
+
+        :param str problem_key: the problem, relative to the library
+        :param boolean solved: whether it was solved
+        :param float now: when it happened (defaults to the current time)
+        """
+        if not self.log_file:
+            return
+        try:
+            directory = os.path.dirname(self.log_file)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.log_file, 'a') as f:
+                f.write('%s\t%d\t%d\n' % (
+                    problem_key, solved, time.time() if now is None else now))
+        except (IOError, OSError) as e:
+            logging.warning('Could not save the attempt: %s', e)
+
+
+def read_attempts(log_file):
+    """Read all attempts saved in the given log.
+
+    Malformed lines are skipped.
+
+    :returns: a generator of (problem key, solved, time) tuples
+    """
+    with open(log_file) as f:
+        for line in f:
+            try:
+                problem_key, solved, when = line.rstrip('\n').split('\t')
+                yield problem_key, solved == '1', int(when)
+            except ValueError:
+                logging.warning('Bad attempt log line: %r', line)
+
+
+def load_ratings(ratings_file):
+    """Load the fitted problem difficulties.
+
+    :returns: {problem key: (level, deviation)}, which is empty if the \
+        file can't be read
+    """
+    try:
+        with open(ratings_file) as f:
+            return dict(
+                (problem_key, tuple(rating))
+                for problem_key, rating in json.load(f).iteritems()
+            )
+    except (IOError, ValueError, AttributeError):
+        return {}
+
+
+def save_ratings(ratings_file, ratings):
+    """Save the given {problem key: (level, deviation)} difficulties."""
+    with open(ratings_file, 'w') as f:
+        json.dump(ratings, f)
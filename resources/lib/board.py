@@ -1,38 +1,64 @@
 """A representation of a goban, with various helper methods."""
 # -*- coding: utf-8 -*-
 
-from random import choice
+from random import Random
 
-from gomill import sgf, sgf_moves
+from resources.lib.lazy_tree import load_tree
+from resources.lib.search import best_reply, region_around
 
 
 class Goban(object):
 
     """A representation of a goban."""
 
+    # how long to look for replies to moves that aren't in the problem
+    search_time = 0.3
+    # how many moves apart the saved positions are, when jumping around
+    snapshot_every = 8
+
     def __init__(self, *args, **kwargs):
-        """Initialise the goban from the given SGF string."""
+        """Initialise the goban from the given SGF string.
+
+        The random number generator used to pick replies can be given as
+        `rng`, so that games can be replayed.
+        """
+        self.random = kwargs.pop('rng', None) or Random()
         self.sgf = None
-        self.game = None
+        self.size = None
+        self.tree = None
         self.board = None
         self.node = None
+        self.region = []
+        self.snapshots = {}
+        self.line_end = None
+        self.overlays = {}
         self.load(kwargs.pop('sgf_string', ''))
 
     def load(self, sgf_string):
-        """load the given SGF string."""
+        """load the given SGF string.
+
+        Only the root of the problem is parsed at first - the variations get
+        parsed as they are reached. If the SGF is too unusual for that, it
+        gets parsed as a whole by gomill.
+        """
         if not sgf_string:
             return
         self.sgf = sgf_string
-        self.game = sgf.Sgf_game.from_string(sgf_string)
-        self.board, _ = sgf_moves.get_setup_and_moves(self.game)
+        self.tree, self.board, self.size = load_tree(sgf_string)
         self.node = self.root
-        self.initial_nodes = self.get_descendants(self.node)
+        self.region = self.get_region()
+        self.snapshots = {self.root: self.board.copy()}
+        self.line_end = self.root
+        self.overlays = {}
 
     @classmethod
     def correct_path(cls, node):
         """Check whether the given node lies on the (or a) correct path."""
-        return (node.has_property('C') and 'RIGHT' in node.get('C')) \
-            or any(cls.correct_path(n) for n in node)
+        try:
+            return node.on_correct_path
+        except AttributeError:
+            return (node.has_property('C') and 'RIGHT' in node.get('C')) \
+                or any(cls.correct_path(n) for n in node)
 
     @classmethod
     def get_descendants(cls, node):
@@ -56,17 +82,17 @@ class Goban(object):
         :param tuple: the position where the stone is to be placed
         """
         current_state = self.board.copy().board
-        self.board.play(pos[0], pos[1], player)
-        for n in node:
-            player, move = n.get_move()
-            if move == pos:
-                break
-        else:
+        ko_point = self.board.play(pos[0], pos[1], player)
+        n = node.find_child(pos)
+        if n is None:
             n = node.new_child()
             n.set_move(player, pos)
+            # the new move must be shown among the node's hints
+            self.overlays.pop(node, None)
+        n.ko_point = ko_point
 
         # work out how to recreate the previous state
-        size = self.game.get_size()
+        size = self.size
         n.diff = [
             (x, y, current_state[x][y])
             for x in xrange(size) for y in xrange(size)
@@ -81,6 +107,9 @@ class Goban(object):
         coordinate).
         """
         self.node = self._move(self.node, self.next_player, (x, y))
+        self._snapshot()
+        if self.node not in self.path(self.line_end):
+            self.line_end = self.node
 
     def back(self):
         """Go back one move, updated the board."""
@@ -89,10 +118,184 @@ class Goban(object):
                 self.board.board[x][y] = player
             self.node = self.node.parent
 
-    def random_move(self):
-        """Chose a random move from the current node, and play it."""
+    def path(self, node=None):
+        """Get the nodes that lead to the given (or current) node.
+
+        :returns: a list of nodes, from the root to the node
+        """
+        node = node or self.node
+        nodes = []
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return nodes[::-1]
+
+    @property
+    def line(self):
+        """Get the current line of play, from the root to its last move.
+
+        This is the line the current node is on, which goes on to the last
+        move played along it (even if that was taken back since), and then
+        down the first variations of the problem to the line's end.
+        """
+        line = self.path(self.line_end)
+        while len(line[-1]) > 0 and line[-1][0].original:
+            line.append(line[-1][0])
+        return line
+
+    def _snapshot(self):
+        """Save the current position, if it's at one of the snapshot depths."""
+        if self.node not in self.snapshots and \
+                (len(self.path()) - 1) % self.snapshot_every == 0:
+            self.snapshots[self.node] = self.board.copy()
+
+    def _forward(self, nodes):
+        """Play out the given nodes, one after another, from the current node.
+
+        :raises ValueError: if any of the moves is illegal
+        """
+        for node in nodes:
+            colour, move = node.get_move()
+            if move:
+                self.node = self._move(self.node, colour, move)
+            else:
+                node.diff = []
+                self.node = node
+            self._snapshot()
+
+    def jump(self, move_number):
+        """Go to the given move of the current line.
+
+        The position is either restored from the nearest saved snapshot, or
+        by taking back moves, whichever is less work - so a jump never has
+        to go through more than a handful of moves, however long the line.
+
+        :param int move_number: the number of moves from the start of the \
+            problem, clamped to the current line
+        :returns: whether the current node changed
+        """
+        if self.node is None:
+            return False
+        line = self.line
+        target = max(0, min(move_number, len(line) - 1))
+        current = self.path()
+        if current[-1] == line[target]:
+            return False
+
+        common = 0
+        while common < min(len(current), len(line)) and \
+                current[common] == line[common]:
+            common += 1
+        base = min(common - 1, target)
+        replay_cost = (len(current) - 1 - base) + (target - base)
+
+        snapshot = next(
+            depth for depth in xrange(target, -1, -1)
+            if line[depth] in self.snapshots
+        )
+        try:
+            if target - snapshot < replay_cost:
+                self.board = self.snapshots[line[snapshot]].copy()
+                self.node = line[snapshot]
+                self._forward(line[snapshot + 1:target + 1])
+            else:
+                while self.node != line[base]:
+                    self.back()
+                self._forward(line[base + 1:target + 1])
+        except ValueError:
+            # an illegal move along the problem's first variation - stop there
+            pass
+        return True
+
+    def jump_to_start(self):
+        """Go back to the initial position of the problem."""
+        return self.jump(0)
+
+    def jump_to_end(self):
+        """Go to the end of the current line."""
+        return self.jump(len(self.line) - 1)
+
+    @property
+    def move_number(self):
+        """Get the number of moves played from the start of the problem."""
+        return max(0, len(self.path()) - 1)
+
+    def hint_overlay(self, node=None):
+        """Get the hints for the moves that can be played from the given node.
+
+        Each known move is marked as good if it leads to a correct solution,
+        and as bad otherwise. This is only worked out once for each node.
+
+        :param node: the node whose moves should be marked (by default the \
+            current one)
+        :returns: a {point: 'good' or 'bad'} dict
+        """
+        node = node or self.node
+        if node is None:
+            return {}
+        overlay = self.overlays.get(node)
+        if overlay is None:
+            overlay = self.overlays[node] = dict(
+                (child.get_move()[1],
+                 'good' if self.correct_path(child) else 'bad')
+                for child in node if child.get_move()[1]
+            )
+        return overlay
+
+    def get_region(self, margin=1):
+        """Get the part of the board where the problem is played out.
+
+        This is the area around all the setup stones and all moves from the
+        problem's tree.
+        """
+        points = [point for _, point in self.board.list_occupied_points()]
+        points += self.tree.move_points()
+        return region_around(points, self.board.side, margin)
+
+    def choose_reply(self):
+        """Chose a random move from the current node.
+
+        If the current node isn't one of the original ones, look for the best
+        reply instead.
+
+        :returns: the move, or None if there is none
+        """
         if self.on_path and len(self.node) > 0:
-            self.move(*choice(self.node).get_move()[1])
+            return self.random.choice(self.node).get_move()[1]
+        elif not self.on_path and self.search_time:
+            return best_reply(
+                self.board, self.next_player, self.region, self.search_time,
+                self.node.ko_point,
+            )
+        return None
+
+    def random_move(self):
+        """Chose a reply to the current node (see `choose_reply`), and play it.
+
+        :returns: the move, or None if there is none
+        """
+        move = self.choose_reply()
+        if move:
+            self.move(*move)
+        return move
+
+    def play(self, x, y):
+        """Place the next player's stone on the given spot, and reply to it.
+
+        :returns: the reply, or None if there is none
+        """
+        self.move(x, y)
+        return self.random_move()
+
+    def take_back(self):
+        """Go back to before the player's last move, along with its reply.
+
+        At a correct end of the problem, or off the problem's path, only a
+        single move is taken back.
+        """
+        if not self.correct and self.on_path:
+            self.back()
+        self.back()
 
     def __str__(self):
         """Return this board's current layout as a string."""
@@ -104,7 +307,7 @@ class Goban(object):
     @property
     def root(self):
         """Get the game's root node."""
-        return self.game.get_root() if self.game else None
+        return self.tree.root if self.tree else None
 
     @property
     def current_player(self):
@@ -138,19 +341,12 @@ class Goban(object):
         """Return the comments of the current node."""
         if self.node is None:
             return ''
-        try:
-            return self.node.get('C')
-        except KeyError:
-            try:
-                return self.node.get('c')
-            except KeyError:
-                pass
-        return ''
+        return self.node.comment
 
     @property
     def on_path(self):
         """Whether the current path is one of the original ones."""
-        return self.node in self.initial_nodes
+        return self.node is not None and self.node.original
 
     @property
     def good_path(self):
@@ -160,7 +356,7 @@ class Goban(object):
     @property
     def correct(self):
         """Whether the current node is a correct end one."""
-        return 'RIGHT' in self.current_comment
+        return self.node is not None and self.node.is_right
 
     def _get_property(self, prop):
         """Get the given property from the current node.
@@ -168,10 +364,9 @@ class Goban(object):
         :param str prop: the SGF property code
         :returns: a list of points for the given property
         """
-        if self.node is not None and self.node.has_property(prop):
-            return self.node.get(prop)
-        else:
+        if self.node is None:
             return []
+        return self.node.markup.get(prop, [])
 
     @property
     def labels(self):
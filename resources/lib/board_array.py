@@ -0,0 +1,85 @@
+"""Go boards as NumPy arrays, for analysing lots of positions at once.
+
+A board is an int8 array of shape (size, size), indexed the same way as
+gomill's `Board.board` (i.e. [row][column], with row 0 at the bottom).
+Black stones are 1, white ones -1 and empty points 0. All functions accept
+stacks of boards too - any leading dimensions are treated as a batch.
+"""
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import numpy as np
+
+from resources.lib.symmetry import SYMMETRIES
+
+EMPTY = 0
+BLACK = 1
+WHITE = -1
+# the player to move, as stored before each variant's stones
+PLAYERS = {None: 0, 'b': 1, 'w': 2}
+SWAPPED_PLAYERS = np.array([0, 2, 1], dtype=np.int8)
+
+
+def from_boards(boards):
+    """Convert the given gomill boards into a stack of arrays.
+
+    :returns: an array of shape (boards, size, size)
+    """
+    points = np.array([board.board for board in boards], dtype=object)
+    return (points == 'b').astype(np.int8) - (points == 'w').astype(np.int8)
+
+
+def transform(array, symmetry):
+    """Apply one of the 8 board symmetries to the given board(s).
+
+    This matches `symmetry.transform_point`, so a stone at a point ends up at
+    the transformed point.
+    """
+    if symmetry & 4:
+        array = np.swapaxes(array, -1, -2)
+    if symmetry & 1:
+        array = array[..., ::-1, :]
+    if symmetry & 2:
+        array = array[..., :, ::-1]
+    return array
+
+
+def variants(array, swap_colours=True):
+    """Get all symmetric variants of the given board(s).
+
+    :returns: an array with a new first dimension of 8 (or 16 if the \
+        colour swapped variants are also wanted)
+    """
+    results = [transform(array, symmetry) for symmetry in xrange(SYMMETRIES)]
+    if swap_colours:
+        results += [-result for result in results]
+    return np.stack(results)
+
+
+def position_hashes(arrays, to_play):
+    """Get hashes that identify the given positions up to symmetry.
+
+    Positions that can be turned into each other by rotating, mirroring or
+    swapping colours (along with who is to play) get the same hash. Each
+    variant is turned into a row of bytes, starting with the player to
+    move, and the smallest row of each position is hashed - all of which is
+    done for the whole stack at once.
+
+    :param arrays: a stack of boards, of shape (positions, size, size)
+    :param list to_play: the player who is to move next in each position, \
+        or None if not known
+    :returns: a list of hashes, one per position
+    """
+    count, size = len(arrays), arrays.shape[-1]
+    players = np.array([PLAYERS[player] for player in to_play], dtype=np.int8)
+    rows = np.empty((2 * SYMMETRIES, count, size * size + 1), dtype=np.int8)
+    rows[:SYMMETRIES, :, 0] = players
+    rows[SYMMETRIES:, :, 0] = SWAPPED_PLAYERS[players]
+    rows[:, :, 1:] = variants(arrays).reshape(2 * SYMMETRIES, count, -1)
+
+    rows = rows.view(np.dtype((np.void, size * size + 1)))[..., 0]
+    return [
+        hashlib.sha1('%d:' % size + row.tobytes()).hexdigest()
+        for row in np.sort(rows, axis=0)[0]
+    ]
@@ -0,0 +1,153 @@
+"""A browser for picking problems by hand, rather than at random."""
+# -*- coding: utf-8 -*-
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+
+from resources.lib.log_utils import _
+from resources.lib.grid import get_image
+from resources.lib import thumbnails
+
+addon = xbmcaddon.Addon()
+
+THUMBNAILS_DIR = xbmc.translatePath(
+    'special://profile/addon_data/%s/thumbnails/' % addon.getAddonInfo('id'))
+
+PREVIOUS_PAGE = -1
+NEXT_PAGE = -2
+
+
+class ProblemBrowser(object):
+
+    """Lists the problems of each rank, along with their thumbnails.
+
+    Problems are shown a page at a time. The thumbnails of each page (and
+    the next one) are drawn in the background, so any that aren't ready yet
+    are shown once the page is opened again.
+    """
+
+    page_size = 50
+
+    def __init__(self, problems, cache_dir=THUMBNAILS_DIR):
+        """Initialise the browser.
+
+        :param Problems problems: the problems to be browsed
+        :param str cache_dir: where the thumbnails should be stored
+        """
+        self.problems = problems
+        self.thumbnails = None
+        # served problems can't be read locally, so they don't get thumbnails
+        if thumbnails.available() and problems.local_files:
+            self.thumbnails = thumbnails.ThumbnailCache(cache_dir)
+
+    def choose_rank(self):
+        """Ask which rank should be browsed.
+
+        :returns: the chosen rank, or None if nothing was chosen
+        """
+        index = self.problems.rank_index
+        if not index:
+            xbmcgui.Dialog().ok(_('browse_problems'), _('browser_not_ready'))
+            return None
+
+        labels = [
+            '%d %s (%d)' % (rank + (count,))
+            for rank, count in zip(index.ranks, index.counts)
+        ]
+        choice = xbmcgui.Dialog().select(_('browse_problems'), labels)
+        return index.ranks[choice] if choice >= 0 else None
+
+    def thumbnail(self, problem_file):
+        """Get the thumbnail to be displayed for the given problem."""
+        if self.thumbnails:
+            return self.thumbnails.get(problem_file) or get_image('empty.png')
+        return get_image('empty.png')
+
+    def page_items(self, problems, page):
+        """Get the list items of the given page.
+
+        :returns: a (list items, actions) tuple, where each action is either \
+            a problem or one of the page changing constants
+        """
+        start = page * self.page_size
+        page_problems = problems[start:start + self.page_size]
+        if self.thumbnails:
+            # start drawing the next page before it's needed
+            next_page = problems[start + self.page_size:start + 2 * self.page_size]
+            self.thumbnails.get_many([p['problem_file'] for p in next_page])
+
+        items, actions = [], []
+        if page > 0:
+            items.append(xbmcgui.ListItem(_('previous_page')))
+            actions.append(PREVIOUS_PAGE)
+        for problem in page_problems:
+            item = xbmcgui.ListItem(
+                problem['problem_file'].namebase,
+                _('rating') % ((problem.get('rating') or 0,) + problem['rank']),
+            )
+            item.setArt({'thumb': self.thumbnail(problem['problem_file'])})
+            items.append(item)
+            actions.append(problem)
+        if start + self.page_size < len(problems):
+            items.append(xbmcgui.ListItem(_('next_page')))
+            actions.append(NEXT_PAGE)
+        return items, actions
+
+    def choose_problem(self, rank):
+        """Ask which problem of the given rank should be played.
+
+        :returns: the chosen problem, with its SGF, or None if nothing chosen
+        """
+        return self.choose_from(
+            self.problems.rank_problems(rank), _('rank_problems') % rank)
+
+    def choose_from(self, problems, heading):
+        """Ask which of the given problems should be played.
+
+        :param list problems: the problems to choose from
+        :param str heading: the title of the list
+        :returns: the chosen problem, with its SGF, or None if nothing chosen
+        """
+        page = 0
+        while True:
+            items, actions = self.page_items(problems, page)
+            choice = xbmcgui.Dialog().select(heading, items, useDetails=True)
+            if choice < 0:
+                return None
+            elif actions[choice] == PREVIOUS_PAGE:
+                page -= 1
+            elif actions[choice] == NEXT_PAGE:
+                page += 1
+            else:
+                return self.problems.read_problem(dict(actions[choice]))
+
+    def browse(self):
+        """Let the user pick a problem.
+
+        :returns: the chosen problem, with its SGF, or None if nothing chosen
+        """
+        rank = self.choose_rank()
+        return rank and self.choose_problem(rank)
+
+    def search(self):
+        """Let the user pick one of the problems whose comments match a query.
+
+        :returns: the chosen problem, with its SGF, or None if nothing chosen
+        """
+        query = xbmcgui.Dialog().input(_('search_problems'))
+        if not query:
+            return None
+        try:
+            problems = self.problems.search(query)
+        except ValueError:
+            problems = []
+        if not problems:
+            xbmcgui.Dialog().ok(_('search_problems'), _('no_matches') % query)
+            return None
+        return self.choose_from(problems, _('search_results') % query)
+
+    def close(self):
+        """Stop drawing any thumbnails."""
+        if self.thumbnails:
+            self.thumbnails.close()
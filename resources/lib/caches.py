@@ -0,0 +1,224 @@
+"""In memory caches that share a single memory budget.
+
+Each cache keeps its own entries, in least recently used order, but their
+sizes all count towards the budget of the registry they belong to. Once
+the budget is used up, entries are evicted from whichever cache has the
+entry that is least worth keeping: the least recently used one, with
+entries of caches that are costlier to refill being kept for longer.
+
+Every cache counts its hits, misses and evictions, which can be logged
+with `CacheRegistry.report`.
+"""
+# -*- coding: utf-8 -*-
+
+import sys
+from collections import OrderedDict
+from threading import RLock
+
+MB = 1024 * 1024
+DEFAULT_BUDGET = 16 * MB
+
+
+class Cache(object):
+
+    """A single cache, whose entries count towards its registry's budget."""
+
+    def __init__(self, registry, name, sizeof=sys.getsizeof, cost=1.0):
+        """Initialise the cache.
+
+        Caches should be made with `CacheRegistry.cache`, rather than
+        directly.
+
+        :param CacheRegistry registry: the registry that manages the memory
+        :param str name: what the cache is called in the statistics
+        :param sizeof: a function that gets the size (in bytes) of a value \
+            (by default only the value itself is counted, not its contents)
+        :param float cost: how costly the entries are to get again - an \
+            entry of a cache with cost 2 is kept twice as long as one of a \
+            cache with cost 1
+        """
+        self.registry = registry
+        self.name = name
+        self.sizeof = sizeof
+        self.cost = cost
+        # {key: (value, size, last use)}, least recently used first
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def hit_rate(self):
+        """Get the fraction of lookups that were found in the cache."""
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def get(self, key, default=None):
+        """Get the value cached under the given key.
+
+        :returns: the value, or the default if it's not cached
+        """
+        with self.registry.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            value, size, _ = entry
+            self.entries[key] = (value, size, self.registry.tick())
+            return value
+
+    def put(self, key, value, size=None):
+        """Cache the given value, evicting others if the budget is used up.
+
+        Values that are bigger than the whole budget aren't cached.
+
+        :param int size: the size of the value, if known
+        """
+        size = self.sizeof(value) if size is None else size
+        with self.registry.lock:
+            self.discard(key)
+            if size > self.registry.budget:
+                return
+            self.entries[key] = (value, size, self.registry.tick())
+            self.bytes += size
+            self.registry.used += size
+            self.registry.evict()
+
+    def discard(self, key):
+        """Remove the given key from the cache, if it's there."""
+        with self.registry.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+                self.registry.used -= entry[1]
+
+    def clear(self):
+        """Remove all entries."""
+        with self.registry.lock:
+            self.registry.used -= self.bytes
+            self.entries.clear()
+            self.bytes = 0
+
+    def oldest_age(self, now):
+        """Get how long the least recently used entry has been unused.
+
+        The age is divided by the cost of the cache, so that it can be
+        compared to the entries of other caches.
+        """
+        for _, _, last_use in self.entries.itervalues():
+            return (now - last_use) / self.cost
+        return None
+
+    def evict_oldest(self):
+        """Remove the least recently used entry."""
+        _, (_, size, _) = self.entries.popitem(last=False)
+        self.bytes -= size
+        self.registry.used -= size
+        self.evictions += 1
+
+    def stats(self):
+        """Get the statistics of this cache.
+
+        :returns: a dict with the number of entries, bytes, hits, misses, \
+            evictions and the hit rate
+        """
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+class CacheRegistry(object):
+
+    """A set of caches that share a memory budget."""
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        """Initialise the registry.
+
+        :param int budget: how many bytes all caches may use together
+        """
+        self.caches = OrderedDict()
+        self.lock = RLock()
+        self.used = 0
+        self.clock = 0
+        self._budget = budget
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @budget.setter
+    def budget(self, budget):
+        """Change the budget, evicting any entries that no longer fit."""
+        with self.lock:
+            self._budget = budget
+            self.evict()
+
+    def cache(self, name, sizeof=sys.getsizeof, cost=1.0):
+        """Get the cache with the given name, creating it if needed.
+
+        See `Cache` for the parameters.
+        """
+        with self.lock:
+            if name not in self.caches:
+                self.caches[name] = Cache(self, name, sizeof, cost)
+            return self.caches[name]
+
+    def tick(self):
+        """Get the time of a cache access, counted in accesses."""
+        self.clock += 1
+        return self.clock
+
+    def evict(self):
+        """Evict entries until all caches fit into the budget."""
+        with self.lock:
+            while self.used > self._budget:
+                ages = [
+                    (cache.oldest_age(self.clock), cache)
+                    for cache in self.caches.itervalues() if cache.entries
+                ]
+                _, cache = max(ages, key=lambda item: item[0])
+                cache.evict_oldest()
+
+    def stats(self):
+        """Get the statistics of all caches.
+
+        :returns: {cache name: stats dict (see `Cache.stats`)}
+        """
+        with self.lock:
+            return dict(
+                (name, cache.stats()) for name, cache in self.caches.iteritems())
+
+    def report(self):
+        """Describe how well all caches are doing.
+
+        :returns: a list of lines, one per cache, after a summary line
+        """
+        with self.lock:
+            lines = ['caches: %.1f of %.1f MB used' % (
+                float(self.used) / MB, float(self._budget) / MB)]
+            for name, cache in self.caches.iteritems():
+                lines.append(
+                    '%s: %d entries, %.1f KB, %.0f%% hits (%d of %d), '
+                    '%d evicted' % (
+                        name, len(cache), cache.bytes / 1024.0,
+                        cache.hit_rate * 100, cache.hits,
+                        cache.hits + cache.misses, cache.evictions,
+                    ))
+            return lines
+
+
+# the registry of all caches of the addon
+registry = CacheRegistry()
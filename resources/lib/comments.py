@@ -0,0 +1,204 @@
+"""A full text index of the comments of all problems in a library.
+
+The comments (both the root one, which usually says what the problem is
+about, and those of all other nodes), the application that made the
+problem and its rank are put into an SQLite FTS4 table, so that topics
+like "ko" or "ladder" can be found in a whole library at once.
+
+Each indexed file is noted with its modification time and size, so that
+updating the index only reads the problems that were added or changed.
+"""
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import sqlite3
+
+from gomill import sgf
+from path import path
+
+from resources.lib.library import iter_problem_files, map_problems
+from resources.lib.problems import Problems
+from resources.lib.sgf_parser import iter_nodes, simpletext_value, text_value
+from resources.lib.storage import read_sgf
+
+COMMENTS_FILE = 'comments.db'
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        problem_file TEXT UNIQUE,
+        mtime REAL,
+        size INTEGER
+    )''',
+    # the porter tokenizer makes "ladders" match "ladder"
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS problem_comments USING fts4(
+        rank, application, root_comment, comments, tokenize=porter
+    )''',
+)
+
+
+def read_comments(sgf_string):
+    """Get the comments of the given problem.
+
+    :param str sgf_string: the SGF text
+    :returns: an (application, root comment, [other comments]) tuple
+    :raises ValueError: if the SGF can't be parsed
+    """
+    try:
+        nodes = [properties for _, properties in iter_nodes(sgf_string)]
+        application = nodes[0].get('AP', [''])[0].partition(':')[0]
+        application = simpletext_value(application)
+        comments = [text_value(node.get('C', [''])[0]) for node in nodes]
+    except ValueError:
+        game = sgf.Sgf_game.from_string(sgf_string)
+        root = game.get_root()
+        application = root.get('AP')[0] if root.has_property('AP') else ''
+        comments = []
+        to_visit = [root]
+        while to_visit:
+            node = to_visit.pop()
+            comments.append(node.get('C') if node.has_property('C') else '')
+            to_visit.extend(reversed(list(node)))
+    return application, comments[0], filter(None, comments[1:])
+
+
+def problem_rank(problem_key):
+    """Get the rank of the given problem as text, e.g. "5 kyu"."""
+    match = Problems.name_parser.search(problem_key) or \
+        Problems.level_parser.search(problem_key)
+    return '%s %s' % (match.group('level'), match.group('type')) if match else ''
+
+
+def problem_document(args):
+    """Get everything about the given problem that should be indexed.
+
+    :param tuple args: (problem file, problem key) - a single argument, so \
+        that it can be used with `map_problems`
+    :returns: a (problem key, (rank, application, root comment, comments)) \
+        tuple. The fields are None if the problem couldn't be read
+    """
+    problem_file, problem_key = args
+    try:
+        application, root_comment, comments = read_comments(
+            read_sgf(problem_file))
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_key, None
+    return problem_key, (
+        problem_rank(problem_key), application, root_comment,
+        '\n'.join(comments),
+    )
+
+
+def _decode(value):
+    """Make the given SGF text safe for SQLite, which wants unicode."""
+    return value.decode('utf-8', 'replace') if isinstance(value, str) else value
+
+
+class CommentIndex(object):
+
+    """The full text index of the comments of a library."""
+
+    def __init__(self, index_file):
+        """Open (or create) the index.
+
+        :param str index_file: the SQLite database of the index
+        """
+        self.db = sqlite3.connect(index_file, check_same_thread=False)
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def indexed_files(self):
+        """Get the {problem key: (modification time, size)} of indexed files."""
+        return dict(
+            (problem_file, (mtime, size)) for problem_file, mtime, size in
+            self.db.execute('SELECT problem_file, mtime, size FROM files')
+        )
+
+    def remove(self, problem_key):
+        """Remove the given problem from the index."""
+        row = self.db.execute(
+            'SELECT id FROM files WHERE problem_file = ?', (problem_key,)
+        ).fetchone()
+        if row:
+            self.db.execute('DELETE FROM problem_comments WHERE docid = ?', row)
+            self.db.execute('DELETE FROM files WHERE id = ?', row)
+
+    def add(self, problem_key, mtime, size, document):
+        """Index the given problem, replacing any previous version of it.
+
+        :param str problem_key: the problem, relative to the library
+        :param float mtime: the modification time of its file
+        :param int size: the size of its file
+        :param tuple document: the problem's (rank, application, root \
+            comment, comments)
+        """
+        self.remove(problem_key)
+        cursor = self.db.execute(
+            'INSERT INTO files (problem_file, mtime, size) VALUES (?, ?, ?)',
+            (_decode(problem_key), mtime, size))
+        self.db.execute(
+            'INSERT INTO problem_comments (docid, rank, application, '
+            'root_comment, comments) VALUES (?, ?, ?, ?, ?)',
+            (cursor.lastrowid,) + tuple(_decode(field) for field in document))
+
+    def update(self, problems_dir, processes=None):
+        """Bring the index up to date with the given library.
+
+        Only new and changed problems are read. Problems that are gone are
+        removed from the index.
+
+        :param str problems_dir: the base directory of the library
+        :param int processes: how many processes should be used
+        :returns: an (added or changed, removed) tuple of problem counts
+        """
+        problems_dir = path(problems_dir)
+        indexed = self.indexed_files()
+        current, changed = {}, []
+        for problem_file in iter_problem_files(problems_dir):
+            problem_key = unicode(problems_dir.relpathto(problem_file))
+            stat = os.stat(problem_file)
+            current[problem_key] = (stat.st_mtime, stat.st_size)
+            if indexed.get(problem_key) != current[problem_key]:
+                changed.append((problem_file, problem_key))
+
+        removed = [key for key in indexed if key not in current]
+        for problem_key in removed:
+            self.remove(problem_key)
+
+        for problem_key, document in map_problems(
+                problem_document, changed, processes):
+            if document is None:
+                # don't try again until the file changes
+                document = (problem_rank(problem_key), '', '', '')
+            self.add(problem_key, *current[problem_key] + (document,))
+        self.db.commit()
+        return len(changed), len(removed)
+
+    def search(self, query, limit=1000):
+        """Find the problems whose comments match the given query.
+
+        The query can use the FTS syntax, e.g. "ladder OR net", "connect*",
+        or "rank:kyu ko".
+
+        :returns: a list of problem keys, relative to the library
+        :raises ValueError: if the query is malformed
+        """
+        try:
+            return [
+                problem_file for problem_file, in self.db.execute(
+                    'SELECT files.problem_file FROM problem_comments '
+                    'JOIN files ON files.id = problem_comments.docid '
+                    'WHERE problem_comments MATCH ? '
+                    'ORDER BY files.problem_file LIMIT ?',
+                    (_decode(query), limit))
+            ]
+        except sqlite3.OperationalError as e:
+            raise ValueError('Bad search query %r: %s' % (query, e))
@@ -0,0 +1,337 @@
+"""A compact, array based version of an SGF game tree.
+
+Walking gomill's nodes means parsing their properties over and over again,
+so each problem is compiled once into a set of parallel arrays, with one
+item per node. Comments and markup are interned into shared tables, and
+children can be found by their move with a single dict lookup.
+"""
+# -*- coding: utf-8 -*-
+
+from array import array
+
+# node flags
+RIGHT = 1
+FORCE = 2
+CORRECT_PATH = 4
+ORIGINAL = 8
+
+COLOURS = (None, 'b', 'w')
+COLOUR_CODES = {None: 0, 'b': 1, 'w': 2}
+PASS = 63
+MARKUP = ('LB', 'MA', 'TR', 'SQ', 'CR')
+
+
+def pack_move(colour, move):
+    """Pack the given move into a single int.
+
+    :param str colour: 'b', 'w' or None
+    :param tuple move: (row, column), or None for a pass
+    """
+    row, col = move or (PASS, PASS)
+    return (COLOUR_CODES[colour] << 12) | (row << 6) | col
+
+
+NO_MOVE = pack_move(None, None)
+
+
+def unpack_move(code):
+    """Unpack the given move code into a (colour, (row, column)) tuple."""
+    row, col = (code >> 6) & 63, code & 63
+    return COLOURS[code >> 12], (row, col) if row != PASS else None
+
+
+class CompiledTree(object):
+
+    """A game tree stored as parallel arrays indexed by node."""
+
+    def __init__(self):
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.last_child = array('i')
+        self.child_count = array('i')
+        self.move = array('i')
+        self.flags = array('B')
+        self.comment = array('i')
+        self.markup = array('i')
+
+        self.comments = ['']
+        self.markups = [{}]
+        self._interned = {'': 0}
+        self._interned_markup = {(): 0}
+        # {(parent, row, column): child}
+        self.children = {}
+        # data added by the goban during play
+        self.diffs = {}
+        self.ko_points = {}
+
+    def __len__(self):
+        return len(self.parent)
+
+    def intern_comment(self, comment):
+        """Get the index of the given comment in the comments table."""
+        try:
+            return self._interned[comment]
+        except KeyError:
+            self.comments.append(comment)
+            self._interned[comment] = len(self.comments) - 1
+            return len(self.comments) - 1
+
+    def intern_markup(self, markup):
+        """Get the index of the given {property: value} markup."""
+        key = tuple(sorted(markup.items()))
+        try:
+            return self._interned_markup[key]
+        except KeyError:
+            self.markups.append(markup)
+            self._interned_markup[key] = len(self.markups) - 1
+            return len(self.markups) - 1
+
+    def add_node(self, parent, move_code=NO_MOVE, comment='', markup=None,
+                 flags=0):
+        """Add a new node as the last child of the given parent.
+
+        :param int parent: the index of the parent, or -1 for the root
+        :param int move_code: the packed move of the node
+        :param str comment: the node's comment
+        :param dict markup: {markup property: value}
+        :param int flags: any additional flags
+        :returns: the index of the new node
+        """
+        index = len(self.parent)
+        if 'RIGHT' in comment:
+            flags |= RIGHT | CORRECT_PATH
+        if 'FORCE' in comment:
+            flags |= FORCE
+
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.last_child.append(-1)
+        self.child_count.append(0)
+        self.move.append(move_code)
+        self.flags.append(flags)
+        self.comment.append(self.intern_comment(comment))
+        self.markup.append(self.intern_markup(markup or {}))
+
+        if parent >= 0:
+            if self.last_child[parent] < 0:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[self.last_child[parent]] = index
+            self.last_child[parent] = index
+            self.child_count[parent] += 1
+            self._index_child(index)
+        return index
+
+    def _index_child(self, index):
+        """Add the given node to the children lookup table.
+
+        Only the first child with a given move is indexed, as that is the
+        one that would be found by going through the children in order.
+        """
+        _, point = unpack_move(self.move[index])
+        if point:
+            self.children.setdefault((self.parent[index],) + point, index)
+
+    def set_move(self, index, colour, move):
+        """Change the move of the given node."""
+        self.move[index] = pack_move(colour, move)
+        self._index_child(index)
+
+    def find_child(self, index, point):
+        """Get the child of the given node that was played at the given point.
+
+        :returns: the index of the child, or None if not found
+        """
+        return self.children.get((index,) + tuple(point))
+
+    def count_children(self, index):
+        """Get the number of children of the given node."""
+        return self.child_count[index]
+
+    def iter_children(self, index):
+        """Get the indexes of all children of the given node, in order."""
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def mark_correct_paths(self):
+        """Flag all nodes that lead to a correct solution.
+
+        Children always have larger indexes than their parents, so going
+        backwards through the nodes handles each child before its parent.
+        """
+        for index in xrange(len(self.parent) - 1, 0, -1):
+            if self.flags[index] & CORRECT_PATH:
+                self.flags[self.parent[index]] |= CORRECT_PATH
+
+    def move_points(self):
+        """Get the points of all moves in the tree."""
+        return filter(None, (unpack_move(move)[1] for move in self.move))
+
+    @property
+    def root(self):
+        """Get the root node."""
+        return CompiledNode(self, 0) if len(self) else None
+
+    @classmethod
+    def from_game(cls, game):
+        """Compile the given gomill game.
+
+        :param gomill.sgf.Sgf_game game: the game to be compiled
+        """
+        tree = cls()
+        to_visit = [(game.get_root(), -1)]
+        while to_visit:
+            node, parent = to_visit.pop()
+            colour, move = node.get_move()
+            comment = node.get('C') if node.has_property('C') else ''
+            markup = dict(
+                (prop, _freeze(node.get(prop)))
+                for prop in MARKUP if node.has_property(prop)
+            )
+            index = tree.add_node(
+                parent, pack_move(colour, move), comment, markup, ORIGINAL)
+            # reversed, so that the children are added in their original order
+            to_visit.extend((child, index) for child in reversed(list(node)))
+        tree.mark_correct_paths()
+        return tree
+
+
+def _freeze(value):
+    """Make the given property value hashable, so that it can be interned."""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    elif isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+class CompiledNode(object):
+
+    """A node of a compiled tree.
+
+    This is just a view of the tree's arrays, which supports the same bits of
+    gomill's `Tree_node` interface as are used by the goban.
+    """
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledNode) and \
+            self.tree is other.tree and self.index == other.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.index)
+
+    def __len__(self):
+        return self.tree.count_children(self.index)
+
+    def __iter__(self):
+        for child in self.tree.iter_children(self.index):
+            yield CompiledNode(self.tree, child)
+
+    def __getitem__(self, key):
+        for i, child in enumerate(self.tree.iter_children(self.index)):
+            if i == key:
+                return CompiledNode(self.tree, child)
+        raise IndexError(key)
+
+    def __nonzero__(self):
+        return True
+
+    def __repr__(self):
+        return '<CompiledNode %d %r>' % (self.index, self.get_move())
+
+    @property
+    def parent(self):
+        """Get this node's parent, or None for the root."""
+        parent = self.tree.parent[self.index]
+        return CompiledNode(self.tree, parent) if parent >= 0 else None
+
+    @property
+    def flags(self):
+        return self.tree.flags[self.index]
+
+    @property
+    def is_right(self):
+        """Whether this node is marked as a correct solution."""
+        return bool(self.flags & RIGHT)
+
+    @property
+    def on_correct_path(self):
+        """Whether a correct solution can be reached from this node."""
+        return bool(self.flags & CORRECT_PATH)
+
+    @property
+    def original(self):
+        """Whether this node comes from the SGF, rather than from play."""
+        return bool(self.flags & ORIGINAL)
+
+    @property
+    def comment(self):
+        return self.tree.comments[self.tree.comment[self.index]]
+
+    @property
+    def markup(self):
+        return self.tree.markups[self.tree.markup[self.index]]
+
+    def _get_diff(self):
+        return self.tree.diffs.get(self.index, [])
+
+    def _set_diff(self, diff):
+        self.tree.diffs[self.index] = diff
+
+    diff = property(_get_diff, _set_diff)
+
+    def _get_ko_point(self):
+        return self.tree.ko_points.get(self.index)
+
+    def _set_ko_point(self, ko_point):
+        self.tree.ko_points[self.index] = ko_point
+
+    ko_point = property(_get_ko_point, _set_ko_point)
+
+    def get_move(self):
+        """Get this node's move as a (colour, (row, column)) tuple."""
+        return unpack_move(self.tree.move[self.index])
+
+    def set_move(self, colour, move):
+        """Set this node's move."""
+        self.tree.set_move(self.index, colour, move)
+
+    def find_child(self, point):
+        """Get the child played at the given point, or None if not known."""
+        child = self.tree.find_child(self.index, point)
+        return CompiledNode(self.tree, child) if child is not None else None
+
+    def new_child(self):
+        """Add a new (empty) child to this node."""
+        return CompiledNode(self.tree, self.tree.add_node(self.index))
+
+    def has_property(self, identifier):
+        """Check whether this node has the given property.
+
+        Only comments and markup are stored.
+        """
+        if identifier == 'C':
+            return bool(self.tree.comment[self.index])
+        return identifier in self.markup
+
+    def get(self, identifier):
+        """Get the value of the given property.
+
+        :raises KeyError: if this node doesn't have the property
+        """
+        if identifier == 'C' and self.has_property('C'):
+            return self.comment
+        return self.markup[identifier]
@@ -0,0 +1,183 @@
+"""Draws the whole board into a single image, rather than one per point.
+
+Every image control is a separate texture for Kodi to load and draw, which
+adds up to a lot of memory on a 19x19 board. The compositor instead keeps
+the board as one PIL image, redraws only the cells that changed and saves
+the result under a new name, so that a single control can show it.
+"""
+# -*- coding: utf-8 -*-
+
+import os
+
+from resources.lib.caches import registry
+
+try:
+    from PIL import Image
+    # older versions of PIL only have the old name
+    RESAMPLE = getattr(Image, 'LANCZOS', None) or getattr(Image, 'ANTIALIAS')
+except ImportError:
+    Image = None
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+def image_bytes(image):
+    """Get how much memory the pixels of the given image take up."""
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+def available():
+    """Check whether composited boards can be drawn."""
+    return Image is not None
+
+
+class Atlas(object):
+
+    """A set of images packed into a single texture.
+
+    This way all stone images are loaded in one go when the board is set up,
+    rather than one by one as they are needed.
+    """
+
+    def __init__(self, filenames, get_image, columns=8):
+        """Load all the given images into one texture.
+
+        :param list filenames: the media files to be included
+        :param get_image: a function that returns the path of a media file
+        :param int columns: how many images should be in each row
+        """
+        images = [
+            Image.open(get_image(filename)).convert('RGBA')
+            for filename in filenames
+        ]
+        width = max(image.size[0] for image in images)
+        height = max(image.size[1] for image in images)
+        rows = (len(images) + columns - 1) // columns
+
+        self.image = Image.new(
+            'RGBA', (width * columns, height * rows), TRANSPARENT)
+        self.boxes = {}
+        for i, (filename, image) in enumerate(zip(filenames, images)):
+            x, y = (i % columns) * width, (i // columns) * height
+            self.image.paste(image.resize((width, height), RESAMPLE), (x, y))
+            self.boxes[filename] = (x, y, x + width, y + height)
+
+    def __contains__(self, filename):
+        return filename in self.boxes
+
+    def sprite(self, filename):
+        """Get the given image from the atlas."""
+        return self.image.crop(self.boxes[filename])
+
+
+class Compositor(object):
+
+    """A single image made up of cells with stone images."""
+
+    def __init__(self, size, output_dir, get_image, name='board', atlas=None):
+        """Initialise the compositor.
+
+        :param tuple size: the (width, height) of the whole image
+        :param str output_dir: where the rendered images should be saved
+        :param get_image: a function that returns the path of a media file
+        :param str name: the prefix of the rendered image files
+        :param Atlas atlas: preloaded images, which are used where possible
+        """
+        self.size = size
+        self.output_dir = output_dir
+        self.get_image = get_image
+        self.name = name
+        self.atlas = atlas
+        self.cells = {}
+        self.dirty = set()
+        self.redraw = True
+        self.canvas = None
+        self.version = 0
+        self.current = None
+        # scaling is slow, so it's worth keeping scaled images for longer
+        self._images = registry.cache('scaled images', image_bytes, cost=4)
+
+    def image(self, filename, size):
+        """Get the given media file, scaled to the given size.
+
+        The scaled images are cached, as there are only a few of them.
+        """
+        key = (self.get_image(filename), size)
+        image = self._images.get(key)
+        if image is None:
+            if self.atlas and filename in self.atlas:
+                image = self.atlas.sprite(filename)
+            else:
+                image = Image.open(self.get_image(filename)).convert('RGBA')
+            image = image.resize(size, RESAMPLE)
+            self._images.put(key, image)
+        return image
+
+    def set_cell(self, key, box, filename):
+        """Set the image of the given cell.
+
+        :param key: the cell's id
+        :param tuple box: the cell's (x, y, width, height) in the image
+        :param str filename: the media file that should be shown in the cell
+        """
+        old = self.cells.get(key)
+        if old == (box, filename):
+            return
+        elif old and old[0] != box:
+            self.redraw = True
+        self.cells[key] = (box, filename)
+        self.dirty.add(key)
+
+    def remove_cell(self, key):
+        """Remove the given cell, clearing its part of the image."""
+        if self.cells.pop(key, None):
+            self.redraw = True
+
+    def _draw(self, key):
+        """Draw the given cell onto the canvas."""
+        (x, y, width, height), filename = self.cells[key]
+        self.canvas.paste(self.image(filename, (width, height)), (x, y))
+
+    def render(self):
+        """Draw all changes and save the resulting image.
+
+        :returns: the path to the new image, or None if nothing changed
+        """
+        if not (self.redraw or self.dirty):
+            return None
+
+        if self.redraw or self.canvas is None:
+            self.canvas = Image.new('RGBA', self.size, TRANSPARENT)
+            for key in self.cells:
+                self._draw(key)
+        else:
+            for key in self.dirty:
+                self._draw(key)
+        self.redraw = False
+        self.dirty = set()
+
+        # Kodi caches textures by their path, so each version needs a new one
+        self.version += 1
+        image_file = os.path.join(
+            self.output_dir, '%s_%d.png' % (self.name, self.version))
+        self.canvas.save(image_file)
+        self._remove_image()
+        self.current = image_file
+        return image_file
+
+    def _remove_image(self):
+        """Remove the last rendered image from the disk."""
+        if self.current:
+            try:
+                os.remove(self.current)
+            except OSError:
+                pass
+            self.current = None
+
+    def clear(self):
+        """Remove all cells, as well as the rendered image."""
+        self._remove_image()
+        self.cells = {}
+        self.dirty = set()
+        self.redraw = True
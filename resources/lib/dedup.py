@@ -0,0 +1,227 @@
+"""Find problems that only differ by rotation, reflection or colours.
+
+The setup stones and the solution tree of every problem are reduced to
+a multiset of 64 bit numbers: one per setup stone, and one per tree node,
+made by hashing all moves on the path that leads to that node. Summing
+these numbers gives a hash that doesn't depend on the order of the stones or
+variations. This is done for all 16 variants of all problems at once with
+NumPy, and the smallest variant is used as the problem's canonical hash.
+"""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from collections import defaultdict
+
+import numpy as np
+from path import path
+
+from resources.lib.library import (
+    compile_problem, iter_problem_files, map_problems,
+)
+from resources.lib.problems import EXCLUDED_FILE
+from resources.lib.symmetry import SYMMETRIES
+
+DUPLICATES_FILE = 'duplicates.json'
+
+COLOURS = {None: 0, 'b': 1, 'w': 2}
+# the second hash is made by mixing the items with this seed
+SEED = np.uint64(0x9e3779b97f4a7c15)
+SETUP_TAG = np.uint64(1 << 40)
+RIGHT_TAG = np.uint64(1 << 41)
+
+
+def problem_signature(problem_file):
+    """Extract everything needed to compare the given problem with others.
+
+    :param str problem_file: the SGF file to be checked
+    :returns: (problem file, board size, setup stones, tree nodes), where \
+        setup stones are (colour, row, column) tuples and tree nodes are \
+        (parent, depth, colour, row, column, is right) tuples, with parents \
+        always before their children. Only the problem file is not None if \
+        the problem couldn't be loaded
+    """
+    try:
+        tree, board, size = compile_problem(problem_file)
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_file, None, None, None
+
+    setup = [
+        (COLOURS[colour], row, col)
+        for colour, (row, col) in board.list_occupied_points()
+    ]
+
+    nodes = []
+    to_visit = [(tree.root, -1, 0)]
+    while to_visit:
+        node, parent, depth = to_visit.pop()
+        colour, move = node.get_move()
+        row, col = move or (-1, -1)
+        right = node.has_property('C') and 'RIGHT' in node.get('C')
+        nodes.append((parent, depth, COLOURS[colour], row, col, right))
+        index = len(nodes) - 1
+        to_visit.extend((child, index, depth + 1) for child in node)
+    return problem_file, size, setup, nodes
+
+
+def mix(values):
+    """Scramble the given uint64 values (the splitmix64 finaliser)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def transform_points(rows, cols, sizes, symmetry):
+    """Vectorised version of symmetry.transform_point.
+
+    Points with negative coordinates (i.e. passes) are left as they are.
+    """
+    if symmetry & 4:
+        rows, cols = cols, rows
+    if symmetry & 1:
+        rows = np.where(rows < 0, rows, sizes - 1 - rows)
+    if symmetry & 2:
+        cols = np.where(cols < 0, cols, sizes - 1 - cols)
+    return rows, cols
+
+
+def point_codes(colours, rows, cols, sizes, symmetry, swap):
+    """Get a uint64 code for each of the given (colour, point) pairs."""
+    rows, cols = transform_points(rows, cols, sizes, symmetry)
+    if swap:
+        colours = np.where(colours > 0, 3 - colours, 0)
+    codes = (colours * 64 + rows + 1) * 64 + cols + 1
+    return codes.astype(np.uint64)
+
+
+class Library(object):
+
+    """The signatures of a whole library, packed into flat arrays."""
+
+    def __init__(self, signatures):
+        """Pack the given signatures.
+
+        :param list signatures: problem_signature results
+        """
+        signatures = [s for s in signatures if s[1] is not None]
+        self.problem_files = [s[0] for s in signatures]
+        sizes = np.array([s[1] for s in signatures], dtype=np.int64)
+
+        setup = [(i, stone) for i, s in enumerate(signatures) for stone in s[2]]
+        self.setup_problem = np.array([i for i, _ in setup], dtype=np.int64)
+        setup = np.array([stone for _, stone in setup], dtype=np.int64)
+        setup = setup.reshape(-1, 3)
+        self.setup_colour, self.setup_row, self.setup_col = setup.T
+        self.setup_size = sizes[self.setup_problem]
+
+        # make the parent indexes point into the flat arrays
+        nodes, node_problem, offset = [], [], 0
+        for i, signature in enumerate(signatures):
+            for node in signature[3]:
+                parent = node[0] + offset if node[0] >= 0 else -1
+                nodes.append((parent,) + tuple(node[1:]))
+            node_problem.extend([i] * len(signature[3]))
+            offset += len(signature[3])
+        self.node_problem = np.array(node_problem, dtype=np.int64)
+        nodes = np.array(nodes, dtype=np.int64).reshape(-1, 6)
+        (self.parent, self.depth, self.node_colour,
+         self.node_row, self.node_col, self.right) = nodes.T
+        self.node_size = sizes[self.node_problem]
+        self.sizes = sizes
+
+    def variant_hashes(self, symmetry, swap):
+        """Get the (hash, second hash) of every problem in the given variant.
+
+        :param int symmetry: which board symmetry to use
+        :param bool swap: whether the colours should be swapped
+        :returns: two uint64 arrays, with a value for each problem
+        """
+        setup = SETUP_TAG + point_codes(
+            self.setup_colour, self.setup_row, self.setup_col,
+            self.setup_size, symmetry, swap
+        )
+        moves = point_codes(
+            self.node_colour, self.node_row, self.node_col,
+            self.node_size, symmetry, swap
+        )
+
+        # hash each node's path one tree level at a time - the parents
+        # are always done by the time their children are reached
+        paths = mix(self.node_size.astype(np.uint64))
+        max_depth = int(self.depth.max()) if len(self.depth) else 0
+        for depth in xrange(1, max_depth + 1):
+            level = np.flatnonzero(self.depth == depth)
+            paths[level] = mix(paths[self.parent[level]] ^ moves[level])
+        paths = paths ^ np.where(self.right > 0, RIGHT_TAG, np.uint64(0))
+
+        hashes = []
+        for seed in (np.uint64(0), SEED):
+            problem_hashes = mix(self.sizes.astype(np.uint64) ^ seed)
+            np.add.at(problem_hashes, self.setup_problem, mix(setup ^ seed))
+            np.add.at(problem_hashes, self.node_problem, mix(paths ^ seed))
+            hashes.append(problem_hashes)
+        return hashes
+
+    def canonical_hashes(self):
+        """Get the canonical hash of each problem, as a hex string."""
+        variants = [
+            self.variant_hashes(symmetry, swap)
+            for symmetry in xrange(SYMMETRIES) for swap in (False, True)
+        ]
+        first = np.array([v[0] for v in variants])
+        second = np.array([v[1] for v in variants])
+        best = first.argmin(axis=0)
+        problems = np.arange(len(self.problem_files))
+        return [
+            '%016x%016x' % (int(a), int(b)) for a, b in
+            zip(first[best, problems], second[best, problems])
+        ]
+
+    def duplicates(self):
+        """Get all groups of problems that are the same.
+
+        :returns: {canonical hash: [problem files]}, only for groups with \
+            more than one problem
+        """
+        groups = defaultdict(list)
+        for problem_file, key in zip(self.problem_files, self.canonical_hashes()):
+            groups[key].append(problem_file)
+        return dict(
+            (key, sorted(files)) for key, files in groups.iteritems()
+            if len(files) > 1
+        )
+
+
+def find_duplicates(problems_dir, processes=None):
+    """Find all duplicated problems in the given library.
+
+    :param str problems_dir: the base directory of the library
+    :param int processes: how many processes should be used
+    :returns: {canonical hash: [problem files relative to problems_dir]}
+    """
+    problems_dir = path(problems_dir)
+    signatures = [
+        (str(problems_dir.relpathto(signature[0])),) + signature[1:]
+        for signature in map_problems(
+            problem_signature, iter_problem_files(problems_dir), processes)
+    ]
+    return Library(signatures).duplicates()
+
+
+def excluded_problems(duplicates):
+    """Get the problems that should be skipped, keeping one of each group."""
+    return sorted(
+        problem_file for files in duplicates.values() for problem_file in files[1:]
+    )
+
+
+def save_duplicates(problems_dir, duplicates):
+    """Write the duplicates report and exclusion list into the library."""
+    problems_dir = path(problems_dir)
+    with open(problems_dir / DUPLICATES_FILE, 'w') as f:
+        json.dump(duplicates, f, indent=2, sort_keys=True)
+    with open(problems_dir / EXCLUDED_FILE, 'w') as f:
+        f.writelines('%s\n' % problem for problem in excluded_problems(duplicates))
@@ -1,27 +1,36 @@
 """A goban control and a stone control, which represents a spot on the board."""
 # -*- coding: utf-8 -*-
 
+import time
 import traceback
 
+import xbmc
 import xbmcaddon
 import xbmcgui
 
 from xbmcgui import (
     ACTION_SELECT_ITEM, ACTION_PARENT_DIR, ACTION_MOUSE_LEFT_CLICK,
-    ACTION_NAV_BACK, ACTION_PAUSE,
+    ACTION_NAV_BACK, ACTION_PAUSE, ACTION_PREV_ITEM, ACTION_NEXT_ITEM,
     REMOTE_1, REMOTE_2, REMOTE_3, REMOTE_4,
     REMOTE_5, REMOTE_6, REMOTE_7, REMOTE_8, REMOTE_9,
 )
 
 from resources.lib.log_utils import log, _
 from resources.lib.grid import Grid, Tile, get_image
+from resources.lib.media import EMPTY, POINT_IMAGES, STONE_IMAGES, marker_image
 from resources.lib.board import Goban
+from resources.lib.caches import MB, registry
 from resources.lib.problems import Problems
+from resources.lib.remote import RemoteProblems
+from resources.lib.sessions import SessionRecorder
+from resources.lib import compositor
 
 SELECT = [
     ACTION_SELECT_ITEM, ACTION_PARENT_DIR, ACTION_MOUSE_LEFT_CLICK, ACTION_PAUSE
 ]
 BACK = [ACTION_NAV_BACK]
+JUMP_TO_START = [ACTION_PREV_ITEM]
+JUMP_TO_END = [ACTION_NEXT_ITEM]
 
 hoshi = {
     REMOTE_1: (3, 3),
@@ -37,6 +46,15 @@ hoshi = {
 
 addon = xbmcaddon.Addon()
 
+DATA_DIR = 'special://profile/addon_data/%s/' % addon.getAddonInfo('id')
+REVIEWS_FILE = xbmc.translatePath(DATA_DIR + 'reviews.txt')
+ATTEMPTS_FILE = xbmc.translatePath(DATA_DIR + 'attempts.txt')
+SESSIONS_DIR = xbmc.translatePath(DATA_DIR + 'sessions/')
+
+# the values of the renderer setting
+TILES_RENDERER = '0'
+IMAGE_RENDERER = '1'
+
 
 class ControlIds(object):
     """The ids of the controls defined in the xml file."""
@@ -67,7 +85,7 @@ class Stone(Tile):
             y=self.y_position,
             width=self.width,
             height=self.height,
-            filename=get_image('empty.png'),
+            filename=get_image(EMPTY),
         )
 
     @property
@@ -77,17 +95,18 @@ class Stone(Tile):
 
     def hide(self):
         """Hide all controls in this tile."""
-        self.image.setVisible(False)
+        self.grid.buffer.call(self.image, 'setVisible', False)
         self.set_marker(None)
 
     def mark(self, mark_type=''):
         """Mark this stone with the given marker."""
         self._mark = mark_type
 
-    def set_player(self, player):
+    def set_player(self, player, hint=None):
         """Place the given player's stone
 
-        :param (str or None) player: the player who moved, or None to clear"""
+        :param (str or None) player: the player who moved, or None to clear
+        :param (str or None) hint: the hint to be shown on an empty spot"""
         if player == 'w':
             self.player = 'white'
         elif player == 'b':
@@ -95,27 +114,20 @@ class Stone(Tile):
         elif not player:
             self.player = None
 
-        if self.player:
-            if self._mark:
-                stone = '%s_%s.png' % (self.player, self._mark)
-            else:
-                stone = '%s.png' % self.player
+        if hint and not self.player:
+            self.set_marker(hint)
         else:
-            stone = 'empty.png'
-
-        self.set_image(stone)
+            self.set_image(STONE_IMAGES[self.player, self._mark])
 
     def set_marker(self, marker):
         """Set the appropriate marker on this spot.
 
         :param str or None marker: the code of the marker to be placed
         """
-        if not marker:
-            stone = 'empty.png'
-        elif marker in ['good', 'bad']:
-            stone = '%s_spot.png' % marker if not self.player else self.stone
+        if marker in ['good', 'bad'] and self.player:
+            stone = self.stone
         else:
-            stone = '%s.png' % marker
+            stone = marker_image(marker)
 
         self.set_image(stone)
 
@@ -126,7 +138,48 @@ class Stone(Tile):
             stone = self.stone
         else:
             self.stone = stone
-        self.image.setImage(get_image(stone))
+        self._draw(stone)
+
+    def _draw(self, stone):
+        """Display the given image on this spot."""
+        self.grid.buffer.call(self.image, 'setImage', get_image(stone))
+
+
+class CompositedStone(Stone):
+
+    """A spot on the goban that is drawn onto the grid's board image.
+
+    These don't have any controls of their own - all changes are collected
+    by the grid's compositor and shown when the board is flushed.
+    """
+
+    def add_controls(self):
+        """Draw an empty spot, as there are no controls to add."""
+        self.image = None
+        self._draw(EMPTY)
+
+    @property
+    def controls(self):
+        """Composited stones don't have any controls."""
+        return []
+
+    def hide(self):
+        """Remove this stone from the board image."""
+        self.set_marker(None)
+        self.grid.compositor.remove_cell(self.pos)
+
+    def reposition(self, x, y, width, height):
+        """Move this stone, redrawing it in its new place."""
+        self.set_position(x, y, width, height)
+        self._draw(self.stone or EMPTY)
+
+    def _draw(self, stone):
+        """Draw the given image onto the board image."""
+        box = (
+            self.x_position - self.grid.y, self.y_position - self.grid.x,
+            self.width, self.height,
+        )
+        self.grid.compositor.set_cell(self.pos, box, stone)
 
 
 class GobanGrid(Grid, Goban):
@@ -136,6 +189,16 @@ class GobanGrid(Grid, Goban):
     def __init__(self, *args, **kwargs):
         """init this grid."""
         self.comments_box = None
+        # the hints that are currently drawn on the board
+        self.shown_hints = {}
+        try:
+            registry.budget = int(addon.getSetting('cache_size')) * MB
+        except ValueError:
+            pass
+        self.recorder = SessionRecorder(
+            SESSIONS_DIR + time.strftime('%Y%m%d-%H%M%S.log')
+            if addon.getSetting('record_sessions') == 'true' else None)
+        kwargs['rng'] = self.recorder.rng()
         self.load_problems(
             problems_dir=kwargs.pop(
                 'problems_dir', addon.getSetting('problems_dir')),
@@ -143,15 +206,75 @@ class GobanGrid(Grid, Goban):
         )
         super(GobanGrid, self).__init__(*args, **kwargs)
 
+    def add_controls(self):
+        """Add the grid's controls, and the board image if it's to be used."""
+        super(GobanGrid, self).add_controls()
+        self.compositor = None
+        if addon.getSetting('renderer') != IMAGE_RENDERER:
+            return
+        elif not compositor.available():
+            log('PIL not found - the board will be drawn with tiles')
+            return
+
+        # tiles are positioned with their axes swapped, so the image must be too
+        self.compositor = compositor.Compositor(
+            (self.height, self.width),
+            xbmc.translatePath('special://temp/'),
+            get_image,
+            atlas=compositor.Atlas(POINT_IMAGES, get_image),
+        )
+        self.board_image = xbmcgui.ControlImage(
+            x=self.y,
+            y=self.x,
+            width=self.height,
+            height=self.width,
+            filename='',
+        )
+
+    @property
+    def tile_controls(self):
+        """Get the controls of all stones, or the board image if used."""
+        if self.compositor:
+            return [self.board_image]
+        return super(GobanGrid, self).tile_controls
+
+    def setup_tiles(self, window, right_control):
+        """Setup all stones in this grid, showing them on the board image."""
+        super(GobanGrid, self).setup_tiles(window, right_control)
+        self.flush_board()
+
+    def remove_tiles(self, window):
+        """Remove all tiles from this grid, along with the board image."""
+        super(GobanGrid, self).remove_tiles(window)
+        if self.compositor:
+            self.compositor.clear()
+
+    def flush_board(self):
+        """Show all changes to the stones on the board image."""
+        if not self.compositor:
+            return
+        image_file = self.compositor.render()
+        if image_file:
+            self.buffer.call(self.board_image, 'setImage', image_file)
+
     def load_problems(self, problems_dir, rank=None):
         """Load all problems found in the given directory.
 
+        If a problem server is set, the problems come from it instead.
+
         :param str problems_dir: where to look for tsumego
         :param str rank: the current rank of the user.
         """
         if not rank and self.problems:
             rank = self.problems.pretty_rank
-        self.problems = Problems(problems_dir, rank)
+        server_url = addon.getSetting('problems_server')
+        if server_url:
+            self.problems = RemoteProblems(
+                server_url, rank, REVIEWS_FILE, ATTEMPTS_FILE)
+        else:
+            self.problems = Problems(
+                problems_dir, rank, REVIEWS_FILE, ATTEMPTS_FILE,
+                self.recorder.rng())
 
     def setup_labels(self):
         """Set up all status messages and the comments box."""
@@ -185,7 +308,8 @@ class GobanGrid(Grid, Goban):
         :param int x: the column in which this stone is
         :param int y: the row that the stone is in
         """
-        stone = Stone(x, y, self, self.tile_width, self.tile_height)
+        stone_class = CompositedStone if self.compositor else Stone
+        stone = stone_class(x, y, self, self.tile_width, self.tile_height)
         if self.board:
             stone.set_marker(self.board.board[x][y])
         return stone
@@ -196,15 +320,17 @@ class GobanGrid(Grid, Goban):
             log('No grid found during board refresh', log.LOGDEBUG)
             return
 
-        self.position_marker.setImage(
+        self.buffer.call(
+            self.position_marker, 'setImage',
             get_image("shadow_%s.png" % self.next_player_name))
         self.update_messages()
         self.update_labels()
         self.update_comment()
 
         # refresh all points
-        for x in xrange(self.game.get_size()):
-            for y in xrange(self.game.get_size()):
+        hints = self.hint_overlay() if self.hints else {}
+        for x in xrange(self.size):
+            for y in xrange(self.size):
                 pos = (x, y)
                 if pos in self.marks:
                     self.grid[x][y].mark('mark')
@@ -218,23 +344,25 @@ class GobanGrid(Grid, Goban):
                     self.grid[x][y].mark('mark')
                 else:
                     self.grid[x][y].mark()
-                self.grid[x][y].set_player(self.board.board[x][y])
-        self.mark_hints()
+                self.grid[x][y].set_player(
+                    self.board.board[x][y], hints.get(pos))
+        self.shown_hints = hints
+        self.flush_board()
 
     def set_size(self, size):
         """Set the board size and refresh what is displayed."""
         if size <= 9:
             actual_size = 9
             if self.rows > 9:
-                self.window.getControl(ControlIds.goban).setImage('goban9.png')
+                self.set_goban_image('goban9.png')
         elif 9 < size <= 13:
             actual_size = 13
             if 9 <= self.rows or self.rows > 13:
-                self.window.getControl(ControlIds.goban).setImage('goban13.png')
+                self.set_goban_image('goban13.png')
         elif size > 13:
             actual_size = 19
             if 13 <= self.rows:
-                self.window.getControl(ControlIds.goban).setImage('goban19.png')
+                self.set_goban_image('goban19.png')
 
         super(GobanGrid, self).set_size(actual_size)
         # if the board is irregular (i.e. not 9x9, 13x13 or 19x19), make sure
@@ -251,6 +379,12 @@ class GobanGrid(Grid, Goban):
                 for p2 in xrange(size, actual_size):
                     self.grid[p1][p2].set_marker('wall')
                     self.grid[p2][p1].set_marker('wall')
+        self.flush_board()
+
+    def set_goban_image(self, image):
+        """Change the image of the board behind the stones."""
+        self.buffer.call(
+            self.window.getControl(ControlIds.goban), 'setImage', image)
 
     def load(self, sgf=None):
         """Load the given SGF, or reload the current one if none provided.
@@ -258,11 +392,17 @@ class GobanGrid(Grid, Goban):
         :param (str or None) sgf: the SGF to be loaded
         """
         super(Grid, self).load(sgf)
-        if self.game:
+        if self.tree:
             self.reset()
-            self.set_size(self.game.get_size())
+            self.set_size(self.size)
             self.refresh_board()
 
+    def restart(self):
+        """Start the current problem again."""
+        started = self.recorder.clock()
+        self.load(self.sgf)
+        self.recorder.record('restart', started=started)
+
     def next(self):
         """Load the next problem.
 
@@ -270,21 +410,7 @@ class GobanGrid(Grid, Goban):
         """
         # loop over problems until a good one is found
         for problem in self.problems:
-            self.problem = problem
-            try:
-                self.load(self.problem['sgf'])
-            except (ValueError, IndexError):
-                traceback.print_exc()
-            else:
-                self.current_rank.setText(
-                    _('current_rank') % self.problems.rank)
-                if self.problem.get('rank'):
-                    rating = self.problem.get('rating') or 0
-                    rank_value, rank = self.problem.get('rank')
-                    self.rating_box.setText(
-                        _('rating') % (rating, rank_value, rank))
-                else:
-                    self.rating_box.setText('')
+            if self.show_problem(problem):
                 return
         else:
             level = self.problems.level
@@ -292,13 +418,46 @@ class GobanGrid(Grid, Goban):
                 lambda rank: '%d %s' % rank,
                 map(self.problems.get_rank, [level + 3, level - 3])
             )
-            self.comments_box.setText(_('no_problems_found') % tuple(ranks))
+            self.buffer.call(
+                self.comments_box, 'setText',
+                _('no_problems_found') % tuple(ranks))
+
+    def show_problem(self, problem):
+        """Load the given problem onto the board.
+
+        :param dict problem: the problem, with its SGF
+        :returns: whether the problem could be loaded
+        """
+        self.problem = problem
+        started = self.recorder.clock()
+        try:
+            self.load(self.problem['sgf'])
+        except (ValueError, IndexError):
+            traceback.print_exc()
+            return False
+        if problem.get('problem_file'):
+            self.recorder.record(
+                'problem', self.problems.problem_key(problem['problem_file']),
+                started=started)
+
+        self.buffer.call(
+            self.current_rank, 'setText',
+            _('current_rank') % self.problems.rank)
+        if self.problem.get('rank'):
+            rating = self.problem.get('rating') or 0
+            rank_value, rank = self.problem.get('rank')
+            rating = _('rating') % (rating, rank_value, rank)
+        else:
+            rating = ''
+        self.buffer.call(self.rating_box, 'setText', rating)
+        return True
 
     def reset(self):
         """Reset the board."""
         self.hints = False
-        self.position_marker.setImage(
-        get_image("shadow_%s.png" % self.next_player_name))
+        self.buffer.call(
+            self.position_marker, 'setImage',
+            get_image("shadow_%s.png" % self.next_player_name))
         self.update_messages()
         self.update_labels()
 
@@ -312,9 +471,11 @@ class GobanGrid(Grid, Goban):
             return
 
         if solved:
-            self.problems.success(self.problem['rank'], weight)
+            self.problems.success(
+                self.problem['rank'], weight, self.problem.get('problem_file'))
         else:
-            self.problems.failure(self.problem['rank'], weight)
+            self.problems.failure(
+                self.problem['rank'], weight, self.problem.get('problem_file'))
         self.problem['solved'] = solved
         addon.setSetting('level', self.problems.pretty_rank)
 
@@ -325,8 +486,11 @@ class GobanGrid(Grid, Goban):
         :returns: whether or not hints are shown
         """
         self.problem_solved(False, 0.4)
+        started = self.recorder.clock()
         self.hints = state if state is not None else not self.hints
-        self.refresh_board()
+        self.update_hints()
+        self.flush_board()
+        self.recorder.record('hints', int(self.hints), started=started)
         return self.hints
 
     def update_comment(self, comment=None):
@@ -343,35 +507,47 @@ class GobanGrid(Grid, Goban):
 
         if comment is None:
             comment = self.current_comment.replace('FORCE', '').replace('RIGHT', '')  # noqa
-        self.comments_box.setText(comment)
+        self.buffer.call(self.comments_box, 'setText', comment)
 
     def update_messages(self):
         """Update the status messages' visibility."""
-        self.error_control.setVisible(bool(self.board and not self.on_path))
-        self.success_control.setVisible(bool(self.board and self.correct))
-
-    def mark_hints(self):
-        """Mark all hints on the board."""
-        if not self.hints:
-            return
-
-        def mark_node(node, mark=None):
-            """Mark a single hint on the board.
+        self.buffer.call(
+            self.error_control, 'setVisible', bool(self.board and not self.on_path))
+        self.buffer.call(
+            self.success_control, 'setVisible', bool(self.board and self.correct))
 
-            :param str mark: what the marker should be
-            """
-            _, (x, y) = node.get_move()
-            self.grid[x][y].set_marker(mark)
+    def update_hints(self):
+        """Show the hints of the current node, if hints are on.
 
-        # get rid of any previous markers - the grandparent must be used,
-        # because the parent is automatically placed and has no hints
-        if self.node.parent and self.node.parent.parent:
-            for node in filter(lambda v: v != self.node, self.node.parent.parent):
-                _, (x, y) = node.get_move()
-                self.grid[x][y].set_image()
-
-        for child in self.node:
-            mark_node(child, 'good' if self.correct_path(child) else 'bad')
+        Only the points where the shown hints differ from the current node's
+        ones get redrawn.
+        """
+        hints = self.hint_overlay() if self.hints else {}
+        shown = self.shown_hints
+        for x, y in set(shown) | set(hints):
+            if shown.get((x, y)) != hints.get((x, y)):
+                self.grid[x][y].set_player(
+                    self.board.board[x][y], hints.get((x, y)))
+        self.shown_hints = hints
+
+    def jump(self, move_number):
+        """Go to the given move of the current line, redrawing the board once.
+
+        Looking through the solution counts as not solving the problem, but
+        jumps that go nowhere (e.g. to the start when already there) don't.
+
+        :param int move_number: the number of moves from the start
+        :returns: whether the current node changed
+        """
+        if not self.board:
+            return False
+        started = self.recorder.clock()
+        if super(GobanGrid, self).jump(move_number):
+            self.problem_solved(False)
+            self.refresh_board()
+            self.recorder.record('jump', move_number, started=started)
+            return True
+        return False
 
     def handle_key(self, key):
         """Handle the given key.
@@ -381,20 +557,32 @@ class GobanGrid(Grid, Goban):
         """
         if not self.board:
             return
+        started = self.recorder.clock()
         if key in SELECT:
-            self.move(*self.current.pos)
-            self.random_move()
+            reply = self.play(*self.current.pos)
             if self.correct:
                 self.problem_solved(True)
+            self.refresh_board()
+            self.recorder.record(
+                'move', *self.current.pos + (reply or ()), started=started)
+            return True
         elif key in BACK:
             self.problem_solved(False)
-            if not self.correct and self.on_path:
-                self.back()
-            self.back()
+            self.take_back()
+            self.refresh_board()
+            self.recorder.record('back', started=started)
+            return True
+        elif key in JUMP_TO_START:
+            self.jump_to_start()
+            return True
+        elif key in JUMP_TO_END:
+            self.jump_to_end()
+            return True
         elif key in hoshi:
             x, y = hoshi[key]
             self.current = self.grid[x][y]
-            self.position_marker.setPosition(*self.current.display_pos)
+            self.buffer.call(
+                self.position_marker, 'setPosition', *self.current.display_pos)
         else:
             return False
         self.refresh_board()
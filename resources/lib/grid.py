@@ -5,6 +5,8 @@ import xbmc
 import xbmcaddon
 import xbmcgui
 from resources.lib.log_utils import log
+from resources.lib.gui_buffer import CommandBuffer
+from resources.lib.media import Textures
 
 from xbmcgui import (
     ACTION_MOVE_DOWN, ACTION_MOVE_LEFT, ACTION_MOVE_RIGHT, ACTION_MOVE_UP,
@@ -22,10 +24,11 @@ MEDIA_PATH = os.path.join(
     'default',
     'media'
 )
+TEXTURES = Textures(MEDIA_PATH)
 
 
 def get_image(filename):
-    return os.path.join(MEDIA_PATH, filename)
+    return TEXTURES[filename]
 
 
 class Tile(object):
@@ -72,11 +75,12 @@ class Tile(object):
 
     def reposition(self, x, y, width, height):
         self.set_position(x, y, width, height)
+        buffer = self.grid.buffer
         for control in self.controls:
-            control.setHeight(self.height)
-            control.setWidth(self.width)
-            control.setPosition(self.x_position, self.y_position)
-            control.setVisible(True)
+            buffer.call(control, 'setHeight', self.height)
+            buffer.call(control, 'setWidth', self.width)
+            buffer.call(control, 'setPosition', self.x_position, self.y_position)
+            buffer.call(control, 'setVisible', True)
 
     @property
     def pos(self):
@@ -107,6 +111,7 @@ class Grid(object):
         self.current = None
         self.right = None
         self.window = None
+        self.buffer = CommandBuffer()
         self.add_controls()
         super(Grid, self).__init__(*args, **kwargs)
 
@@ -173,10 +178,9 @@ class Grid(object):
 
         # this is done this way as opposed to doing it during tile
         # creation, because it was sloooowwwww
-        tile_controls = [c for row in self.grid for tile in row for c in tile.controls]
         controls = [self.position_marker, self.control]
 
-        window.addControls(tile_controls + controls)
+        window.addControls(self.tile_controls + controls)
 
         # connect the control to the right with this grid
         right_control.controlLeft(self.control)
@@ -186,6 +190,11 @@ class Grid(object):
         self.setup_labels()
         self.update_labels()
 
+    @property
+    def tile_controls(self):
+        """Get the controls of all tiles."""
+        return [c for row in self.grid for tile in row for c in tile.controls]
+
     def update_labels(self):
         """Add any labels, removing the old ones if found."""
         try:
@@ -203,9 +212,9 @@ class Grid(object):
 
         :param xbmcgui.Window: the window that the controls were attached to
         """
-        tile_controls = [c for row in self.grid for tile in row for c in tile.controls]
-        controls = [self.position_marker, self.control]
-        window.removeControls(tile_controls + controls + self.label_controls)
+        controls = self.tile_controls + [self.position_marker, self.control]
+        self.buffer.discard(controls)
+        window.removeControls(controls + self.label_controls)
         self.grid = []
 
     @property
@@ -246,8 +255,12 @@ class Grid(object):
         self.select(self.grid[current_x][current_y])
 
         for control in self.control, self.position_marker:
-            control.setWidth(self.tile_width)
-            control.setHeight(self.tile_height)
+            self.buffer.call(control, 'setWidth', self.tile_width)
+            self.buffer.call(control, 'setHeight', self.tile_height)
+
+    def flush(self):
+        """Send all buffered changes to Kodi."""
+        self.buffer.flush()
 
     def at(self, row, column):
         return self.grid[row % self.rows][column % self.columns]
@@ -258,7 +271,8 @@ class Grid(object):
         :param Tile tile: the current tile.
         """
         self.current = tile
-        self.position_marker.setPosition(*self.current.display_pos)
+        self.buffer.call(
+            self.position_marker, 'setPosition', *self.current.display_pos)
         if self.current.y == self.size[1] - 1:
               self.control.controlRight(self.right)
 
@@ -0,0 +1,69 @@
+"""Collects calls to Kodi controls, so that they can be sent in one go.
+
+Each call to a control goes across to Kodi's C++ side and can cause the
+control to be redrawn, and a single move can change hundreds of them. The
+calls made while handling an action are therefore buffered, with repeated
+calls of the same method on the same control merged so that only the last
+one is made, and then all sent at once when the action has been handled.
+"""
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+try:
+    from xbmcgui import lock, unlock
+except ImportError:
+    # outside of Kodi, or in versions that no longer have the GUI lock
+    lock = unlock = lambda: None
+
+
+class CommandBuffer(object):
+
+    """A buffer of control method calls."""
+
+    def __init__(self):
+        # {(control id, method): (control, method, args)}
+        self.commands = OrderedDict()
+
+    def __len__(self):
+        return len(self.commands)
+
+    def call(self, control, method, *args):
+        """Buffer a call of the given control's method.
+
+        Any previous call of the same method on the same control is dropped,
+        as it would be overwritten anyway.
+
+        :param control: the Kodi control to be changed
+        :param str method: the name of the method, e.g. 'setImage'
+        :param args: the arguments that the method should be called with
+        """
+        key = (id(control), method)
+        self.commands.pop(key, None)
+        self.commands[key] = (control, method, args)
+
+    def discard(self, controls):
+        """Drop any buffered calls of the given controls.
+
+        This should be used when controls are removed from the window.
+        """
+        ids = set(id(control) for control in controls)
+        for key in [key for key in self.commands if key[0] in ids]:
+            del self.commands[key]
+
+    def flush(self):
+        """Make all buffered calls, while holding the GUI lock.
+
+        :returns: how many calls were made
+        """
+        if not self.commands:
+            return 0
+
+        commands, self.commands = self.commands, OrderedDict()
+        lock()
+        try:
+            for control, method, args in commands.itervalues():
+                getattr(control, method)(*args)
+        finally:
+            unlock()
+        return len(commands)
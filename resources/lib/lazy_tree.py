@@ -0,0 +1,219 @@
+"""A compiled tree that only parses the variations that are actually visited.
+
+The root sequence is parsed when the problem is loaded, but each variation
+is only kept as its offsets in the SGF text until its parent's children are
+first needed - i.e. when the player gets there or asks for hints. Whether a
+variation contains a correct solution is found by looking for 'RIGHT' in
+its text, without parsing it. Only the brackets of the whole tree are
+checked when loading, so loading takes about as long whatever the size of
+the tree. A variation that turns out to be broken once it's reached is left
+out, so that playing there is just like playing off the tree.
+
+Batch jobs that need the whole tree anyway can have it parsed in one go.
+Either way, SGFs with properties that the parser doesn't know are loaded
+through gomill instead.
+"""
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+
+from gomill import boards, sgf, sgf_moves
+
+from resources.lib.compiled_tree import (
+    CompiledTree, pack_move, CORRECT_PATH, ORIGINAL,
+)
+from resources.lib.sgf_parser import (
+    DEFAULT_SIZE, SUPPORTED_PROPERTIES, board_size, find_game, iter_nodes,
+    labels, parse_sequence, point, point_list, text_value,
+    unsupported_properties,
+)
+
+# moves anywhere in the text, used to find the problem's region unparsed
+move_parser = re.compile(r'(?<![A-Za-z])[BW]\[([a-z]{0,2})\]')
+POINT_MARKUP = ('MA', 'TR', 'SQ', 'CR')
+
+
+def node_data(properties, size):
+    """Interpret the given node properties.
+
+    :param dict properties: {property: [raw values]}
+    :param int size: the size of the board
+    :returns: a (move code, comment, markup) tuple
+    """
+    colour, move = None, None
+    for prop in ('B', 'W'):
+        if prop in properties:
+            colour, move = prop.lower(), point(properties[prop][0], size)
+
+    comment = text_value(properties['C'][0]) if 'C' in properties else ''
+    markup = {}
+    if 'LB' in properties:
+        markup['LB'] = tuple(labels(properties['LB'], size))
+    for prop in POINT_MARKUP:
+        if prop in properties:
+            markup[prop] = frozenset(point_list(properties[prop], size))
+    return pack_move(colour, move), comment, markup
+
+
+class LazyTree(CompiledTree):
+
+    """A compiled tree whose variations are parsed when first needed."""
+
+    def __init__(self, text=''):
+        super(LazyTree, self).__init__()
+        self.text = text
+        self.size = DEFAULT_SIZE
+        self.root_properties = {}
+        # {node index: [(start, end) offsets of its unparsed variations]}
+        self.pending = {}
+
+    @classmethod
+    def from_string(cls, text, lazy=True):
+        """Parse the given SGF.
+
+        :param str text: the SGF text
+        :param boolean lazy: whether to only parse the root sequence. If \
+            not, the whole tree is parsed at once
+        :raises ValueError: if the SGF can't be parsed, or uses properties \
+            that aren't supported
+        """
+        if not lazy:
+            return cls.parse_all(text)
+        unsupported = unsupported_properties(text)
+        if unsupported:
+            raise ValueError(
+                'unsupported properties: %s' % ', '.join(sorted(unsupported)))
+        tree = cls(text)
+        nodes, variations = parse_sequence(text, find_game(text))
+        tree.root_properties = nodes[0]
+        tree.size = board_size(nodes[0])
+        tree.add_sequence(-1, tree.sequence_data(nodes), variations)
+        return tree
+
+    @classmethod
+    def parse_all(cls, text):
+        """Parse the whole SGF in a single pass.
+
+        :raises ValueError: if the SGF can't be parsed, or uses properties \
+            that aren't supported
+        """
+        tree = cls(text)
+        for parent, properties in iter_nodes(text):
+            if not SUPPORTED_PROPERTIES.issuperset(properties):
+                raise ValueError('unsupported properties: %s' % ', '.join(
+                    sorted(set(properties) - SUPPORTED_PROPERTIES)))
+            if parent < 0:
+                tree.root_properties = properties
+                tree.size = board_size(properties)
+            tree.add_node(
+                parent, *node_data(properties, tree.size), flags=ORIGINAL)
+        tree.mark_correct_paths()
+        return tree
+
+    def sequence_data(self, nodes):
+        """Interpret the properties of the given sequence of nodes.
+
+        :returns: a list of (move code, comment, markup) tuples
+        :raises ValueError: if any node is malformed
+        """
+        return [node_data(properties, self.size) for properties in nodes]
+
+    def setup_board(self):
+        """Get a gomill board with the root node's setup stones.
+
+        :raises ValueError: if the setup position isn't legal
+        """
+        board = boards.Board(self.size)
+        setup = [
+            point_list(self.root_properties.get(prop, []), self.size)
+            for prop in ('AB', 'AW', 'AE')
+        ]
+        if not board.apply_setup(*setup):
+            raise ValueError('setup position not legal')
+        return board
+
+    def add_sequence(self, parent, nodes, variations):
+        """Add the given sequence of nodes, noting where its variations are.
+
+        :param int parent: the node that the sequence follows
+        :param list nodes: the data of the sequence's nodes, as given by \
+            `sequence_data`
+        :param list variations: the offsets of the sequence's variations
+        """
+        for data in nodes:
+            parent = self.add_node(parent, *data, flags=ORIGINAL)
+            if self.flags[parent] & CORRECT_PATH:
+                self.mark_correct(parent)
+
+        if variations:
+            self.pending[parent] = variations
+            if any(self.text.find('RIGHT', start, end) >= 0
+                   for start, end in variations):
+                self.mark_correct(parent)
+
+    def mark_correct(self, index):
+        """Flag the given node and its ancestors as leading to a solution."""
+        self.flags[index] |= CORRECT_PATH
+        index = self.parent[index]
+        while index >= 0 and not self.flags[index] & CORRECT_PATH:
+            self.flags[index] |= CORRECT_PATH
+            index = self.parent[index]
+
+    def expand(self, index):
+        """Parse the variations that follow the given node, if not yet done.
+
+        Variations that can't be parsed are logged and left out.
+        """
+        variations = self.pending.pop(index, None)
+        if not variations:
+            return
+        for start, _ in variations:
+            try:
+                nodes, children = parse_sequence(self.text, start)
+                nodes = self.sequence_data(nodes)
+            except ValueError as e:
+                logging.warning('Skipping broken variation at %d: %s', start, e)
+                continue
+            self.add_sequence(index, nodes, children)
+
+    def count_children(self, index):
+        self.expand(index)
+        return super(LazyTree, self).count_children(index)
+
+    def iter_children(self, index):
+        self.expand(index)
+        return super(LazyTree, self).iter_children(index)
+
+    def find_child(self, index, point):
+        self.expand(index)
+        return super(LazyTree, self).find_child(index, point)
+
+    def move_points(self):
+        """Get the points of all moves in the SGF, parsed or not."""
+        points = []
+        for value in move_parser.findall(self.text):
+            try:
+                points.append(point(value, self.size))
+            except ValueError:
+                continue
+        return filter(None, points)
+
+
+def load_tree(sgf_string, lazy=True):
+    """Load the given SGF, as quickly as possible.
+
+    SGFs that the small parser can't handle are parsed by gomill.
+
+    :param str sgf_string: the SGF text
+    :param boolean lazy: whether variations should only be parsed once needed
+    :returns: a (compiled tree, board with the setup stones, board size) tuple
+    :raises ValueError: if the SGF can't be loaded
+    """
+    try:
+        tree = LazyTree.from_string(sgf_string, lazy)
+        return tree, tree.setup_board(), tree.size
+    except ValueError:
+        game = sgf.Sgf_game.from_string(sgf_string)
+        board, _ = sgf_moves.get_setup_and_moves(game)
+        return CompiledTree.from_game(game), board, game.get_size()
@@ -0,0 +1,163 @@
+"""Helpers for the offline tools that work on a whole problem library."""
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from multiprocessing import Pool
+
+from gomill import sgf, sgf_moves
+from path import path
+
+from resources.lib.compiled_tree import CompiledTree
+from resources.lib.lazy_tree import LazyTree, load_tree
+from resources.lib.storage import is_problem_file, read_sgf
+
+
+def iter_problem_files(problems_dir):
+    """Get all SGF files in the given library, in a stable order.
+
+    Compressed problems are included.
+
+    :param str problems_dir: the base directory of the library
+    :rtype: list of path.path
+    """
+    return sorted(
+        f for f in path(problems_dir).walkfiles() if is_problem_file(f))
+
+
+def load_problem(problem_file):
+    """Parse the given problem file.
+
+    :param str problem_file: the SGF file to be parsed
+    :returns: a (gomill game, board after the setup stones) tuple
+    :raises ValueError: if the SGF can't be parsed
+    :raises IOError: if the file can't be read
+    """
+    game = sgf.Sgf_game.from_string(read_sgf(problem_file))
+    board, _ = sgf_moves.get_setup_and_moves(game)
+    return game, board
+
+
+def compile_problem(problem_file):
+    """Parse the whole of the given problem file into a compiled tree.
+
+    This is a lot quicker than `load_problem`, as gomill is only used for
+    SGFs that the small parser can't handle.
+
+    :param str problem_file: the SGF file to be parsed
+    :returns: a (compiled tree, board after the setup stones, size) tuple
+    :raises ValueError: if the SGF can't be parsed
+    :raises IOError: if the file can't be read
+    """
+    return load_tree(read_sgf(problem_file), lazy=False)
+
+
+def _gomill_tree(sgf_string):
+    """Load the given SGF the way it was done before the small parser."""
+    game = sgf.Sgf_game.from_string(sgf_string)
+    sgf_moves.get_setup_and_moves(game)
+    return CompiledTree.from_game(game)
+
+
+LOADERS = (
+    ('gomill', _gomill_tree),
+    ('parsed', lambda sgf_string: load_tree(sgf_string, lazy=False)),
+    ('lazy', load_tree),
+)
+
+
+def benchmark_loading(problem_files, repeat=3):
+    """Time how long it takes to load the given problems in various ways.
+
+    The files are read beforehand, so only parsing is timed. Each way is
+    timed a couple of times, with the best time being kept.
+
+    :param list problem_files: the problems to be loaded
+    :param int repeat: how many times to load all the problems
+    :returns: a ([(loader name, seconds, failures)], fallbacks) tuple, where \
+        fallbacks is how many problems the small parser couldn't handle
+    """
+    sgf_strings = []
+    for problem_file in problem_files:
+        try:
+            sgf_strings.append(read_sgf(problem_file))
+        except (IOError, ValueError) as e:
+            logging.warning('Could not read %s: %s', problem_file, e)
+
+    results = []
+    for name, loader in LOADERS:
+        best, failures = None, 0
+        for _ in xrange(repeat):
+            failures = 0
+            start = time.time()
+            for sgf_string in sgf_strings:
+                try:
+                    loader(sgf_string)
+                except ValueError:
+                    failures += 1
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append((name, best, failures))
+
+    fallbacks = 0
+    for sgf_string in sgf_strings:
+        try:
+            LazyTree.parse_all(sgf_string).setup_board()
+        except ValueError:
+            fallbacks += 1
+    return results, fallbacks
+
+
+def walk_tree(node, board, node_path=()):
+    """Replay all variations from the given node.
+
+    Variations that contain an illegal move are skipped from that move on.
+
+    :param node: the gomill (or compiled) node to start from. Its move must \
+        already be on the board
+    :param board: the gomill board with the node's position
+    :param tuple node_path: the child indexes that lead to the node
+    :returns: a generator of (node, board, node path) tuples, starting with \
+        the provided node
+    """
+    yield node, board, node_path
+    for i, child in enumerate(node):
+        colour, move = child.get_move()
+        child_board = board
+        if move:
+            child_board = board.copy()
+            try:
+                child_board.play(move[0], move[1], colour)
+            except ValueError:
+                logging.info('Illegal move %s at %s', move, node_path + (i,))
+                continue
+        for result in walk_tree(child, child_board, node_path + (i,)):
+            yield result
+
+
+def map_problems(func, problem_files, processes=None, chunksize=16):
+    """Apply the given function to all problem files.
+
+    The function must be picklable (i.e. defined on a module level), as it
+    is run in a process pool. Results are yielded as they come, so their
+    order is not defined.
+
+    :param func: the function that is to process a single problem file
+    :param list problem_files: the problem files to be processed
+    :param int processes: how many processes to use. 1 runs everything in \
+        this process, None uses all cores
+    :param int chunksize: how many files to send to a worker at a time
+    """
+    if processes == 1:
+        for problem_file in problem_files:
+            yield func(problem_file)
+        return
+
+    pool = Pool(processes)
+    try:
+        for result in pool.imap_unordered(func, problem_files, chunksize):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -18,6 +18,15 @@ STRINGS = {
     'rating': 32014,
     'no_problems_found': 32020,
     'get_problems_dir': 32021,
+    'browse_problems': 32025,
+    'browser_not_ready': 32026,
+    'rank_problems': 32027,
+    'previous_page': 32028,
+    'next_page': 32029,
+    'jump_to_move': 32030,
+    'search_problems': 32031,
+    'no_matches': 32032,
+    'search_results': 32033,
 }
 
 
@@ -0,0 +1,71 @@
+"""Tables of the images used to draw the board.
+
+The name of each image depends only on what is at a point, so all of them
+are worked out once, rather than every time a point gets redrawn.
+"""
+# -*- coding: utf-8 -*-
+
+import os
+
+PLAYERS = ('black', 'white')
+MARKS = ('mark', 'triangle', 'square', 'circle')
+MARKERS = ('good', 'bad', 'wall')
+
+EMPTY = 'empty.png'
+
+# {(player, mark): image} - empty points don't show any marks
+STONE_IMAGES = dict(
+    ((None, mark), EMPTY) for mark in ('',) + MARKS
+)
+STONE_IMAGES.update(((player, ''), '%s.png' % player) for player in PLAYERS)
+STONE_IMAGES.update(
+    ((player, mark), '%s_%s.png' % (player, mark))
+    for player in PLAYERS for mark in MARKS
+)
+
+# {marker: image} for markers on empty points
+MARKER_IMAGES = {
+    None: EMPTY,
+    '': EMPTY,
+    'good': 'good_spot.png',
+    'bad': 'bad_spot.png',
+    'wall': 'wall.png',
+}
+
+# all images that can be displayed at a point
+POINT_IMAGES = sorted(set(STONE_IMAGES.values()) | set(MARKER_IMAGES.values()))
+
+
+def marker_image(marker):
+    """Get the image of the given marker on an empty point."""
+    try:
+        return MARKER_IMAGES[marker]
+    except KeyError:
+        return '%s.png' % marker
+
+
+class Textures(object):
+
+    """The full paths of all media files, resolved once."""
+
+    def __init__(self, media_path):
+        """Find all media files.
+
+        :param str media_path: the directory containing the media files
+        """
+        self.media_path = media_path
+        try:
+            filenames = os.listdir(media_path)
+        except OSError:
+            filenames = []
+        self.paths = dict(
+            (filename, os.path.join(media_path, filename))
+            for filename in filenames
+        )
+
+    def __getitem__(self, filename):
+        try:
+            return self.paths[filename]
+        except KeyError:
+            self.paths[filename] = os.path.join(self.media_path, filename)
+            return self.paths[filename]
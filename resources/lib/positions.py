@@ -0,0 +1,116 @@
+"""A transposition index of all positions that appear in a problem library."""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from collections import defaultdict
+
+from path import path
+
+from resources.lib.board_array import from_boards, position_hashes
+from resources.lib.library import (
+    compile_problem, iter_problem_files, map_problems, walk_tree,
+)
+from resources.lib.symmetry import swap_colour
+
+INDEX_FILE = 'positions.json'
+
+
+def problem_positions(problem_file):
+    """Get the hashes of all positions reachable in the given problem.
+
+    :param str problem_file: the SGF file to be checked
+    :returns: (problem file, [(position hash, node path), ...]). The list \
+        is None if the problem couldn't be loaded
+    """
+    try:
+        tree, board, _ = compile_problem(problem_file)
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_file, None
+
+    boards, to_play, node_ids = [], [], []
+    for node, node_board, node_path in walk_tree(tree.root, board):
+        colour, _ = node.get_move()
+        boards.append(node_board)
+        to_play.append(swap_colour(colour) if colour else None)
+        node_ids.append('.'.join(map(str, node_path)))
+    # all positions of the problem are hashed together
+    hashes = position_hashes(from_boards(boards), to_play)
+    return problem_file, zip(hashes, node_ids)
+
+
+class PositionIndex(object):
+
+    """A mapping of positions to the problems (and nodes) they appear in."""
+
+    def __init__(self, positions=None):
+        """Initialise the index.
+
+        :param dict positions: {position hash: [(problem file, node path)]}
+        """
+        self.positions = defaultdict(list)
+        self.problems = defaultdict(set)
+        for position, occurences in (positions or {}).iteritems():
+            for problem_file, node_path in occurences:
+                self.add(position, problem_file, node_path)
+
+    def add(self, position, problem_file, node_path=''):
+        """Note that the given position can be found in the given problem."""
+        self.positions[position].append((problem_file, node_path))
+        self.problems[problem_file].add(position)
+
+    def problems_with(self, position):
+        """Get all problems in which the given position appears."""
+        return sorted(set(f for f, _ in self.positions.get(position, [])))
+
+    def similar(self, problem_file):
+        """Get all other problems that share a position with the given one.
+
+        :returns: a list of (problem file, shared positions count) tuples, \
+            the most similar ones first
+        """
+        shared = defaultdict(int)
+        for position in self.problems.get(problem_file, []):
+            for other in self.problems_with(position):
+                if other != problem_file:
+                    shared[other] += 1
+        return sorted(shared.items(), key=lambda item: (-item[1], item[0]))
+
+    def transpositions(self):
+        """Get all positions that can be reached in more than one way."""
+        return dict(
+            (position, occurences)
+            for position, occurences in self.positions.iteritems()
+            if len(occurences) > 1
+        )
+
+    @classmethod
+    def build(cls, problems_dir, processes=None):
+        """Index all problems in the given library.
+
+        :param str problems_dir: the base directory of the library
+        :param int processes: how many processes should be used
+        """
+        problems_dir = path(problems_dir)
+        index = cls()
+        problem_files = iter_problem_files(problems_dir)
+        for problem_file, positions in map_problems(
+                problem_positions, problem_files, processes):
+            for position, node_path in positions or []:
+                index.add(
+                    position, str(problems_dir.relpathto(problem_file)),
+                    node_path
+                )
+        return index
+
+    @classmethod
+    def load(cls, index_file):
+        """Load a previously saved index."""
+        with open(index_file) as f:
+            return cls(json.load(f))
+
+    def save(self, index_file):
+        """Save this index as JSON."""
+        with open(index_file, 'w') as f:
+            json.dump(self.positions, f, sort_keys=True)
@@ -2,43 +2,165 @@ import re
 import math
 import thread
 import logging
-from random import choice
+from bisect import bisect_left
+from random import Random
 
 from path import path
 
+from resources.lib.attempts import RATINGS_FILE, AttemptLog, load_ratings
+from resources.lib.caches import registry
+from resources.lib.reviews import ReviewSchedule
+from resources.lib.stats import STATS_FILE, ProblemStats
+from resources.lib.storage import (
+    find_problem_file, is_problem_file, problem_name, read_sgf,
+)
+
+EXCLUDED_FILE = 'excluded.txt'
+
+
+class RankIndex(object):
+    """The ranks that have any problems, sorted by level."""
+
+    def __init__(self, ranks):
+        """Initialise the index.
+
+        :param list ranks: (level, rank, problems count) tuples
+        """
+        ranks = sorted((level, rank, count) for level, rank, count in ranks if count)
+        self.levels = [level for level, _, _ in ranks]
+        self.ranks = [rank for _, rank, _ in ranks]
+        self.counts = [count for _, _, count in ranks]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def by_distance(self, level):
+        """Get all populated ranks, starting with the closest to the given level.
+
+        The closest rank is found with a binary search, after which the
+        neighbouring ranks are returned outwards from it. On ties the easier
+        rank (i.e. the higher level) goes first.
+
+        :param float level: the level for which ranks should be found
+        :returns: a generator of rank tuples
+        """
+        above = bisect_left(self.levels, level)
+        below = above - 1
+        while below >= 0 or above < len(self.levels):
+            if above >= len(self.levels) or (
+                    below >= 0 and
+                    level - self.levels[below] < self.levels[above] - level):
+                yield self.ranks[below]
+                below -= 1
+            else:
+                yield self.ranks[above]
+                above += 1
+
+    def nearest(self, level):
+        """Get the populated rank that is closest to the given level."""
+        for rank in self.by_distance(level):
+            return rank
+
 
 class Problems(object):
     """A class to handle a load of problems."""
     level_span = 3
+    # at most one problem out of this many is a review
+    review_every = 2
+    # the SM-2 qualities of solved and failed problems
+    solved_quality = 4
+    failed_quality = 1
+    # read (and decompressed) problems, so restarting or going back to one is
+    # quick
+    sgfs = registry.cache('problem SGFs', cost=2)
+    # whether the problem files are on this box, rather than on a server
+    local_files = True
     id_regex = '(?P<id>\d+)'
     level_regex = '(?P<level>\d+)[_ ]*?(?P<type>kyu|dan)'
     rating_regex = '(?:\[(?P<rating>[+-]?\d+)\])'
-    name_parser = re.compile('{rating}?{level}_?{id}.sgf'.format(
+    name_parser = re.compile('{rating}?{level}_?{id}\.sg[fz]'.format(
         rating=rating_regex,
         level=level_regex,
         id=id_regex,
     ))
     level_parser = re.compile(level_regex)
 
-    def __init__(self, problems_dir='./', level='30 kyu'):
+    def __init__(self, problems_dir='./', level='30 kyu', reviews_file=None,
+                 attempts_file=None, rng=None):
+        """Start finding the problems in the given directory.
+
+        :param str problems_dir: the base directory of the library
+        :param str level: the current rank of the player
+        :param str reviews_file: where the review schedule is kept
+        :param str attempts_file: where all attempts should be logged
+        :param random.Random rng: what picks the problems, so that the same \
+            problems can be got again
+        """
         self.problems_dir = path(problems_dir)
+        self.random = rng or Random()
         self.offset = 0
+        self.reviews = ReviewSchedule(reviews_file)
+        self.attempts = AttemptLog(attempts_file)
+        self.since_review = 0
+        self._load_library()
+        self.problems = None
+        self.rank_index = None
         self.problems_thread = thread.start_new_thread(
             self._find_problems, (problems_dir,))
-        self.problems = None
         self.level = self.get_level(self._parse_level(level))
 
+    def _load_library(self):
+        """Load the exclusions, stats and ratings kept in the library."""
+        self.excluded = self._load_excluded()
+        self.stats = ProblemStats.load(self.problems_dir / STATS_FILE)
+        # ratings are looked up by name, so that they outlive compression
+        self.ratings = dict(
+            (problem_name(problem_key), rating) for problem_key, rating in
+            load_ratings(self.problems_dir / RATINGS_FILE).iteritems()
+        )
+
     def _find_problems(self, problems_dir):
         """Find all problems in the problems directory."""
         problems = {}
-        for d in self.problems_dir.listdir():
+        # sorted, so that seeded picks are the same wherever they're made
+        for d in sorted(self.problems_dir.listdir()):
             try:
                 level = self._parse_level(d.basename())
-                self.problems[level] = self._get_problems(d)
+                for problem in self._get_problems(d):
+                    # rated problems go with others of the same difficulty
+                    rank = problem['rank'] if 'difficulty' in problem else level
+                    problems.setdefault(rank, []).append(problem)
             except OSError:
                 continue
+        self.rank_index = RankIndex(
+            (self.get_level(rank), rank, len(rank_problems))
+            for rank, rank_problems in problems.iteritems() if rank
+        )
         self.problems = problems
 
+    def _load_excluded(self):
+        """Load the list of problems that should be skipped.
+
+        The list is a file in the problems directory with a problem path
+        (relative to the problems directory) on each line.
+
+        :returns: a set of the names (see `storage.problem_name`) of the \
+            absolute paths of excluded problems
+        """
+        try:
+            with open(self.problems_dir / EXCLUDED_FILE) as f:
+                return set(
+                    problem_name((self.problems_dir / line.strip()).abspath())
+                    for line in f if line.strip()
+                )
+        except IOError:
+            return set()
+
+    def is_excluded(self, problem_file):
+        """Check whether the given problem file should be skipped."""
+        return bool(self.excluded) and \
+            problem_name(path(problem_file).abspath()) in self.excluded
+
     def _parse_problem(self, problem_file):
         """Parse the given problem file name.
 
@@ -47,7 +169,7 @@ class Problems(object):
         :param str problem_file: the filename to be parsed
         :returns: the parts that make up the name + the file
         """
-        if not (problem_file and problem_file.endswith('.sgf')):
+        if not (problem_file and is_problem_file(problem_file)):
             return
 
         result = self.name_parser.search(problem_file)
@@ -82,17 +204,33 @@ class Problems(object):
         """
         rank = self._parse_level(problem_dir.basename())
         problems = []
-        for problem in problem_dir.listdir():
+        for problem in sorted(problem_dir.listdir()):
+            if self.is_excluded(problem):
+                continue
             try:
                 problem_dict = self._parse_problem(problem)
                 if 'rank' not in problem_dict:
                     problem_dict['rank'] = rank
+                self._apply_rating(problem_dict)
             except (OSError, TypeError):
                 logging.info('Could not get any problems from %s', problem)
             else:
                 problems.append(problem_dict)
         return problems
 
+    def _apply_rating(self, problem):
+        """Use the fitted difficulty of the given problem, if it was rated.
+
+        :param dict problem: the problem, as returned by `_parse_problem`
+        """
+        if not self.ratings:
+            return
+        rating = self.ratings.get(
+            problem_name(self.problem_key(problem['problem_file'])))
+        if rating:
+            problem['difficulty'] = rating[0]
+            problem['rank'] = self.get_rank(rating[0])
+
     def random_problem(self, level=None):
         """Get a random problem for the given level.
 
@@ -104,18 +242,37 @@ class Problems(object):
             level = (30, level[1])
         try:
             if self.problems:
-                problem = choice(self.problems[level])
+                problem = self.random.choice(self.problems[level])
             else:
                 problems_dir = path(self.problems_dir) / ('%d_%s' % level)
-                problem = self._parse_problem(choice(problems_dir.listdir()))
-        except (OSError, IOError, KeyError):
+                problem = self._parse_problem(self.random.choice(sorted([
+                    f for f in problems_dir.listdir() if not self.is_excluded(f)
+                ])))
+        except (OSError, IOError, KeyError, IndexError):
             return None
+        return self.read_problem(problem)
 
-        try:
-            with open(problem['problem_file']) as f:
-                problem['sgf'] = f.read()
-        except IOError:
-            return None
+    def read_problem(self, problem):
+        """Read the SGF of the given problem.
+
+        :param dict problem: the problem, as returned by `_parse_problem`
+        :returns: the problem with its SGF, or None if it can't be solved
+        """
+        stats = self.stats.get(
+            str(self.problems_dir.relpathto(problem['problem_file'])))
+        if stats:
+            # no need to read problems that are known to be unsolvable
+            if not stats['right_nodes']:
+                return None
+            problem['stats'] = stats
+
+        problem['sgf'] = self.sgfs.get(problem['problem_file'])
+        if problem['sgf'] is None:
+            try:
+                problem['sgf'] = read_sgf(problem['problem_file'])
+            except (IOError, ValueError):
+                return None
+            self.sgfs.put(problem['problem_file'], problem['sgf'])
 
         # make sure that the SGF can be solved
         if 'RIGHT' not in problem['sgf']:
@@ -123,6 +280,21 @@ class Problems(object):
 
         return problem
 
+    def rank_problems(self, rank):
+        """Get all problems of the given rank, sorted by their file names.
+
+        :param tuple rank: the rank of the problems
+        """
+        if self.problems:
+            problems = self.problems.get(rank, [])
+        else:
+            try:
+                problems = self._get_problems(
+                    self.problems_dir / ('%d_%s' % rank))
+            except OSError:
+                problems = []
+        return sorted(problems, key=lambda problem: problem['problem_file'])
+
     def get_rank(self, level):
         """Get the rank for the given level."""
         rank_value = min(30, int(math.ceil(abs(level))))
@@ -151,19 +323,117 @@ class Problems(object):
             self.offset = 0
         return (self.level, self.offset)
 
-    def failure(self, rank, scale=0.25):
-        """Notify that the player failed a problem."""
+    def problem_key(self, problem_file):
+        """Get the name of the given problem, relative to the library."""
+        return str(self.problems_dir.relpathto(problem_file))
+
+    def record_attempt(self, problem_file, solved):
+        """Note how the given problem went, for its reviews and rating."""
+        problem_key = self.problem_key(problem_file)
+        self.reviews.grade(
+            problem_key, self.solved_quality if solved else self.failed_quality)
+        self.attempts.record(problem_key, solved)
+
+    def failure(self, rank, scale=0.25, problem_file=None):
+        """Notify that the player failed a problem.
+
+        :param str problem_file: the failed problem, which is then logged \
+            and scheduled for a review
+        """
         level = self.get_level(rank)
         magnitude = (level - self.level + self.level_span + 1) * scale
         self.offset += magnitude
         self.update_rank()
+        if problem_file and self.reviews is not None:
+            self.record_attempt(problem_file, False)
+
+    def success(self, rank, scale=0.25, problem_file=None):
+        """Notify that the player solved a problem.
 
-    def success(self, rank, scale=0.25):
-        """Notify that the player solved a problem."""
+        :param str problem_file: the solved problem, which is then logged, \
+            and whose next review (if it has any) is put off
+        """
         level = self.get_level(rank)
         magnitude = (level - self.level - self.level_span - 1) * scale
         self.offset += magnitude
         self.update_rank()
+        if problem_file and self.reviews is not None:
+            self.record_attempt(problem_file, True)
+
+    def problem_at(self, problem_key):
+        """Get the given problem, with its rank.
+
+        Problems that have been compressed since they were noted are still
+        found.
+
+        :param str problem_key: the problem, relative to the library
+        :returns: the problem, as returned by `_parse_problem`, or None if \
+            it isn't a problem file
+        """
+        problem_file = find_problem_file(self.problems_dir / problem_key)
+        problem = self._parse_problem(problem_file)
+        if problem:
+            if 'rank' not in problem:
+                problem['rank'] = self._parse_level(
+                    problem_file.parent.basename())
+            self._apply_rating(problem)
+        return problem
+
+    def search(self, query, limit=1000):
+        """Find the problems whose comments match the given query.
+
+        This needs the comment index of the library (see `comments`), so
+        nothing is found in libraries that haven't been indexed.
+
+        :param str query: the words to look for, in the SQLite FTS syntax
+        :param int limit: the most problems to return
+        :returns: a list of problems, as returned by `_parse_problem`
+        :raises ValueError: if the query is malformed
+        """
+        # the comments module uses the name parsers of this one
+        from resources.lib.comments import COMMENTS_FILE, CommentIndex
+
+        index_file = self.problems_dir / COMMENTS_FILE
+        if not index_file.isfile():
+            return []
+        index = CommentIndex(index_file)
+        try:
+            problem_keys = index.search(query, limit)
+        finally:
+            index.close()
+
+        problems = []
+        for problem_key in problem_keys:
+            problem = self.problem_at(problem_key)
+            if problem and problem['rank'] and \
+                    not self.is_excluded(problem['problem_file']):
+                problems.append(problem)
+        return problems
+
+    def next_review(self):
+        """Get a problem that is due for a review, if it's time for one.
+
+        Problems that can no longer be read are dropped from the schedule.
+
+        :returns: the problem, with its SGF, or None
+        """
+        self.since_review += 1
+        if self.reviews is None or self.since_review < self.review_every:
+            return None
+
+        while True:
+            review = self.reviews.take()
+            if review is None:
+                return None
+            problem = self.problem_at(review)
+            if problem and problem['rank'] and self.read_problem(problem):
+                # keep the schedule under the problem's current name
+                self.reviews.rename(
+                    review, self.problem_key(problem['problem_file']))
+                self.since_review = 0
+                problem['review'] = True
+                return problem
+            self.reviews.forget(review)
 
     def __iter__(self):
         return self
@@ -171,9 +441,23 @@ class Problems(object):
     def next(self):
         """Get the next problem.
 
-        If no probelems are available for the current level, it will try 3
-        ahead and 3 behind for something.
+        Once all problems have been found, the closest rank that has any
+        problems is used. Until then, if no problems are available for the
+        current level, it will try 3 ahead and 3 behind for something.
+
+        Any problems that are due for a review are mixed in.
         """
+        review = self.next_review()
+        if review:
+            return review
+
+        if self.rank_index is not None:
+            for rank in self.rank_index.by_distance(self.level + self.offset):
+                problem = self.random_problem(rank)
+                if problem:
+                    return problem
+            raise StopIteration
+
         levels = range(self.level, self.level + 3)
         levels += range(self.level, self.level - 3, -1)
         for level in levels:
@@ -242,6 +526,7 @@ class MockProblems(Problems):
     def __init__(self, problems_dir='./', level='30 kyu', **kwargs):
         self.level = self.get_level(self._parse_level(level))
         self.offset = 0
+        self.reviews = None
         self.problems = {
             self.get_rank(i): [
                 self._parse_problem(
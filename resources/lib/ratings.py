@@ -0,0 +1,160 @@
+"""Fit problem difficulties and player strengths from the attempt history.
+
+Both are measured in levels, like `Problems.level` - kyu ranks are
+positive, dan ranks are zero or negative. The chance that a player solves
+a problem is modelled Elo style, as a logistic function of how much
+easier the problem is than the player's level::
+
+    P(solved) = 1 / (1 + exp(-SLOPE * (problem level - player level)))
+
+Like in Glicko, every rating also has a deviation. Problems start out at
+the rank they were published with, and players at the average rank of the
+problems they tried, and both are only moved away from that as far as the
+attempts show. Problems with few attempts thus stay close to their
+original rank.
+
+With the players fixed, each problem only depends on its own attempts
+(and vice versa), so one Newton step per problem is done for all of them
+at once with `numpy.bincount`, alternating between problems and players.
+"""
+# -*- coding: utf-8 -*-
+
+import logging
+
+import numpy as np
+from path import path
+
+from resources.lib.attempts import RATINGS_FILE, read_attempts, save_ratings
+from resources.lib.problems import Problems
+
+# how quickly the chance of solving changes with each level of difference
+SLOPE = 0.5
+# how far (in levels) ratings are expected to be from where they start
+PROBLEM_DEVIATION = 3.0
+PLAYER_DEVIATION = 10.0
+# Newton steps overshoot when a rating is far off, so they are limited
+MAX_STEP = 1.0
+
+
+def _newton_step(index, residuals, weights, levels, priors, deviation):
+    """Do a single Newton step for each of the given ratings.
+
+    :param index: which rating each attempt belongs to
+    :param residuals: the gradient of each attempt's log likelihood
+    :param weights: the (negated) second derivative of each attempt's one
+    :returns: the (new levels, deviations) arrays
+    """
+    count = len(levels)
+    precision = 1.0 / deviation ** 2
+    gradient = np.bincount(index, residuals, count) - (levels - priors) * precision
+    hessian = np.bincount(index, weights, count) + precision
+    step = np.clip(gradient / hessian, -MAX_STEP, MAX_STEP)
+    return levels + step, 1.0 / np.sqrt(hessian)
+
+
+def fit_ratings(players, problems, solved, problem_priors, player_count=None,
+                iterations=100, tolerance=1e-4):
+    """Fit the levels of all problems and players to the given attempts.
+
+    :param players: an int array with the player of each attempt
+    :param problems: an int array with the problem of each attempt
+    :param solved: a bool array with the result of each attempt
+    :param problem_priors: the original level of each problem
+    :param int player_count: how many players there are. Defaults to one \
+        more than the largest player index
+    :param int iterations: the most rounds of updates to do
+    :param float tolerance: stop once no level changes more than this
+    :returns: (problem levels, problem deviations, player levels, player \
+        deviations) arrays
+    """
+    players = np.asarray(players, dtype=np.int64)
+    problems = np.asarray(problems, dtype=np.int64)
+    solved = np.asarray(solved, dtype=np.float64)
+    problem_priors = np.asarray(problem_priors, dtype=np.float64)
+    if player_count is None:
+        player_count = players.max() + 1 if len(players) else 0
+    # players start at the average level of the problems they tried
+    player_priors = np.bincount(
+        players, problem_priors[problems], player_count
+    ) / np.maximum(np.bincount(players, minlength=player_count), 1)
+
+    problem_levels = problem_priors.copy()
+    player_levels = player_priors.copy()
+    problem_deviations = np.full(len(problem_levels), PROBLEM_DEVIATION)
+    player_deviations = np.full(len(player_levels), PLAYER_DEVIATION)
+
+    for _ in xrange(iterations):
+        # the derivatives are the same for both sides, apart from the sign
+        chances = 1 / (1 + np.exp(
+            -SLOPE * (problem_levels[problems] - player_levels[players])))
+        residuals = SLOPE * (solved - chances)
+        weights = SLOPE ** 2 * chances * (1 - chances)
+        new_problem_levels, problem_deviations = _newton_step(
+            problems, residuals, weights, problem_levels, problem_priors,
+            PROBLEM_DEVIATION)
+
+        chances = 1 / (1 + np.exp(
+            -SLOPE * (new_problem_levels[problems] - player_levels[players])))
+        residuals = SLOPE * (chances - solved)
+        weights = SLOPE ** 2 * chances * (1 - chances)
+        new_player_levels, player_deviations = _newton_step(
+            players, residuals, weights, player_levels, player_priors,
+            PLAYER_DEVIATION)
+
+        change = max(
+            np.abs(new_problem_levels - problem_levels).max(initial=0),
+            np.abs(new_player_levels - player_levels).max(initial=0),
+        )
+        problem_levels, player_levels = new_problem_levels, new_player_levels
+        if change < tolerance:
+            break
+    return problem_levels, problem_deviations, player_levels, player_deviations
+
+
+def problem_level(problem_key):
+    """Get the level that the given problem was published with.
+
+    :param str problem_key: the problem, relative to the library
+    :returns: the level, or None if the rank isn't known
+    """
+    match = Problems.name_parser.search(problem_key) or \
+        Problems.level_parser.search(problem_key)
+    if not match:
+        return None
+    level = int(match.group('level'))
+    return level if match.group('type') == 'kyu' else -level
+
+
+def rate_library(problems_dir, attempt_logs):
+    """Fit the difficulty of all attempted problems, and save them.
+
+    Each attempts log is taken to be a different player.
+
+    :param str problems_dir: the base directory of the library
+    :param list attempt_logs: the attempts logs of all players
+    :returns: the levels and deviations of the players, in the same order \
+        as the logs
+    """
+    problem_keys, problem_index, priors = [], {}, []
+    players, problems, solved = [], [], []
+    for player, attempt_log in enumerate(attempt_logs):
+        for problem_key, success, _ in read_attempts(attempt_log):
+            if problem_key not in problem_index:
+                prior = problem_level(problem_key)
+                if prior is None:
+                    logging.info('Unknown rank of %s', problem_key)
+                    continue
+                problem_index[problem_key] = len(problem_keys)
+                problem_keys.append(problem_key)
+                priors.append(prior)
+            players.append(player)
+            problems.append(problem_index[problem_key])
+            solved.append(success)
+
+    levels, deviations, player_levels, player_deviations = fit_ratings(
+        players, problems, solved, priors, len(attempt_logs))
+    save_ratings(path(problems_dir) / RATINGS_FILE, dict(
+        (problem_key, (round(levels[i], 2), round(deviations[i], 2)))
+        for i, problem_key in enumerate(problem_keys)
+    ))
+    return zip(player_levels.tolist(), player_deviations.tolist())
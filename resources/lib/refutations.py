@@ -0,0 +1,94 @@
+"""Add searched refutations of wrong moves to problems' trees."""
+# -*- coding: utf-8 -*-
+
+import logging
+from functools import partial
+
+from path import path
+
+from resources.lib.board import Goban
+from resources.lib.library import (
+    iter_problem_files, load_problem, map_problems, walk_tree,
+)
+from resources.lib.search import best_reply, other_player, region_around
+
+REFUTATION_COMMENT = 'Wrong'
+
+
+def add_refutations(problem_file, time_limit=0.1):
+    """Add refutations of all unknown moves on the problem's correct paths.
+
+    For every position on a correct path where the solver is to play, each
+    local move that isn't in the tree gets added, together with the reply
+    found by the search.
+
+    :param str problem_file: the SGF file to be completed
+    :param float time_limit: how long to search for each refutation
+    :returns: a (problem file, new SGF or None, refutations added) tuple
+    """
+    try:
+        game, board = load_problem(problem_file)
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_file, None, 0
+
+    root = game.get_root()
+    if not len(root):
+        return problem_file, None, 0
+    solver = root[0].get_move()[0]
+    opponent = other_player(solver)
+
+    positions = list(walk_tree(root, board))
+    points = [point for _, point in board.list_occupied_points()]
+    points += filter(None, (node.get_move()[1] for node, _, _ in positions))
+    region = region_around(points, board.side)
+
+    added = 0
+    for node, node_board, _ in positions:
+        if not len(node) or node[0].get_move()[0] != solver or \
+                not Goban.correct_path(node):
+            continue
+        known = set(child.get_move()[1] for child in node)
+        for move in region:
+            if move in known or node_board.get(*move) is not None:
+                continue
+            after = node_board.copy()
+            ko_point = after.play(move[0], move[1], solver)
+            if after.get(*move) is None:
+                continue
+            reply = best_reply(after, opponent, region, time_limit, ko_point)
+            if not reply:
+                continue
+            child = node.new_child()
+            child.set_move(solver, move)
+            answer = child.new_child()
+            answer.set_move(opponent, reply)
+            answer.set('C', REFUTATION_COMMENT)
+            added += 1
+
+    return problem_file, game.serialise() if added else None, added
+
+
+def refute_library(problems_dir, output_dir, time_limit=0.1, processes=None):
+    """Add refutations to all problems in the given library.
+
+    :param str problems_dir: the base directory of the library
+    :param str output_dir: where the completed problems should be saved. \
+        Problems without any new refutations aren't saved
+    :param float time_limit: how long to search for each refutation
+    :param int processes: how many processes should be used
+    :returns: how many refutations were added
+    """
+    problems_dir, output_dir = path(problems_dir), path(output_dir)
+    total = 0
+    for problem_file, sgf_string, added in map_problems(
+            partial(add_refutations, time_limit=time_limit),
+            iter_problem_files(problems_dir), processes):
+        if not sgf_string:
+            continue
+        output = output_dir / problems_dir.relpathto(problem_file)
+        output.parent.makedirs_p()
+        with open(output, 'w') as f:
+            f.write(sgf_string)
+        total += added
+    return total
@@ -0,0 +1,270 @@
+"""Problems that come from a problem server (see `server`), not a folder.
+
+This lets many Kodi boxes share a single library, which only the server
+has to scan. The reviews and attempts of each player are still kept
+locally, as they are per player.
+
+Requests go over a small pool of keep alive connections, and everything
+apart from random picks and searches is cached (see `caches`), so going
+back to a rank or a problem doesn't need the server again.
+"""
+# -*- coding: utf-8 -*-
+
+import httplib
+import json
+import logging
+import socket
+import time
+import urllib
+from Queue import Empty, Full, LifoQueue
+from urlparse import urlsplit
+
+from path import path
+
+from resources.lib.caches import registry
+from resources.lib.problems import Problems, RankIndex
+from resources.lib.server import DEFAULT_PORT, format_rank
+from resources.lib.stats import ProblemStats
+
+
+class ServerUnavailable(IOError):
+    """Raised when the problem server can't be reached."""
+
+
+class NotFound(IOError):
+    """Raised when the problem server doesn't have what was asked for."""
+
+
+class ConnectionPool(object):
+
+    """Keep alive connections to a server, shared by any number of threads."""
+
+    def __init__(self, host, port, size=4, timeout=10):
+        """Initialise the pool.
+
+        :param str host: the server's host name
+        :param int port: the server's port
+        :param int size: the most idle connections to keep
+        :param float timeout: how many seconds to wait for the server
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle = LifoQueue(size)
+
+    def _connection(self):
+        """Get an idle connection, or open a new one if there are none."""
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, connection):
+        """Put the given connection back in the pool, if there's room."""
+        try:
+            self.idle.put_nowait(connection)
+        except Full:
+            connection.close()
+
+    def request(self, url):
+        """GET the given URL.
+
+        An idle connection might have been closed by the server in the
+        meantime, so a failed request is retried once on a new connection.
+
+        :returns: the (status, body) of the response
+        :raises ServerUnavailable: if the server can't be reached
+        """
+        for attempt in xrange(2):
+            connection = self._connection() if not attempt else \
+                httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request('GET', url)
+                response = connection.getresponse()
+                # the whole body must be read before the connection is reused
+                body = response.read()
+            except (socket.error, httplib.HTTPException) as e:
+                connection.close()
+                error = e
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            return response.status, body
+        raise ServerUnavailable('Could not reach %s:%s: %s' % (
+            self.host, self.port, error))
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Empty:
+                return
+
+
+class RemoteProblems(Problems):
+
+    """A load of problems served by a problem server."""
+
+    # how many times to ask for the ranks, while the server is still scanning
+    index_attempts = 30
+    index_delay = 1
+    local_files = False
+    # responses are slower to get again than anything read locally
+    responses = registry.cache('server responses', cost=4)
+
+    def __init__(self, server_url, level='30 kyu', reviews_file=None,
+                 attempts_file=None, pool_size=4):
+        """Start getting the problems from the given server.
+
+        :param str server_url: the server's URL, e.g. http://192.168.0.2:8642
+        :param str level: the current rank of the player
+        :param str reviews_file: where the review schedule is kept
+        :param str attempts_file: where all attempts should be logged
+        :param int pool_size: how many connections to keep open
+        """
+        url = urlsplit(server_url if '//' in server_url else '//' + server_url)
+        self.server_url = server_url
+        self.prefix = url.path.rstrip('/')
+        self.pool = ConnectionPool(url.hostname, url.port or DEFAULT_PORT, pool_size)
+        super(RemoteProblems, self).__init__(
+            server_url, level, reviews_file, attempts_file)
+
+    def fetch(self, request, cache=True, raw=False):
+        """Get the server's response to the given request.
+
+        :param str request: the request's path (and query), e.g. '/ranks'
+        :param boolean cache: whether the response can be cached
+        :param boolean raw: whether to return the body as is, or its JSON
+        :raises NotFound: if the server doesn't have the requested thing
+        :raises ServerUnavailable: if the server can't be reached
+        :raises ValueError: if the request was malformed
+        """
+        url = self.prefix + request
+        key = (self.pool.host, self.pool.port, url)
+        body = self.responses.get(key) if cache else None
+        if body is None:
+            status, body = self.pool.request(url)
+            if status == 404:
+                raise NotFound(request)
+            elif status == 400:
+                raise ValueError(json.loads(body).get('error'))
+            elif status != 200:
+                raise ServerUnavailable('%s: HTTP %d' % (request, status))
+            if cache:
+                self.responses.put(key, body)
+        return body if raw else json.loads(body)
+
+    @staticmethod
+    def quote(problem_key):
+        return urllib.quote(unicode(problem_key).encode('utf-8'))
+
+    def _from_server(self, data):
+        """Get the given problem, as sent by the server, as a local problem."""
+        problem = dict(data, problem_file=path(data['problem_file']))
+        if problem.get('rank'):
+            problem['rank'] = (problem['rank'][0], str(problem['rank'][1]))
+        return problem
+
+    def _load_library(self):
+        """The server takes care of exclusions, stats and ratings."""
+        self.excluded = set()
+        self.stats = ProblemStats()
+        self.ratings = {}
+
+    def _find_problems(self, problems_dir):
+        """Get the ranks of all problems, once the server has scanned them."""
+        for _ in xrange(self.index_attempts):
+            try:
+                ranks = self.fetch('/ranks', cache=False)['ranks']
+            except ServerUnavailable as e:
+                logging.info('Problem server not ready: %s', e)
+                time.sleep(self.index_delay)
+                continue
+            self.rank_index = RankIndex(
+                (self.get_level((level, str(kind))), (level, str(kind)), count)
+                for level, kind, count in ranks
+            )
+            return
+
+    def random_problem(self, level=None):
+        """Get a random problem of the given level from the server."""
+        if not level:
+            level = self.get_rank(round(self.level + self.offset))
+        if level[0] > 30:
+            level = (30, level[1])
+        try:
+            problem = self.fetch('/random/' + format_rank(level), cache=False)
+        except IOError:
+            return None
+        return self.read_problem(self._from_server(problem))
+
+    def read_problem(self, problem):
+        """Get the SGF of the given problem from the server.
+
+        :returns: the problem with its SGF, or None if it can't be solved
+        """
+        try:
+            problem['sgf'] = self.fetch(
+                '/sgf/' + self.quote(problem['problem_file']), raw=True)
+        except IOError:
+            return None
+        if 'RIGHT' not in problem['sgf']:
+            return None
+        return problem
+
+    def rank_problems(self, rank):
+        """Get all problems of the given rank, sorted by their file names."""
+        try:
+            problems = self.fetch('/ranks/' + format_rank(rank))['problems']
+        except IOError:
+            return []
+        return sorted(
+            (self._from_server(problem) for problem in problems),
+            key=lambda problem: problem['problem_file'],
+        )
+
+    def problem_key(self, problem_file):
+        """Problems are already named relative to the library."""
+        return str(problem_file)
+
+    def problem_at(self, problem_key):
+        """Get the given problem from the server.
+
+        :returns: the problem, or None if the server doesn't have it
+        :raises ServerUnavailable: if the server can't be reached
+        """
+        try:
+            return self._from_server(
+                self.fetch('/problems/' + self.quote(problem_key)))
+        except NotFound:
+            return None
+
+    def next_review(self):
+        """Get a problem that is due for a review, if the server is up.
+
+        Reviews are only dropped if the server doesn't have them.
+        """
+        try:
+            return super(RemoteProblems, self).next_review()
+        except ServerUnavailable:
+            return None
+
+    def search(self, query, limit=1000):
+        """Find the problems whose comments match the given query.
+
+        :raises ValueError: if the query is malformed
+        """
+        try:
+            problems = self.fetch('/search?' + urllib.urlencode({
+                'q': unicode(query).encode('utf-8'), 'limit': limit,
+            }), cache=False)['problems']
+        except IOError:
+            return []
+        return [self._from_server(problem) for problem in problems]
+
+    def close(self):
+        """Close all connections to the server."""
+        self.pool.close()
@@ -0,0 +1,239 @@
+"""A spaced repetition (SM-2) schedule of problems that should be retried.
+
+Problems get added to the schedule when they are failed. Each one is then
+brought back after an interval that grows with every successful review,
+and shrinks back to a day whenever it is failed again.
+
+The cards are kept in a heap ordered by when they are due, so picking the
+next review is O(log n) however many there are. Rescheduling a card just
+pushes a new entry, and the old one is skipped once it surfaces.
+
+All changes are appended to a journal file as they happen, with the last
+line of each problem being its current state. The journal is rewritten
+once it gets a lot longer than the number of problems in it.
+"""
+# -*- coding: utf-8 -*-
+
+import heapq
+import logging
+import os
+import time
+
+DAY = 24 * 60 * 60
+# the lowest quality that still counts as remembered
+PASSING_QUALITY = 3
+MIN_EASINESS = 1.3
+
+
+class Card(object):
+
+    """The SM-2 state of a single problem."""
+
+    __slots__ = ('problem_file', 'easiness', 'repetitions', 'interval', 'due')
+
+    def __init__(self, problem_file, easiness=2.5, repetitions=0, interval=0,
+                 due=0):
+        self.problem_file = problem_file
+        self.easiness = easiness
+        self.repetitions = repetitions
+        self.interval = interval
+        self.due = due
+
+    def grade(self, quality, now):
+        """Update the card after a review.
+
+        :param int quality: how well the problem went, from 0 (complete \
+            blackout) to 5 (perfect)
+        :param float now: when the review happened
+        """
+        if quality < PASSING_QUALITY:
+            self.repetitions = 0
+            self.interval = 1
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1
+            elif self.repetitions == 2:
+                self.interval = 6
+            else:
+                self.interval = int(round(self.interval * self.easiness))
+        self.easiness = max(
+            MIN_EASINESS,
+            self.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02),
+        )
+        self.due = now + self.interval * DAY
+
+    def serialise(self):
+        """Get this card as a journal line."""
+        return '%s\t%.3f\t%d\t%d\t%d\n' % (
+            self.problem_file, self.easiness, self.repetitions, self.interval,
+            self.due,
+        )
+
+    @classmethod
+    def parse(cls, line):
+        """Get the card saved in the given journal line.
+
+        :raises ValueError: if the line is malformed
+        """
+        problem_file, easiness, repetitions, interval, due = \
+            line.rstrip('\n').split('\t')
+        return cls(
+            problem_file, float(easiness), int(repetitions), int(interval),
+            int(due),
+        )
+
+
+class ReviewSchedule(object):
+
+    """A priority queue of the problems that should be reviewed."""
+
+    # how long a review that was shown, but not graded, is put off for
+    retry_delay = 10 * 60
+    # how many journal lines per card are allowed before it is rewritten
+    compact_ratio = 2
+
+    def __init__(self, journal_file=None):
+        """Load the schedule.
+
+        :param str journal_file: where the schedule is kept. If not given, \
+            the schedule is only kept in memory
+        """
+        self.journal_file = journal_file
+        self.cards = {}
+        self.journal_lines = 0
+        if journal_file:
+            self._load()
+        self.heap = [(card.due, card.problem_file) for card in self.cards.itervalues()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, problem_file):
+        return problem_file in self.cards
+
+    def _load(self):
+        """Replay the journal, keeping the last state of each problem."""
+        try:
+            with open(self.journal_file) as f:
+                for line in f:
+                    self.journal_lines += 1
+                    try:
+                        card = Card.parse(line)
+                    except ValueError:
+                        logging.warning('Bad review journal line: %r', line)
+                        continue
+                    if card.due < 0:
+                        self.cards.pop(card.problem_file, None)
+                    else:
+                        self.cards[card.problem_file] = card
+        except IOError:
+            pass
+
+    def _write(self, card):
+        """Append the given card's state to the journal."""
+        if not self.journal_file:
+            return
+        if self.journal_lines > self.compact_ratio * len(self.cards) + 100:
+            return self.compact()
+        try:
+            directory = os.path.dirname(self.journal_file)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.journal_file, 'a') as f:
+                f.write(card.serialise())
+            self.journal_lines += 1
+        except (IOError, OSError) as e:
+            logging.warning('Could not save the review schedule: %s', e)
+
+    def compact(self):
+        """Rewrite the journal with a single line per problem."""
+        tmp_file = self.journal_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                for card in self.cards.itervalues():
+                    f.write(card.serialise())
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            os.rename(tmp_file, self.journal_file)
+            self.journal_lines = len(self.cards)
+        except (IOError, OSError) as e:
+            logging.warning('Could not save the review schedule: %s', e)
+
+    def _push(self, card):
+        """Queue the given card for when it's due."""
+        heapq.heappush(self.heap, (card.due, card.problem_file))
+        # drop old entries before they outnumber the live ones
+        if len(self.heap) > 2 * len(self.cards) + 100:
+            self.heap = [
+                (card.due, card.problem_file) for card in self.cards.itervalues()
+            ]
+            heapq.heapify(self.heap)
+
+    def grade(self, problem_file, quality, now=None):
+        """Note how the given problem went.
+
+        Failed problems are added to the schedule. Problems that were never
+        failed aren't tracked.
+
+        :param str problem_file: the problem (relative to the library)
+        :param int quality: how well it went, from 0 to 5
+        :param float now: when it happened (defaults to the current time)
+        """
+        card = self.cards.get(problem_file)
+        if card is None:
+            if quality >= PASSING_QUALITY:
+                return
+            card = self.cards[problem_file] = Card(problem_file)
+        card.grade(quality, time.time() if now is None else now)
+        self._push(card)
+        self._write(card)
+
+    def forget(self, problem_file):
+        """Remove the given problem from the schedule."""
+        if self.cards.pop(problem_file, None):
+            # a negative due time marks removed problems in the journal
+            self._write(Card(problem_file, due=-1))
+
+    def rename(self, problem_file, new_name):
+        """Move the given problem's card to its new name (e.g. once compressed)."""
+        card = self.cards.get(problem_file)
+        if card is None or problem_file == new_name or new_name in self.cards:
+            return
+        self.forget(problem_file)
+        card.problem_file = new_name
+        self.cards[new_name] = card
+        self._push(card)
+        self._write(card)
+
+    def _peek(self):
+        """Get the first live heap entry, dropping any stale ones before it."""
+        while self.heap:
+            due, problem_file = self.heap[0]
+            card = self.cards.get(problem_file)
+            if card is not None and card.due == due:
+                return card
+            heapq.heappop(self.heap)
+        return None
+
+    def next_due(self):
+        """Get the time at which the next review is due, or None if none are."""
+        card = self._peek()
+        return card and card.due
+
+    def take(self, now=None):
+        """Get the problem that has been due the longest, if any.
+
+        The problem is put off for a while, so that it isn't shown again
+        right away if it doesn't get graded.
+
+        :returns: the problem file, or None if nothing is due
+        """
+        now = time.time() if now is None else now
+        card = self._peek()
+        if card is None or card.due > now:
+            return None
+        card.due = now + self.retry_delay
+        self._push(card)
+        return card.problem_file
@@ -0,0 +1,204 @@
+"""A small local search, used to answer moves that aren't in the problem.
+
+This is a plain negamax alpha-beta search with iterative deepening and a
+transposition table, limited to the area around the problem's stones. The
+evaluation is the material balance in that area, with groups in atari
+counted as half lost, which is enough to find the captures and blocks that
+refute most wrong moves in local life and death problems.
+"""
+# -*- coding: utf-8 -*-
+
+import time
+
+INFINITY = float('inf')
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class Timeout(Exception):
+    """Raised when the search runs out of time."""
+
+
+def other_player(player):
+    """Get the opponent of the given player."""
+    return 'w' if player == 'b' else 'b'
+
+
+def region_around(points, size, margin=1):
+    """Get all points in the bounding box of the given points.
+
+    :param list points: (row, column) tuples
+    :param int size: the size of the board
+    :param int margin: how much the box should be extended on each side
+    :returns: a list of (row, column) tuples
+    """
+    points = list(points)
+    if not points:
+        return []
+    rows = [row for row, _ in points]
+    cols = [col for _, col in points]
+    return [
+        (row, col)
+        for row in xrange(max(0, min(rows) - margin), min(size, max(rows) + margin + 1))
+        for col in xrange(max(0, min(cols) - margin), min(size, max(cols) + margin + 1))
+    ]
+
+
+def neighbours(point, size):
+    """Get the points next to the given one."""
+    row, col = point
+    for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+        if 0 <= r < size and 0 <= c < size:
+            yield r, c
+
+
+def group_liberties(board, point):
+    """Get the group at the given point and its liberties.
+
+    :returns: a (set of stones, set of liberties) tuple
+    """
+    colour = board.get(*point)
+    group, liberties, to_check = set([point]), set(), [point]
+    while to_check:
+        for neighbour in neighbours(to_check.pop(), board.side):
+            content = board.get(*neighbour)
+            if content is None:
+                liberties.add(neighbour)
+            elif content == colour and neighbour not in group:
+                group.add(neighbour)
+                to_check.append(neighbour)
+    return group, liberties
+
+
+class Search(object):
+
+    """A time limited search for the best local move."""
+
+    def __init__(self, region, time_limit=0.3, max_depth=10):
+        """Initialise the search.
+
+        :param list region: the points that can be played at
+        :param float time_limit: how many seconds the search may take
+        :param int max_depth: the deepest the iterative deepening will go
+        """
+        self.region = region
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = {}
+        self.start = None
+        self.deadline = None
+        self.nodes = 0
+
+    def key(self, board):
+        """Get the transposition table key of the given board.
+
+        Only the region is taken into account, as nothing can be played
+        outside of it.
+        """
+        return tuple(board.get(*point) for point in self.region)
+
+    def evaluate(self, board, player):
+        """Evaluate the given board from the given player's point of view."""
+        score, seen = 0, set()
+        for point in self.region:
+            colour = board.get(*point)
+            if colour is None or point in seen:
+                continue
+            group, liberties = group_liberties(board, point)
+            seen.update(group)
+            value = len(group) * (0.5 if len(liberties) == 1 else 1)
+            score += value if colour == player else -value
+        return score
+
+    def moves(self, board, best=None):
+        """Get all candidate moves, the best known one first."""
+        moves = [point for point in self.region if board.get(*point) is None]
+        if best in moves:
+            moves.remove(best)
+            moves.insert(0, best)
+        return moves
+
+    def negamax(self, board, player, depth, alpha, beta, ko_point=None):
+        """Find the best move for the given player.
+
+        :returns: a (score, move) tuple. The move is None if there are no \
+            legal moves or the depth has been reached
+        """
+        self.nodes += 1
+        if self.nodes % 64 == 0 and time.time() > self.deadline:
+            raise Timeout()
+
+        key = (self.key(board), player, ko_point)
+        entry = self.table.get(key)
+        if entry and entry[0] >= depth:
+            entry_depth, flag, score, move = entry
+            if flag == EXACT or \
+                    (flag == LOWER and score >= beta) or \
+                    (flag == UPPER and score <= alpha):
+                return score, move
+        if depth == 0:
+            return self.evaluate(board, player), None
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for move in self.moves(board, entry and entry[3]):
+            if move == ko_point:
+                continue
+            child = board.copy()
+            child_ko = child.play(move[0], move[1], player)
+            if child.get(*move) is None:
+                # don't bother with suicides
+                continue
+            score = -self.negamax(
+                child, other_player(player), depth - 1, -beta, -alpha, child_ko
+            )[0]
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_move is None:
+            return self.evaluate(board, player), None
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, flag, best_score, best_move)
+        return best_score, best_move
+
+    def best_move(self, board, player, ko_point=None):
+        """Find the best move for the given player in the time available.
+
+        :param board: the gomill board to search from
+        :param str player: 'b' or 'w'
+        :param tuple ko_point: the point that can't be played due to ko
+        :returns: a (row, column) tuple, or None if no move was found
+        """
+        self.start = time.time()
+        # the first level is always searched, so that there is some answer
+        self.deadline = INFINITY
+        best = None
+        try:
+            for depth in xrange(1, self.max_depth + 1):
+                _, move = self.negamax(
+                    board, player, depth, -INFINITY, INFINITY, ko_point)
+                best = move or best
+                self.deadline = self.start + self.time_limit
+        except Timeout:
+            pass
+        return best
+
+
+def best_reply(board, player, region, time_limit=0.3, ko_point=None):
+    """Find the best local move for the given player.
+
+    :param board: the gomill board to search from
+    :param str player: 'b' or 'w'
+    :param list region: the points that can be played at
+    :param float time_limit: how many seconds the search may take
+    :param tuple ko_point: the point that can't be played due to ko
+    """
+    return Search(region, time_limit).best_move(board, player, ko_point)
@@ -0,0 +1,189 @@
+"""A small HTTP/JSON server, so that many Kodi boxes can share one library.
+
+The library is scanned once, by the server, and clients (see `remote`)
+only ask for what they need::
+
+    GET /ranks                  all ranks that have problems, with counts
+    GET /ranks/5_kyu            all problems of a rank
+    GET /random/5_kyu           a random (solvable) problem of a rank
+    GET /problems/{problem}     a single problem
+    GET /sgf/{problem}          the SGF of a problem
+    GET /search?q=ko&limit=10   problems whose comments match a query
+
+Problems are given as JSON objects, with their file relative to the
+library. Connections are kept alive, so a client can make all its requests
+over a handful of connections.
+"""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import re
+import urllib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import Thread
+from urlparse import parse_qs, urlsplit
+
+from resources.lib.storage import is_problem_file, read_sgf
+
+DEFAULT_PORT = 8642
+# the bits of problems that are sent to clients (the SGF is sent separately)
+PROBLEM_FIELDS = ('rating', 'rank', 'id', 'difficulty', 'stats')
+
+
+def format_rank(rank):
+    """Get the given (level, type) rank as used in URLs, e.g. '5_kyu'."""
+    return '%d_%s' % tuple(rank)
+
+
+class ProblemHandler(BaseHTTPRequestHandler):
+
+    """Answers a single client's requests."""
+
+    protocol_version = 'HTTP/1.1'
+
+    routes = (
+        (re.compile(r'^/ranks$'), 'get_ranks'),
+        (re.compile(r'^/ranks/(?P<rank>\d+_(?:kyu|dan))$'), 'get_rank'),
+        (re.compile(r'^/random/(?P<rank>\d+_(?:kyu|dan))$'), 'get_random'),
+        (re.compile(r'^/problems/(?P<problem_key>.+)$'), 'get_problem'),
+        (re.compile(r'^/sgf/(?P<problem_key>.+)$'), 'get_sgf'),
+        (re.compile(r'^/search$'), 'get_search'),
+    )
+
+    @property
+    def problems(self):
+        return self.server.problems
+
+    def log_message(self, fmt, *args):
+        """Log requests quietly, rather than to stderr."""
+        logging.debug('%s %s', self.address_string(), fmt % args)
+
+    def reply(self, status, body, content_type='application/json'):
+        """Send a response, always with its length, to keep the connection."""
+        if content_type == 'application/json':
+            body = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self, status, message):
+        self.reply(status, {'error': message})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        request_path = urllib.unquote(url.path).decode('utf-8', 'replace')
+        self.query = dict(
+            (key, values[-1].decode('utf-8', 'replace'))
+            for key, values in parse_qs(url.query).iteritems()
+        )
+        for route, handler in self.routes:
+            match = route.match(request_path)
+            if match:
+                return getattr(self, handler)(**match.groupdict())
+        self.error(404, 'unknown request')
+
+    def problem_data(self, problem):
+        """Get the given problem as it should be sent to clients."""
+        data = dict(
+            (key, value) for key, value in problem.iteritems()
+            if key in PROBLEM_FIELDS
+        )
+        data['problem_file'] = self.problems.problem_key(problem['problem_file'])
+        return data
+
+    def find_problem(self, problem_key):
+        """Get the given problem, if it's one that can be served.
+
+        :returns: the problem, or None if it's not in the library
+        """
+        parts = problem_key.split('/')
+        if problem_key.startswith('/') or '..' in parts or \
+                not is_problem_file(problem_key):
+            return None
+        problem = self.problems.problem_at(problem_key)
+        if not problem or not problem['problem_file'].isfile() or \
+                self.problems.is_excluded(problem['problem_file']):
+            return None
+        return problem
+
+    def get_ranks(self):
+        index = self.problems.rank_index
+        if index is None:
+            return self.error(503, 'the library is still being scanned')
+        self.reply(200, {'ranks': [
+            list(rank) + [count] for rank, count in zip(index.ranks, index.counts)
+        ]})
+
+    def get_rank(self, rank):
+        rank = self.problems._parse_level(rank)
+        self.reply(200, {'problems': [
+            self.problem_data(problem)
+            for problem in self.problems.rank_problems(rank)
+        ]})
+
+    def get_random(self, rank):
+        problem = self.problems.random_problem(self.problems._parse_level(rank))
+        if not problem:
+            return self.error(404, 'no problems found')
+        self.reply(200, self.problem_data(problem))
+
+    def get_problem(self, problem_key):
+        problem = self.find_problem(problem_key)
+        if not problem:
+            return self.error(404, 'no such problem')
+        self.reply(200, self.problem_data(problem))
+
+    def get_sgf(self, problem_key):
+        problem = self.find_problem(problem_key)
+        try:
+            sgf_string = problem and read_sgf(problem['problem_file'])
+        except (IOError, ValueError):
+            sgf_string = None
+        if not sgf_string:
+            return self.error(404, 'no such problem')
+        self.reply(200, sgf_string, 'application/x-go-sgf')
+
+    def get_search(self):
+        try:
+            problems = self.problems.search(
+                self.query['q'], int(self.query.get('limit', 1000)))
+        except (KeyError, ValueError) as e:
+            return self.error(400, 'bad search: %s' % e)
+        self.reply(200, {
+            'problems': [self.problem_data(problem) for problem in problems]
+        })
+
+
+class ProblemServer(ThreadingMixIn, HTTPServer):
+
+    """Serves the problems of a library to any number of clients."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, problems):
+        """Initialise the server.
+
+        :param tuple address: the (host, port) to listen on
+        :param Problems problems: the library to be served
+        """
+        HTTPServer.__init__(self, address, ProblemHandler)
+        self.problems = problems
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address
+
+    def start(self, poll_interval=0.5):
+        """Serve requests in a background thread.
+
+        :param float poll_interval: how often to check for a shutdown
+        """
+        thread = Thread(target=self.serve_forever, args=(poll_interval,))
+        thread.daemon = True
+        thread.start()
+        return thread
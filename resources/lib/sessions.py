@@ -0,0 +1,203 @@
+"""Recording of play sessions, and replaying them without the GUI.
+
+A session log starts with the seed of the session's random number
+generator, followed by one tab separated line per event::
+
+    {ms since start}\t{ms it took}\t{event}\t{arguments...}
+
+The events are:
+
+    * problem {problem key} - a problem was loaded
+    * move {x} {y} [{reply x} {reply y}] - a stone was placed, and replied to
+    * back - a move was taken back
+    * jump {move number} - a move of the current line was jumped to
+    * hints {0 or 1} - hints were hidden or shown
+    * restart - the problem was started again
+
+Replaying a log plays it out as fast as possible, timing each event, so
+slow sessions from the field can be reproduced, and the same sessions can
+be used to check for performance regressions.
+"""
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import time
+from random import Random, SystemRandom
+
+from resources.lib.board import Goban
+
+EVENTS = ('problem', 'move', 'back', 'jump', 'hints', 'restart')
+
+
+class SessionRecorder(object):
+
+    """Appends the events of a session to its log."""
+
+    def __init__(self, log_file=None, seed=None, clock=time.time):
+        """Start the session.
+
+        :param str log_file: where the events are saved. If not given, \
+            nothing is recorded
+        :param int seed: the seed of the session's random number generators \
+            (a random one by default)
+        :param clock: what gives the current time, in seconds
+        """
+        self.log_file = log_file
+        self.seed = SystemRandom().getrandbits(32) if seed is None else seed
+        self.clock = clock
+        self.start = clock()
+        self._write('seed\t%d\n' % self.seed)
+
+    def rng(self):
+        """Get a new random number generator, seeded for this session."""
+        return Random(self.seed)
+
+    def _write(self, line):
+        if not self.log_file:
+            return
+        try:
+            directory = os.path.dirname(self.log_file)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.log_file, 'a') as f:
+                f.write(line)
+        except (IOError, OSError) as e:
+            logging.warning('Could not record the session: %s', e)
+            self.log_file = None
+
+    def record(self, event, *args, **kwargs):
+        """Note that the given event happened.
+
+        :param str event: one of `EVENTS`
+        :param args: the event's arguments
+        :param float started: when the event started being handled, so \
+            that its duration gets logged (defaults to now)
+        """
+        now = self.clock()
+        started = kwargs.get('started', now)
+        self._write('\t'.join(
+            ['%d' % round((started - self.start) * 1000),
+             '%d' % round((now - started) * 1000), event] +
+            [unicode(arg).encode('utf-8') for arg in args]
+        ) + '\n')
+
+
+def read_session(log_file):
+    """Read the given session log.
+
+    Malformed lines are skipped.
+
+    :returns: a (seed, events) tuple, where events is a list of (offset, \
+        duration, event, arguments) tuples, with the times in milliseconds
+    :raises ValueError: if the log doesn't start with a seed
+    """
+    with open(log_file) as f:
+        header = f.readline().rstrip('\n').split('\t')
+        if len(header) != 2 or header[0] != 'seed':
+            raise ValueError('%s is not a session log' % log_file)
+        events = []
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            try:
+                if fields[2] not in EVENTS:
+                    raise ValueError(fields[2])
+                events.append(
+                    (int(fields[0]), int(fields[1]), fields[2], fields[3:]))
+            except (IndexError, ValueError):
+                logging.warning('Bad session log line: %r', line)
+    return int(header[1]), events
+
+
+class ReplayStats(object):
+
+    """How long each kind of event took when recorded, and when replayed."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(EVENTS, 0)
+        self.recorded = dict.fromkeys(EVENTS, 0)
+        self.replayed = dict.fromkeys(EVENTS, 0.0)
+        self.slowest = dict.fromkeys(EVENTS, 0.0)
+        # how many replies were different from the recorded ones
+        self.diverged = 0
+        self.skipped = 0
+
+    def add(self, event, recorded, replayed):
+        """Note how long an event took (in milliseconds)."""
+        self.counts[event] += 1
+        self.recorded[event] += recorded
+        self.replayed[event] += replayed
+        self.slowest[event] = max(self.slowest[event], replayed)
+
+    @property
+    def total(self):
+        """The time the whole replay took, in milliseconds."""
+        return sum(self.replayed.itervalues())
+
+
+def replay_session(log_file, problems, search_time=Goban.search_time,
+                   clock=time.time):
+    """Play out the given session, as fast as possible.
+
+    The replies are picked by a random number generator with the session's
+    seed, so they are the same as when the session was recorded. Searched
+    replies (to moves off the problem's path) depend on how fast the search
+    was, though - if one is different, the recorded one is played instead,
+    so that the rest of the session still makes sense.
+
+    :param str log_file: the session log
+    :param Problems problems: where the session's problems come from
+    :param float search_time: how long to search for replies to moves that \
+        aren't in the problem
+    :returns: the `ReplayStats` of the session
+    """
+    seed, events = read_session(log_file)
+    goban = Goban(rng=Random(seed))
+    goban.search_time = search_time
+    stats = ReplayStats()
+    for _, duration, event, args in events:
+        if event != 'problem' and goban.tree is None:
+            stats.skipped += 1
+            continue
+
+        started = clock()
+        try:
+            replay_event(goban, problems, stats, event, args)
+        except ValueError as e:
+            logging.warning('Could not replay %s %s: %s', event, args, e)
+            stats.skipped += 1
+            continue
+        stats.add(event, duration, (clock() - started) * 1000)
+    return stats
+
+
+def replay_event(goban, problems, stats, event, args):
+    """Replay a single event of a session on the given board.
+
+    :raises ValueError: if the event can't be replayed
+    """
+    if event == 'problem':
+        problem = problems.problem_at(args[0])
+        problem = problem and problems.read_problem(problem)
+        if not problem:
+            goban.tree = None
+            raise ValueError('the problem could not be loaded')
+        goban.load(problem['sgf'])
+    elif event == 'move':
+        goban.move(int(args[0]), int(args[1]))
+        reply = goban.choose_reply()
+        recorded = tuple(int(arg) for arg in args[2:4]) or None
+        if reply != recorded:
+            stats.diverged += 1
+            reply = recorded
+        if reply:
+            goban.move(*reply)
+    elif event == 'back':
+        goban.take_back()
+    elif event == 'jump':
+        goban.jump(int(args[0]))
+    elif event == 'hints':
+        if args[0] == '1':
+            goban.hint_overlay()
+    elif event == 'restart':
+        goban.load(goban.sgf)
@@ -0,0 +1,286 @@
+"""A small SGF parser that can parse a game tree one variation at a time.
+
+Gomill always parses the whole file, which is a waste for problems with
+thousands of variations of which only one is ever played. This parser works
+on offsets into the SGF text instead - each call parses a single sequence of
+nodes, and only notes where its child variations start and end, so that
+they can be parsed later, if ever.
+
+It only knows the properties that goproblems.com uses (and a few harmless
+bits of metadata). Anything else should be left to gomill, so
+`unsupported_properties` can be used to check whether an SGF is fine.
+
+Values are interpreted the same way as gomill does it.
+"""
+# -*- coding: utf-8 -*-
+
+import re
+
+# a property value, with any escaped characters (including ']')
+RAW_VALUE = r'(?:\\.|[^\\\]])*'
+VALUE = r'\[%s\]' % RAW_VALUE
+# a property with its first value, and any further values of it
+property_parser = re.compile(r'\s*([A-Za-z]+)\s*\[(%s)\]' % RAW_VALUE, re.S)
+value_parser = re.compile(r'\s*\[(%s)\]' % RAW_VALUE, re.S)
+# everything up to the next bracket outside of any values, so that finding
+# the end of a variation skips whole stretches of text in one match
+bracket_parser = re.compile(r'[^()\[]*(?:%s[^()\[]*)*([()])' % VALUE, re.S)
+# values are matched too, so that nothing inside them is taken as a property
+identifier_parser = re.compile(r'%s|([A-Za-z]+)(?=\s*\[)' % VALUE, re.S)
+
+newline_parser = re.compile(r'\n\r|\r\n|\n|\r')
+# anything that needs changing in a text value - most have none of these
+special_parser = re.compile(r'[\\\r\t\v\f]')
+escape_parser = re.compile(r'\\(\n|.)', re.S)
+WHITESPACE = '\t\v\f'
+
+DEFAULT_SIZE = 19
+SUPPORTED_PROPERTIES = frozenset([
+    'AB', 'AW', 'AE', 'B', 'W', 'C', 'LB', 'TR', 'MA', 'SQ', 'CR', 'SZ',
+    'AP', 'GM', 'FF', 'CA', 'ST',
+])
+
+
+def _identifier(name):
+    """Get the FF[4] version of the given property identifier.
+
+    Old style (FF[3]) identifiers can contain lower case letters.
+    """
+    if name.isupper():
+        return name
+    return ''.join(c for c in name if c.isupper())
+
+
+def unsupported_properties(text):
+    """Get the identifiers of any properties that this parser doesn't know.
+
+    :param str text: the SGF text
+    :rtype: set
+    """
+    # values match with an empty identifier
+    names = set(identifier_parser.findall(text))
+    names.discard('')
+    return set(_identifier(name) for name in names) - SUPPORTED_PROPERTIES
+
+
+def find_tree_end(text, start):
+    """Find the end of the game tree that starts at the given offset.
+
+    :param str text: the SGF text
+    :param int start: the offset of the tree's opening bracket
+    :returns: the offset just after the tree's closing bracket
+    :raises ValueError: if the tree isn't closed
+    """
+    depth = 0
+    match = bracket_parser.match(text, start)
+    while match:
+        if match.group(1) == '(':
+            depth += 1
+        else:
+            depth -= 1
+            if not depth:
+                return match.end()
+        match = bracket_parser.match(text, match.end())
+    raise ValueError('unexpected end of SGF data')
+
+
+def parse_properties(text, pos):
+    """Parse all properties of the node starting at the given offset.
+
+    Repeated properties have their values merged, like gomill does.
+
+    :param int pos: the offset just after the node's ';'
+    :returns: a ({property: [raw values]}, offset after the node) tuple
+    """
+    properties = {}
+    match = property_parser.match(text, pos)
+    while match:
+        identifier = _identifier(match.group(1))
+        values = properties.setdefault(identifier, [])
+        values.append(match.group(2))
+        pos = match.end()
+        match = value_parser.match(text, pos)
+        while match:
+            values.append(match.group(1))
+            pos = match.end()
+            match = value_parser.match(text, pos)
+        match = property_parser.match(text, pos)
+    return properties, pos
+
+
+def parse_sequence(text, start):
+    """Parse the nodes of the game tree starting at the given offset.
+
+    Only the tree's own sequence of nodes is parsed - its variations are
+    just found.
+
+    :param str text: the SGF text
+    :param int start: the offset of the tree's opening bracket
+    :returns: a (list of property dicts, list of (start, end) offsets of \
+        the variations) tuple
+    :raises ValueError: if the text isn't a valid game tree
+    """
+    if text[start:start + 1] != '(':
+        raise ValueError('no game tree found at %d' % start)
+
+    nodes, variations = [], []
+    pos = start + 1
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char == ';':
+            if variations:
+                raise ValueError('node after variations at %d' % pos)
+            properties, pos = parse_properties(text, pos + 1)
+            nodes.append(properties)
+        elif char == '(':
+            end = find_tree_end(text, pos)
+            variations.append((pos, end))
+            pos = end
+        elif char == ')':
+            if not nodes:
+                raise ValueError('empty sequence at %d' % start)
+            return nodes, variations
+        elif char.isspace():
+            pos += 1
+        else:
+            raise ValueError('unexpected %r at %d' % (char, pos))
+    raise ValueError('unexpected end of SGF data')
+
+
+def iter_nodes(text):
+    """Parse the whole of the first game tree in a single pass.
+
+    Nodes are numbered in the order they appear in, which means that
+    parents always come before their children.
+
+    :param str text: the SGF text
+    :returns: a generator of (parent number, property dict) tuples, with \
+        -1 as the parent of the root node
+    :raises ValueError: if the text isn't a valid game tree
+    """
+    pos = find_game(text)
+    length = len(text)
+    # (parent node, number of nodes before it) of each open tree
+    trees = []
+    current, count = -1, 0
+    after_variation = False
+    while pos < length:
+        char = text[pos]
+        if char == ';':
+            if after_variation or not trees:
+                raise ValueError('unexpected node at %d' % pos)
+            properties, pos = parse_properties(text, pos + 1)
+            yield current, properties
+            current, count = count, count + 1
+        elif char == '(':
+            trees.append((current, count))
+            after_variation = False
+            pos += 1
+        elif char == ')':
+            current, nodes_before = trees.pop()
+            if count == nodes_before:
+                raise ValueError('empty sequence at %d' % pos)
+            if not trees:
+                return
+            after_variation = True
+            pos += 1
+        elif char.isspace():
+            pos += 1
+        else:
+            raise ValueError('unexpected %r at %d' % (char, pos))
+    raise ValueError('unexpected end of SGF data')
+
+
+def find_game(text):
+    """Get the offset of the first game tree in the given SGF text.
+
+    :raises ValueError: if there is no game tree
+    """
+    match = re.search(r'\(\s*;', text)
+    if not match:
+        raise ValueError('no SGF data found')
+    return match.start()
+
+
+def text_value(value):
+    """Interpret the given raw Text value."""
+    if not special_parser.search(value):
+        return value
+    value = newline_parser.sub('\n', value)
+    for char in WHITESPACE:
+        value = value.replace(char, ' ')
+    return escape_parser.sub(
+        lambda match: '' if match.group(1) == '\n' else match.group(1), value)
+
+
+def simpletext_value(value):
+    """Interpret the given raw SimpleText value."""
+    return text_value(value).replace('\n', ' ')
+
+
+def point(value, size):
+    """Interpret the given raw point value.
+
+    :returns: a (row, column) tuple, counted from the bottom left corner, \
+        or None for a pass
+    :raises ValueError: if the point is malformed or off the board
+    """
+    if not value or (value == 'tt' and size <= 19):
+        return None
+    if len(value) != 2:
+        raise ValueError('bad point %r' % value)
+    col = ord(value[0]) - 97
+    row = size - ord(value[1]) + 96
+    if not (0 <= row < size and 0 <= col < size):
+        raise ValueError('point %r is off the board' % value)
+    return row, col
+
+
+def point_list(values, size):
+    """Interpret the given raw point list, including compressed ones.
+
+    :returns: a set of (row, column) tuples
+    """
+    points = set()
+    for value in values:
+        first, is_rectangle, second = value.partition(':')
+        first = point(first, size)
+        if first is None:
+            raise ValueError('bad point list item %r' % value)
+        if not is_rectangle:
+            points.add(first)
+            continue
+        top, left = first
+        bottom, right = point(second, size) or (-1, -1)
+        if not (bottom <= top and left <= right):
+            raise ValueError('bad rectangle %r' % value)
+        points.update(
+            (row, col)
+            for row in xrange(bottom, top + 1)
+            for col in xrange(left, right + 1)
+        )
+    return points
+
+
+def labels(values, size):
+    """Interpret the given raw LB values.
+
+    :returns: a list of ((row, column), label) tuples
+    """
+    result = []
+    for value in values:
+        position, _, label = value.partition(':')
+        result.append((point(position, size), simpletext_value(label)))
+    return result
+
+
+def board_size(properties):
+    """Get the board size from the given root node's properties."""
+    try:
+        size = int(properties.get('SZ', [DEFAULT_SIZE])[0])
+    except ValueError:
+        raise ValueError('bad board size')
+    if not 1 <= size <= 26:
+        raise ValueError('board size %d is not supported' % size)
+    return size
@@ -0,0 +1,165 @@
+"""Statistics about the solution trees of all problems in a library."""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from collections import Counter
+
+from gomill import sgf
+from path import path
+
+from resources.lib.library import iter_problem_files, map_problems
+from resources.lib.sgf_parser import board_size, iter_nodes, text_value
+from resources.lib.storage import problem_name, read_sgf
+
+STATS_FILE = 'problem_stats.json'
+COLUMNS = [
+    'problem_file', 'size', 'nodes', 'max_depth', 'max_branching',
+    'leaves', 'right_nodes', 'right_leaves', 'properties',
+]
+
+
+def read_nodes(sgf_string):
+    """Get the size and the nodes of the given problem.
+
+    The small SGF parser is used if possible, as it is a lot quicker than
+    gomill.
+
+    :param str sgf_string: the SGF text
+    :returns: a (board size, nodes) tuple, where nodes is a list of \
+        (parent, property identifiers, is right) tuples, with the parents \
+        always before their children
+    :raises ValueError: if the SGF can't be parsed
+    """
+    try:
+        properties = list(iter_nodes(sgf_string))
+        nodes = [
+            (parent, props.keys(), 'RIGHT' in text_value(props.get('C', [''])[0]))
+            for parent, props in properties
+        ]
+        return board_size(properties[0][1]), nodes
+    except ValueError:
+        pass
+
+    game = sgf.Sgf_game.from_string(sgf_string)
+    nodes = []
+    to_visit = [(game.get_root(), -1)]
+    while to_visit:
+        node, parent = to_visit.pop()
+        right = node.has_property('C') and 'RIGHT' in node.get('C')
+        nodes.append((parent, node.properties(), right))
+        to_visit.extend(
+            (child, len(nodes) - 1) for child in reversed(list(node)))
+    return game.get_size(), nodes
+
+
+def problem_stats(problem_file):
+    """Get the statistics of the given problem's tree.
+
+    :param str problem_file: the SGF file to be checked
+    :returns: a (problem file, stats dict) tuple. The stats are None if the \
+        problem couldn't be loaded
+    """
+    try:
+        size, nodes = read_nodes(read_sgf(problem_file))
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_file, None
+
+    children = Counter(parent for parent, _, _ in nodes)
+    depths = []
+    properties = set()
+    stats = {
+        'size': size,
+        'nodes': len(nodes),
+        'max_depth': 0,
+        'max_branching': max(children[i] for i in xrange(len(nodes))),
+        'leaves': 0,
+        'right_nodes': 0,
+        'right_leaves': 0,
+    }
+    for index, (parent, identifiers, right) in enumerate(nodes):
+        depths.append(depths[parent] + 1 if parent >= 0 else 0)
+        properties.update(identifiers)
+        stats['right_nodes'] += right
+        if not children[index]:
+            stats['leaves'] += 1
+            stats['right_leaves'] += right
+    stats['max_depth'] = max(depths)
+    stats['properties'] = ','.join(sorted(properties))
+    return problem_file, stats
+
+
+class ProblemStats(object):
+
+    """The statistics of a whole library, stored column by column.
+
+    Problems are looked up by name (see `storage.problem_name`), so their
+    stats still apply once they've been compressed.
+    """
+
+    def __init__(self, columns=None):
+        """Initialise the statistics.
+
+        :param dict columns: {column name: list of values}
+        """
+        self.columns = columns or dict((column, []) for column in COLUMNS)
+        self.rows = dict(
+            (problem_name(problem_file), i)
+            for i, problem_file in enumerate(self.columns['problem_file'])
+        )
+
+    def __len__(self):
+        return len(self.columns['problem_file'])
+
+    def __contains__(self, problem_file):
+        return problem_name(problem_file) in self.rows
+
+    def add(self, problem_file, stats):
+        """Add the stats of a problem."""
+        self.rows[problem_name(problem_file)] = len(self)
+        self.columns['problem_file'].append(problem_file)
+        for column in COLUMNS[1:]:
+            self.columns[column].append(stats[column])
+
+    def get(self, problem_file, default=None):
+        """Get the stats of the given problem as a dict."""
+        try:
+            row = self.rows[problem_name(problem_file)]
+        except KeyError:
+            return default
+        return dict(
+            (column, values[row]) for column, values in self.columns.iteritems()
+        )
+
+    @classmethod
+    def collect(cls, problems_dir, processes=None):
+        """Get the stats of all problems in the given library.
+
+        :param str problems_dir: the base directory of the library
+        :param int processes: how many processes should be used
+        """
+        problems_dir = path(problems_dir)
+        stats = cls()
+        for problem_file, problem in map_problems(
+                problem_stats, iter_problem_files(problems_dir), processes):
+            if problem:
+                stats.add(str(problems_dir.relpathto(problem_file)), problem)
+        return stats
+
+    @classmethod
+    def load(cls, stats_file):
+        """Load the stats saved in the given file.
+
+        :returns: the loaded stats, or empty ones if the file can't be read
+        """
+        try:
+            with open(stats_file) as f:
+                return cls(json.load(f))
+        except (IOError, ValueError, KeyError):
+            return cls()
+
+    def save(self, stats_file):
+        """Save these stats as JSON."""
+        with open(stats_file, 'w') as f:
+            json.dump(self.columns, f)
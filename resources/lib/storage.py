@@ -0,0 +1,250 @@
+"""Compressed problem storage, using a dictionary shared by the whole library.
+
+Problems are small and very similar to each other, so compressing them one
+by one doesn't help much - unless the compressor already knows what they
+tend to look like. A dictionary of the most common SGF snippets is saved in
+the library's base directory, and each problem is compressed as if it came
+right after the dictionary, so it can refer back to any snippet from it.
+
+Python 2's zlib can't be given a preset dictionary, so the same effect is
+had by compressing the dictionary first and continuing from a copy of that
+compressor (and of the matching decompressor).
+"""
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import struct
+import zlib
+from collections import Counter
+
+DICTIONARY_FILE = 'sgf.dict'
+PLAIN_EXT = '.sgf'
+COMPRESSED_EXT = '.sgz'
+PROBLEM_EXTS = (PLAIN_EXT, COMPRESSED_EXT)
+MAGIC = 'SGZ'
+# deflate can only look 32KB back, which must also cover the problem itself
+DICTIONARY_SIZE = 16 * 1024
+
+token_parser = re.compile(r'[A-Z]+(?:\[(?:\\.|[^\]\\])*\])+|[;()]+')
+
+
+def is_problem_file(filename):
+    """Check whether the given file is a (possibly compressed) problem."""
+    return filename.endswith(PROBLEM_EXTS)
+
+
+def problem_name(problem_file):
+    """Get the given problem's path without its extension.
+
+    Problems keep their names when they get compressed, so anything that is
+    looked up by problem (stats, ratings, exclusions) should use these.
+    """
+    root, ext = os.path.splitext(problem_file)
+    return root if ext in PROBLEM_EXTS else problem_file
+
+
+def find_problem_file(problem_file):
+    """Find the given problem, even if it was compressed since it was noted.
+
+    :returns: the path of the problem as it is now, or the given path if \
+        there's no such problem
+    """
+    if os.path.exists(problem_file) or not is_problem_file(problem_file):
+        return problem_file
+    name = problem_name(problem_file)
+    for ext in PROBLEM_EXTS:
+        if os.path.exists(name + ext):
+            return problem_file.__class__(name + ext)
+    return problem_file
+
+
+def train_dictionary(sgf_strings, size=DICTIONARY_SIZE):
+    """Build a dictionary of the snippets shared by the given problems.
+
+    Each property (with its values) is counted once per problem it appears
+    in, and the most common ones are used. The most common ones go last, as
+    closer matches are cheaper for deflate to refer to.
+
+    :param sgf_strings: an iterable of SGF contents
+    :param int size: the maximum size of the dictionary
+    :rtype: str
+    """
+    counts = Counter()
+    for sgf_string in sgf_strings:
+        counts.update(set(token_parser.findall(sgf_string)))
+
+    tokens, total = [], 0
+    for token, count in counts.most_common():
+        if count < 2:
+            break
+        if total + len(token) > size:
+            continue
+        tokens.append(token)
+        total += len(token)
+    return ''.join(reversed(tokens))
+
+
+class Codec(object):
+
+    """Compresses and decompresses problems with a preset dictionary."""
+
+    def __init__(self, dictionary):
+        """Prepare the compressor and decompressor.
+
+        :param str dictionary: the shared dictionary
+        """
+        self.dictionary = dictionary
+        self.dictionary_id = struct.pack('>I', zlib.crc32(dictionary) & 0xffffffff)
+
+        self._compressor = zlib.compressobj(9)
+        prefix = self._compressor.compress(dictionary)
+        prefix += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        self._decompressor = zlib.decompressobj()
+        self._decompressor.decompress(prefix)
+
+    @classmethod
+    def load(cls, dictionary_file):
+        """Load the codec that uses the given dictionary file."""
+        with open(dictionary_file, 'rb') as f:
+            return cls(f.read())
+
+    def compress(self, sgf_string):
+        """Compress the given SGF."""
+        compressor = self._compressor.copy()
+        return MAGIC + self.dictionary_id + \
+            compressor.compress(sgf_string) + compressor.flush()
+
+    def decompress(self, data):
+        """Decompress the given problem.
+
+        :raises ValueError: if the data wasn't compressed with this dictionary
+        """
+        header = len(MAGIC) + len(self.dictionary_id)
+        if data[:header] != MAGIC + self.dictionary_id:
+            raise ValueError('The problem was compressed with a different dictionary')
+        decompressor = self._decompressor.copy()
+        try:
+            return decompressor.decompress(data[header:]) + decompressor.flush()
+        except zlib.error as e:
+            raise ValueError('Could not decompress the problem: %s' % e)
+
+
+_codecs = {}
+
+
+def find_codec(problem_file, levels=3):
+    """Get the codec of the library that the given problem is in.
+
+    The dictionary is looked for in the problem's directory and the ones
+    above it, as problems are usually kept in a directory per rank.
+
+    :raises IOError: if no dictionary could be found
+    """
+    directory = os.path.dirname(os.path.abspath(problem_file))
+    for _ in xrange(levels):
+        dictionary_file = os.path.join(directory, DICTIONARY_FILE)
+        if dictionary_file in _codecs:
+            return _codecs[dictionary_file]
+        if os.path.exists(dictionary_file):
+            _codecs[dictionary_file] = Codec.load(dictionary_file)
+            return _codecs[dictionary_file]
+        directory = os.path.dirname(directory)
+    raise IOError('No %s found for %s' % (DICTIONARY_FILE, problem_file))
+
+
+def read_sgf(problem_file):
+    """Read the given problem, decompressing it if needed.
+
+    :raises IOError: if the file (or its dictionary) can't be read
+    :raises ValueError: if the file can't be decompressed
+    """
+    with open(problem_file, 'rb') as f:
+        data = f.read()
+    if problem_file.endswith(COMPRESSED_EXT):
+        return find_codec(problem_file).decompress(data)
+    return data
+
+
+def read_problems(problem_files):
+    """Read the given problems one at a time, skipping any that can't be.
+
+    :returns: a generator of (problem file, SGF) tuples
+    """
+    for problem_file in problem_files:
+        try:
+            yield problem_file, read_sgf(problem_file)
+        except (IOError, ValueError) as e:
+            logging.warning('Could not read %s: %s', problem_file, e)
+
+
+def compress_library(problem_files, problems_dir, sample=None, keep=False):
+    """Compress all the given problems with a dictionary trained on them.
+
+    Any problems that were already compressed are recompressed with the
+    new dictionary. Problems are read one at a time (first the sample the
+    dictionary is trained on, then each one as it's compressed), so the
+    library never has to fit in memory. Problems that can't be read are
+    left as they are.
+
+    Everything is written to temporary files first, which only replace the
+    dictionary and the problems once all of them have been compressed - a
+    failure on the way leaves the library as it was, readable with the old
+    dictionary.
+
+    :param list problem_files: the problems to be compressed
+    :param str problems_dir: the base directory of the library, where the \
+        dictionary will be saved
+    :param int sample: how many problems to train the dictionary on
+    :param boolean keep: whether to keep the uncompressed files
+    :returns: a (size before, size after) tuple, in bytes
+    """
+    problem_files = list(problem_files)
+    # problems that were kept uncompressed last time are compressed again
+    # from their plain versions
+    plain = set(
+        problem_name(problem_file) for problem_file in problem_files
+        if problem_file.endswith(PLAIN_EXT)
+    )
+    problem_files = [
+        problem_file for problem_file in problem_files
+        if problem_file.endswith(PLAIN_EXT) or problem_name(problem_file) not in plain
+    ]
+    step = max(1, len(problem_files) // sample) if sample else 1
+    dictionary = train_dictionary(
+        sgf_string for _, sgf_string in read_problems(problem_files[::step]))
+    codec = Codec(dictionary)
+
+    dictionary_file = os.path.join(problems_dir, DICTIONARY_FILE)
+    # (temporary file, final file) of everything that gets written
+    written = [(dictionary_file + '.tmp', dictionary_file)]
+    compressed = []
+    before = after = 0
+    try:
+        with open(written[0][0], 'wb') as f:
+            f.write(dictionary)
+        for problem_file, sgf_string in read_problems(problem_files):
+            data = codec.compress(sgf_string)
+            compressed_file = os.path.splitext(problem_file)[0] + COMPRESSED_EXT
+            with open(compressed_file + '.tmp', 'wb') as f:
+                f.write(data)
+            written.append((compressed_file + '.tmp', compressed_file))
+            compressed.append(problem_file)
+            before += len(sgf_string)
+            after += len(data)
+
+        for tmp_file, final_file in written:
+            os.rename(tmp_file, final_file)
+    finally:
+        # anything left over didn't get used
+        for tmp_file, _ in written:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    _codecs[os.path.abspath(dictionary_file)] = codec
+    if not keep:
+        for problem_file in compressed:
+            if problem_file.endswith(PLAIN_EXT):
+                os.remove(problem_file)
+    return before, after
@@ -0,0 +1,74 @@
+"""Helpers to compare go positions regardless of orientation and colour."""
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+SYMMETRIES = 8
+COLOURS = {'b': 'w', 'w': 'b'}
+
+
+def transform_point(point, size, symmetry):
+    """Apply one of the 8 board symmetries to the given point.
+
+    Bit 4 of the symmetry transposes the board, bit 1 flips the rows and
+    bit 2 flips the columns, which between them give the whole dihedral group.
+
+    :param tuple point: a (row, column) tuple
+    :param int size: the size of the board
+    :param int symmetry: a number from 0 to 7
+    :returns: the transformed (row, column) tuple
+    """
+    row, col = point
+    if symmetry & 4:
+        row, col = col, row
+    if symmetry & 1:
+        row = size - 1 - row
+    if symmetry & 2:
+        col = size - 1 - col
+    return row, col
+
+
+def swap_colour(colour):
+    """Return the other player's colour, or the given value if not a colour."""
+    return COLOURS.get(colour, colour)
+
+
+def position_variants(stones, size, to_play=None):
+    """Get all 16 variants of the given position.
+
+    :param list stones: (colour, (row, column)) tuples
+    :param int size: the size of the board
+    :param str to_play: the player who is to move next, if known
+    :returns: a generator of (to_play, sorted stones) tuples
+    """
+    stones = list(stones)
+    for symmetry in xrange(SYMMETRIES):
+        transformed = [
+            (colour, transform_point(point, size, symmetry))
+            for colour, point in stones
+        ]
+        yield to_play, tuple(sorted(transformed))
+        yield swap_colour(to_play), tuple(sorted(
+            (swap_colour(colour), point) for colour, point in transformed
+        ))
+
+
+def canonical_position(stones, size, to_play=None):
+    """Get the smallest of all variants of the given position.
+
+    All positions that can be turned into each other by rotating, mirroring
+    or swapping colours have the same canonical position.
+    """
+    return min(position_variants(stones, size, to_play))
+
+
+def position_hash(stones, size, to_play=None):
+    """Get a hash that identifies the given position up to symmetry.
+
+    :param list stones: (colour, (row, column)) tuples
+    :param int size: the size of the board
+    :param str to_play: the player who is to move next, if known
+    :rtype: str
+    """
+    key = '%d:%r' % (size, canonical_position(stones, size, to_play))
+    return hashlib.sha1(key).hexdigest()
@@ -0,0 +1,204 @@
+"""Thumbnails of problems' setup positions, for the problem browser.
+
+Thumbnails are drawn in a background pool from the setup stones of each
+problem, and cached on disk under the hash of the problem's contents, so a
+problem only ever gets drawn once, and changed problems get new thumbnails.
+The pool uses threads, as starting processes from within Kodi would start
+another Kodi. Even the hashing is done in the pool, so browsing never has
+to read problems.
+"""
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+import os
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+from resources.lib.caches import registry
+from resources.lib.library import load_problem
+from resources.lib.search import region_around
+
+THUMBNAIL_SIZE = 128
+BOARD_COLOUR = (220, 179, 92)
+LINE_COLOUR = (60, 40, 10)
+STONE_COLOURS = {'b': (0, 0, 0), 'w': (255, 255, 255)}
+
+
+def available():
+    """Check whether thumbnails can be drawn."""
+    return Image is not None
+
+
+def content_key(data):
+    """Get the cache key of the given problem contents."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def render_thumbnail(board, size=THUMBNAIL_SIZE, margin=2):
+    """Draw the area of the given board that has any stones.
+
+    :param board: the gomill board to be drawn
+    :param int size: the width and height of the thumbnail
+    :param int margin: how many lines to show around the stones
+    :rtype: PIL.Image.Image
+    """
+    points = [point for _, point in board.list_occupied_points()]
+    region = region_around(points, board.side, margin) or \
+        region_around([(0, 0), (board.side - 1, board.side - 1)], board.side)
+    top = max(row for row, _ in region)
+    bottom = min(row for row, _ in region)
+    left = min(col for _, col in region)
+    right = max(col for _, col in region)
+    cell = size // max(top - bottom + 1, right - left + 1)
+
+    def centre(row, col):
+        """Get the position of the given point on the thumbnail."""
+        return (col - left) * cell + cell // 2, (top - row) * cell + cell // 2
+
+    image = Image.new('RGB', (size, size), BOARD_COLOUR)
+    draw = ImageDraw.Draw(image)
+    for row in xrange(bottom, top + 1):
+        draw.line([centre(row, left), centre(row, right)], fill=LINE_COLOUR)
+    for col in xrange(left, right + 1):
+        draw.line([centre(top, col), centre(bottom, col)], fill=LINE_COLOUR)
+
+    radius = cell // 2 - 1
+    for colour, (row, col) in board.list_occupied_points():
+        if (row, col) not in region:
+            continue
+        x, y = centre(row, col)
+        draw.ellipse(
+            [x - radius, y - radius, x + radius, y + radius],
+            fill=STONE_COLOURS[colour], outline=LINE_COLOUR,
+        )
+    return image
+
+
+def thumbnail_name(data, size):
+    """Get the name of the thumbnail of the given problem contents."""
+    key = content_key(data)
+    return os.path.join(key[:2], '%s_%d.png' % (key, size))
+
+
+def make_thumbnail(args):
+    """Draw and save the thumbnail of the given problem, unless it exists.
+
+    This is run in the background pool, so it takes a single tuple.
+
+    :param tuple args: (problem file, thumbnails folder, size)
+    :returns: a (problem file, thumbnail file or None) tuple
+    """
+    problem_file, cache_dir, size = args
+    try:
+        with open(problem_file, 'rb') as f:
+            thumbnail_file = os.path.join(cache_dir, thumbnail_name(f.read(), size))
+        if os.path.exists(thumbnail_file):
+            return problem_file, thumbnail_file
+        _, board = load_problem(problem_file)
+        image = render_thumbnail(board, size)
+        directory = os.path.dirname(thumbnail_file)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write to a temporary file, so that half written thumbnails are never used
+        image.save(thumbnail_file + '.tmp', 'PNG')
+        os.rename(thumbnail_file + '.tmp', thumbnail_file)
+    except (ValueError, IOError, OSError) as e:
+        logging.warning('Could not draw %s: %s', problem_file, e)
+        return problem_file, None
+    return problem_file, thumbnail_file
+
+
+class ThumbnailCache(object):
+
+    """Generates and caches thumbnails of problems."""
+
+    # the thumbnail file of each version of a problem, once it's been drawn
+    thumbnail_files = registry.cache('thumbnail names')
+
+    def __init__(self, cache_dir, size=THUMBNAIL_SIZE, threads=2):
+        """Initialise the cache.
+
+        :param str cache_dir: where the thumbnails are to be stored
+        :param int size: the width and height of the thumbnails
+        :param int threads: how many threads should draw thumbnails
+        """
+        self.cache_dir = cache_dir
+        self.size = size
+        self.threads = threads
+        # the versions of problems whose thumbnails are being drawn
+        self.pending = set()
+        self.lock = Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        """Get the background pool, creating it if needed."""
+        if self._pool is None:
+            self._pool = ThreadPool(self.threads)
+        return self._pool
+
+    def version(self, problem_file):
+        """Get the key of the current version of the given problem.
+
+        :raises EnvironmentError: if the problem doesn't exist
+        """
+        stat = os.stat(problem_file)
+        return (self.cache_dir, self.size, problem_file,
+                stat.st_mtime, stat.st_size)
+
+    def get(self, problem_file):
+        """Get the thumbnail of the given problem, if it has already been drawn.
+
+        If not, it gets queued to be found (or drawn) in the background.
+
+        :returns: the path to the thumbnail, or None if it isn't available yet
+        """
+        try:
+            version = self.version(problem_file)
+        except EnvironmentError:
+            return None
+        thumbnail_file = self.thumbnail_files.get(version)
+        if thumbnail_file and os.path.exists(thumbnail_file):
+            return thumbnail_file
+
+        with self.lock:
+            if version in self.pending:
+                return None
+            self.pending.add(version)
+        self.pool.apply_async(
+            make_thumbnail, ((problem_file, self.cache_dir, self.size),),
+            callback=lambda result: self._done(version, result),
+        )
+        return None
+
+    def get_many(self, problem_files):
+        """Get the thumbnails of all the given problems.
+
+        :returns: a list of thumbnail paths, with None for missing ones
+        """
+        return [self.get(problem_file) for problem_file in problem_files]
+
+    def _done(self, version, result):
+        """Note where the thumbnail of the given problem version is.
+
+        Thumbnails that couldn't be drawn are left as pending, so that they
+        don't get retried over and over.
+        """
+        _, thumbnail_file = result
+        if thumbnail_file is None:
+            return
+        self.thumbnail_files.put(version, thumbnail_file)
+        with self.lock:
+            self.pending.discard(version)
+
+    def close(self):
+        """Stop drawing thumbnails."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
@@ -0,0 +1,146 @@
+"""Check problem trees for moves and solutions that can't be played."""
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+
+from path import path
+
+from resources.lib.board import Goban
+from resources.lib.library import iter_problem_files, map_problems
+from resources.lib.storage import read_sgf
+
+REPORT_FILE = 'verify_report.json'
+
+# the kinds of issues that can be found
+UNLOADABLE = 'unloadable'
+NO_SOLUTION = 'no_solution'
+OCCUPIED = 'occupied'
+SUICIDE = 'suicide'
+KO = 'ko_violation'
+OUT_OF_TURN = 'out_of_turn'
+DUPLICATE = 'duplicate_variation'
+WRONG_PLAYER_RIGHT = 'right_on_opponent_move'
+UNREACHABLE_RIGHT = 'unreachable_right'
+
+
+def is_right(node):
+    """Check whether the given node is marked as a correct solution."""
+    return node.has_property('C') and 'RIGHT' in node.get('C')
+
+
+def count_right(node):
+    """Count all correct solutions in the given subtree."""
+    return is_right(node) + sum(count_right(child) for child in node)
+
+
+class Verifier(object):
+
+    """Replays every line of a problem, noting anything that is wrong."""
+
+    def __init__(self, sgf_string):
+        """Load the given problem.
+
+        :raises ValueError: if the SGF can't be loaded
+        """
+        self.goban = Goban(sgf_string=sgf_string)
+        if not self.goban.tree:
+            raise ValueError('empty SGF')
+        self.solver = self.goban.next_player
+        self.issues = []
+        self.reachable_right = 0
+
+    def issue(self, kind, node_path, node=None):
+        """Note an issue at the given node."""
+        issue = {'issue': kind, 'node': '.'.join(map(str, node_path))}
+        if node is not None:
+            colour, move = node.get_move()
+            issue.update(player=colour, move=move)
+        self.issues.append(issue)
+
+    def verify(self):
+        """Check the whole tree.
+
+        :returns: a list of issue dicts
+        """
+        self.reachable_right = is_right(self.goban.node)
+        self._verify_children(())
+        if not self.reachable_right:
+            self.issue(NO_SOLUTION, ())
+        return self.issues
+
+    def _verify_children(self, node_path):
+        """Play out all children of the goban's current node."""
+        goban = self.goban
+        played = set()
+        for i, child in enumerate(list(goban.node)):
+            child_path = node_path + (i,)
+            colour, move = child.get_move()
+            if move and move in played:
+                # only the first of these can ever be reached
+                self.issue(DUPLICATE, child_path, child)
+                if count_right(child):
+                    self.issue(UNREACHABLE_RIGHT, child_path, child)
+                continue
+            played.add(move)
+
+            if colour and colour != goban.next_player:
+                self.issue(OUT_OF_TURN, child_path, child)
+            if is_right(child) and colour and colour != self.solver:
+                self.issue(WRONG_PLAYER_RIGHT, child_path, child)
+
+            if not move:
+                # passes don't change the board
+                child.diff, child.ko_point = [], None
+                goban.node = child
+            elif goban.board.get(*move) is not None:
+                self.issue(OCCUPIED, child_path, child)
+                if count_right(child):
+                    self.issue(UNREACHABLE_RIGHT, child_path, child)
+                continue
+            else:
+                if move == getattr(goban.node, 'ko_point', None):
+                    self.issue(KO, child_path, child)
+                goban.node = goban._move(goban.node, colour, move)
+                if goban.board.get(*move) is None:
+                    self.issue(SUICIDE, child_path, child)
+
+            self.reachable_right += is_right(child)
+            self._verify_children(child_path)
+            goban.back()
+
+
+def verify_problem(problem_file):
+    """Check the given problem.
+
+    :param str problem_file: the SGF file to be checked
+    :returns: a (problem file, list of issues) tuple
+    """
+    try:
+        return problem_file, Verifier(read_sgf(problem_file)).verify()
+    except (ValueError, IOError) as e:
+        logging.warning('Could not load %s: %s', problem_file, e)
+        return problem_file, [{'issue': UNLOADABLE, 'error': str(e)}]
+
+
+def verify_library(problems_dir, processes=None):
+    """Check all problems in the given library.
+
+    :param str problems_dir: the base directory of the library
+    :param int processes: how many processes should be used
+    :returns: {problem file relative to problems_dir: issues}, only for \
+        problems that have any issues
+    """
+    problems_dir = path(problems_dir)
+    return dict(
+        (str(problems_dir.relpathto(problem_file)), issues)
+        for problem_file, issues in map_problems(
+            verify_problem, iter_problem_files(problems_dir), processes)
+        if issues
+    )
+
+
+def save_report(report, report_file):
+    """Save the given report as JSON."""
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
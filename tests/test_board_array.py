@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from gomill import boards
+
+from resources.lib import board_array
+from resources.lib.symmetry import swap_colour, transform_point
+
+
+STONES = [
+    ('b', (0, 0)), ('b', (0, 1)), ('w', (1, 0)), ('w', (1, 1)),
+    ('w', (0, 2)), ('b', (3, 3)),
+]
+
+
+def make_board(stones, size=5):
+    """Make a gomill board with the given stones."""
+    board = boards.Board(size)
+    for colour, (row, col) in stones:
+        board.board[row][col] = colour
+    return board
+
+
+@pytest.fixture
+def board():
+    return board_array.from_boards([make_board(STONES)])[0]
+
+
+def test_from_boards():
+    """Check whether gomill boards are converted to a stack of arrays."""
+    arrays = board_array.from_boards([make_board(STONES), make_board([])])
+    assert arrays.shape == (2, 5, 5)
+    assert arrays.dtype == np.int8
+    assert arrays[0, 0, 0] == board_array.BLACK
+    assert arrays[0, 1, 0] == board_array.WHITE
+    assert (arrays[0] != board_array.EMPTY).sum() == len(STONES)
+    assert not arrays[1].any()
+
+
+@pytest.mark.parametrize('symmetry', range(8))
+def test_transform(board, symmetry):
+    """Check whether stones get moved to the transformed points."""
+    transformed = board_array.transform(board, symmetry)
+    for colour, point in STONES:
+        row, col = transform_point(point, 5, symmetry)
+        assert transformed[row, col] == (
+            board_array.BLACK if colour == 'b' else board_array.WHITE)
+
+
+def test_variants(board):
+    """Check whether all variants of a batch are returned."""
+    variants = board_array.variants(np.stack([board, board]))
+    assert variants.shape == (16, 2, 5, 5)
+    assert (variants[8] == -variants[0]).all()
+
+
+@pytest.mark.parametrize('symmetry', range(8))
+def test_position_hashes(symmetry):
+    """Check whether symmetric positions get the same hash, and others don't."""
+    transformed = [
+        (swap_colour(colour), transform_point(point, 5, symmetry))
+        for colour, point in STONES
+    ]
+    arrays = board_array.from_boards([
+        make_board(STONES), make_board(transformed),
+        make_board(STONES[1:]), make_board(STONES),
+    ])
+    hashes = board_array.position_hashes(arrays, ['b', 'w', 'b', 'w'])
+    assert hashes[0] == hashes[1]
+    assert len(set(hashes)) == 3
+
+    larger = board_array.from_boards([make_board(STONES, 7)])
+    assert board_array.position_hashes(larger, ['b']) != hashes[:1]
+
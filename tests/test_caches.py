@@ -0,0 +1,153 @@
+import time
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.caches import CacheRegistry
+from resources.lib.problems import Problems
+from resources.lib.thumbnails import ThumbnailCache
+
+SGF = '(;SZ[9]AB[aa]AW[ba](;B[ca]C[RIGHT]))'
+
+
+def size_one(value):
+    return 1
+
+
+@pytest.yield_fixture
+def problems_dir():
+    """A small library, that gets deleted after the test ends."""
+    problems = path(mkdtemp())
+    (problems / '5_kyu').mkdir()
+    (problems / '5_kyu' / '5_kyu_1.sgf').write_text(SGF)
+    yield problems
+    problems.rmtree_p()
+
+
+def test_lru():
+    """Check whether the least recently used entries get dropped."""
+    cache = CacheRegistry(budget=2).cache('test', size_one)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+
+def test_stats():
+    """Check whether hits, misses and bytes are counted."""
+    registry = CacheRegistry(budget=100)
+    cache = registry.cache('test', len)
+    assert registry.cache('test') is cache
+    cache.put('a', 'x' * 10)
+    cache.put('b', 'x' * 20)
+    cache.put('a', 'x' * 5)
+    assert cache.get('a') == 'x' * 5
+    assert cache.get('c', 'default') == 'default'
+    assert cache.stats() == {
+        'entries': 2, 'bytes': 25, 'hits': 1, 'misses': 1, 'evictions': 0,
+        'hit_rate': 0.5,
+    }
+    assert registry.used == 25
+
+    cache.discard('b')
+    assert 'b' not in cache
+    assert registry.used == 5
+    cache.clear()
+    assert registry.used == cache.bytes == len(cache) == 0
+    assert registry.report()[1].startswith('test: 0 entries')
+
+
+def test_shared_budget():
+    """Check whether caches evict each other's least recently used entries."""
+    registry = CacheRegistry(budget=4)
+    first = registry.cache('first', size_one)
+    second = registry.cache('second', size_one)
+    first.put(1, 1)
+    second.put(1, 1)
+    first.put(2, 2)
+    second.put(2, 2)
+    first.get(1)
+
+    second.put(3, 3)
+    assert 1 not in second
+    first.put(3, 3)
+    assert 2 not in first
+    assert sorted(first.entries) == [1, 3]
+    assert sorted(second.entries) == [2, 3]
+    assert registry.used == 4
+
+
+def test_cost():
+    """Check whether costly entries are kept for longer than cheap ones."""
+    registry = CacheRegistry(budget=3)
+    costly = registry.cache('costly', size_one, cost=10)
+    cheap = registry.cache('cheap', size_one)
+    costly.put('a', 1)
+    cheap.put('a', 1)
+    cheap.put('b', 1)
+    cheap.put('c', 1)
+    cheap.put('d', 1)
+    assert 'a' in costly
+    assert sorted(cheap.entries) == ['c', 'd']
+
+
+@pytest.mark.parametrize('budget, kept', [
+    (10, ['b', 'c']),
+    (5, ['c']),
+    (2, []),
+])
+def test_budget(budget, kept):
+    """Check whether lowering the budget evicts entries that don't fit."""
+    registry = CacheRegistry(budget=10)
+    cache = registry.cache('test', len)
+    for key in 'abc':
+        cache.put(key, 'x' * 4)
+    registry.budget = budget
+    assert sorted(cache.entries) == kept
+    assert registry.used <= budget
+
+    # values bigger than the whole budget aren't cached
+    cache.put('d', 'x' * 11)
+    assert 'd' not in cache
+
+
+def test_problems(problems_dir, monkeypatch):
+    """Check whether problems are read once."""
+    monkeypatch.setattr(
+        Problems, 'sgfs', CacheRegistry().cache('problem SGFs'))
+    problems = Problems(problems_dir)
+    problem = problems.problem_at('5_kyu/5_kyu_1.sgf')
+    assert problems.read_problem(dict(problem))['sgf'] == SGF
+
+    (problems_dir / '5_kyu' / '5_kyu_1.sgf').remove()
+    assert problems.read_problem(dict(problem))['sgf'] == SGF
+    assert problems.sgfs.hits == 1
+
+
+def test_thumbnail_files(problems_dir, monkeypatch):
+    """Check whether problems only get hashed again when they change."""
+    monkeypatch.setattr(
+        ThumbnailCache, 'thumbnail_files', CacheRegistry().cache('names'))
+    thumbnails = ThumbnailCache(problems_dir / 'thumbnails', threads=1)
+    problem_file = problems_dir / '5_kyu' / '5_kyu_1.sgf'
+    try:
+        assert thumbnails.get(problem_file) is None
+        for _ in xrange(100):
+            if not thumbnails.pending:
+                break
+            time.sleep(0.05)
+        assert thumbnails.get(problem_file)
+        assert thumbnails.thumbnail_files.hits == 1
+
+        # changed problems are hashed again
+        problem_file.write_text(SGF + '\n')
+        assert thumbnails.get(problem_file) is None
+        assert thumbnails.thumbnail_files.misses == 2
+    finally:
+        thumbnails.close()
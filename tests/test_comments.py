@@ -0,0 +1,123 @@
+import os
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.comments import (
+    COMMENTS_FILE, CommentIndex, problem_rank, read_comments,
+)
+from resources.lib.problems import Problems
+
+KO = '(;SZ[9]AP[goproblems:1.2]AB[aa]AW[ba]C[Black to live with a ko]' \
+    '(;B[ca]C[Ko is only a half success])(;B[cb];W[da]C[RIGHT]))'
+LADDER = '(;SZ[9]AB[aa]AW[ba]C[Catch the stones]' \
+    '(;B[ca];W[cb]C[The ladders work for White])(;B[cb]C[RIGHT]))'
+
+
+@pytest.yield_fixture
+def problems_dir():
+    """A small library, that gets deleted after the test ends."""
+    problems = path(mkdtemp())
+    (problems / '5_kyu').mkdir()
+    (problems / '5_kyu' / '5_kyu_1.sgf').write_text(KO)
+    (problems / '1_dan').mkdir()
+    (problems / '1_dan' / '2.sgf').write_text(LADDER)
+    yield problems
+    problems.rmtree_p()
+
+
+def reject(sgf_string):
+    """Stand in for the small parser, refusing every SGF."""
+    raise ValueError('not parsed')
+
+
+@pytest.mark.parametrize('small_parser', (True, False))
+def test_read_comments(small_parser, monkeypatch):
+    """Check whether the comments of all nodes are found."""
+    if not small_parser:
+        # gomill rejects anything the small parser does, so it gets broken
+        monkeypatch.setattr('resources.lib.comments.iter_nodes', reject)
+    application, root_comment, comments = read_comments(KO)
+    assert application == 'goproblems'
+    assert root_comment == 'Black to live with a ko'
+    assert comments == ['Ko is only a half success', 'RIGHT']
+
+
+@pytest.mark.parametrize('problem_key, rank', (
+    ('5_kyu/5_kyu_1.sgf', '5 kyu'),
+    ('1_dan/2.sgf', '1 dan'),
+    ('bla/2.sgf', ''),
+))
+def test_problem_rank(problem_key, rank):
+    """Check whether ranks are taken from the problems' names."""
+    assert problem_rank(problem_key) == rank
+
+
+@pytest.mark.parametrize('query, found', (
+    ('ko', ['5_kyu/5_kyu_1.sgf']),
+    # stemmed, so this finds "ladders"
+    ('ladder', ['1_dan/2.sgf']),
+    ('RIGHT', ['1_dan/2.sgf', '5_kyu/5_kyu_1.sgf']),
+    ('rank:dan', ['1_dan/2.sgf']),
+    ('application:goproblems', ['5_kyu/5_kyu_1.sgf']),
+    ('root_comment:ladder', []),
+    ('ko OR catch', ['1_dan/2.sgf', '5_kyu/5_kyu_1.sgf']),
+    ('tesuji', []),
+))
+def test_search(problems_dir, query, found):
+    """Check whether problems can be found by their comments and ranks."""
+    index = CommentIndex(problems_dir / COMMENTS_FILE)
+    assert index.update(problems_dir, processes=1) == (2, 0)
+    assert index.search(query) == found
+
+
+def test_bad_query(problems_dir):
+    """Check whether malformed queries are reported."""
+    index = CommentIndex(':memory:')
+    index.update(problems_dir, processes=1)
+    with pytest.raises(ValueError):
+        index.search('"ko')
+
+
+def test_incremental_update(problems_dir):
+    """Check whether only added and changed problems are indexed again."""
+    index_file = problems_dir / COMMENTS_FILE
+    CommentIndex(index_file).update(problems_dir, processes=1)
+
+    index = CommentIndex(index_file)
+    assert index.update(problems_dir, processes=1) == (0, 0)
+
+    changed = problems_dir / '1_dan' / '2.sgf'
+    changed.write_text(LADDER.replace('ladders', 'nets'))
+    # make sure the change is seen even on coarse file systems
+    os.utime(changed, (1, 1))
+    (problems_dir / '1_dan' / '3.sgf').write_text(LADDER)
+    (problems_dir / '5_kyu' / '5_kyu_1.sgf').remove()
+
+    assert index.update(problems_dir, processes=1) == (2, 1)
+    assert len(index) == 2
+    assert index.search('net') == ['1_dan/2.sgf']
+    assert index.search('ladder') == ['1_dan/3.sgf']
+    assert index.search('ko') == []
+
+
+def test_broken_problem(problems_dir):
+    """Check whether unreadable problems are indexed by their rank alone."""
+    (problems_dir / '1_dan' / '3.sgf').write_text('(;B[aa')
+    index = CommentIndex(':memory:')
+    assert index.update(problems_dir, processes=1) == (3, 0)
+    assert index.search('dan') == ['1_dan/2.sgf', '1_dan/3.sgf']
+
+
+def test_problems_search(problems_dir):
+    """Check whether the index can be used to pick problems."""
+    problems = Problems(problems_dir)
+    assert problems.search('ko') == []
+
+    CommentIndex(problems_dir / COMMENTS_FILE).update(problems_dir, processes=1)
+    found = problems.search('ladder OR ko')
+    assert [p['problem_file'] for p in found] == [
+        problems_dir / '1_dan' / '2.sgf', problems_dir / '5_kyu' / '5_kyu_1.sgf',
+    ]
+    assert [p['rank'] for p in found] == [(1, 'dan'), (5, 'kyu')]
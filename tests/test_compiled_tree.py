@@ -0,0 +1,94 @@
+import pytest
+from gomill import sgf
+
+from resources.lib.board import Goban
+from resources.lib.compiled_tree import (
+    CompiledTree, pack_move, unpack_move, RIGHT, CORRECT_PATH, ORIGINAL,
+)
+from resources.lib.problems import MockProblems
+
+
+@pytest.fixture
+def tree():
+    return CompiledTree.from_game(sgf.Sgf_game.from_string(MockProblems.sgf3))
+
+
+@pytest.mark.parametrize('colour, move', (
+    ('b', (0, 0)),
+    ('w', (18, 18)),
+    ('b', (3, 15)),
+    ('w', None),
+    (None, None),
+))
+def test_pack_move(colour, move):
+    """Check whether moves survive being packed."""
+    assert unpack_move(pack_move(colour, move)) == (colour, move)
+
+
+def test_compiled_structure(tree):
+    """Check whether the tree's structure matches the SGF."""
+    assert len(tree) == 4
+    root = tree.root
+    assert root.parent is None
+    assert root.get_move() == (None, None)
+    assert [child.get_move() for child in root] == [
+        ('w', (7, 1)), ('w', (8, 0)),
+    ]
+    assert root[1][0].get_move() == ('b', (7, 1))
+    assert root[1][0].parent == root[1]
+    assert 'LB' not in root.markup
+    with pytest.raises(IndexError):
+        root[2]
+
+
+def test_compiled_flags(tree):
+    """Check whether correct solutions and paths are flagged."""
+    root, right, wrong = tree.root, tree.root[0], tree.root[1]
+    assert right.is_right and right.on_correct_path
+    assert not root.is_right and root.on_correct_path
+    assert not wrong.on_correct_path and not wrong[0].on_correct_path
+    assert all(tree.flags[i] & ORIGINAL for i in xrange(len(tree)))
+    assert tree.flags[right.index] == RIGHT | CORRECT_PATH | ORIGINAL
+
+
+def test_compiled_comments(tree):
+    """Check whether comments are interned and available as properties."""
+    assert tree.root.comment == 'W to kill'
+    assert tree.root.get('C') == 'W to kill'
+    assert tree.root[0].has_property('C')
+    assert not tree.root[1].has_property('C')
+    assert tree.root[1].comment == ''
+    with pytest.raises(KeyError):
+        tree.root[1].get('C')
+
+
+def test_find_child(tree):
+    """Check whether children can be found by their move."""
+    assert tree.root.find_child((8, 0)) == tree.root[1]
+    assert tree.root.find_child((0, 0)) is None
+
+    child = tree.root.new_child()
+    child.set_move('w', (0, 0))
+    assert tree.root.find_child((0, 0)) == child
+    assert len(tree.root) == 3
+    assert not child.original and not child.on_correct_path
+
+
+def test_goban_play():
+    """Check whether the goban can play through the compiled tree."""
+    goban = Goban(sgf_string=MockProblems.sgf3)
+    assert goban.next_player == 'w'
+    assert goban.current_comment == 'W to kill'
+
+    goban.move(8, 0)
+    assert goban.on_path and not goban.correct and not goban.good_path
+    goban.back()
+    goban.move(7, 1)
+    assert goban.on_path and goban.correct and goban.good_path
+
+    goban.back()
+    goban.move(0, 0)
+    assert not goban.on_path and not goban.correct
+    assert goban.board.get(0, 0) == 'w'
+    goban.back()
+    assert goban.board.get(0, 0) is None
@@ -0,0 +1,75 @@
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+from PIL import Image
+
+from resources.lib.compositor import Atlas, Compositor
+
+MEDIA = path(__file__).parent.parent / 'resources' / 'skins' / 'default' / 'media'
+
+
+@pytest.yield_fixture
+def compositor():
+    output_dir = path(mkdtemp())
+    yield Compositor((40, 20), output_dir, lambda f: MEDIA / f)
+    output_dir.rmtree_p()
+
+
+def pixel(image_file, x, y):
+    return Image.open(image_file).convert('RGBA').getpixel((x, y))
+
+
+def test_render_cells(compositor):
+    """Check whether cells get drawn where they should be."""
+    compositor.set_cell((0, 0), (0, 0, 20, 20), 'black.png')
+    compositor.set_cell((0, 1), (20, 0, 20, 20), 'empty.png')
+    image_file = compositor.render()
+
+    assert path(image_file).exists()
+    assert pixel(image_file, 10, 10)[3] > 0
+    assert pixel(image_file, 30, 10)[3] == 0
+
+
+def test_render_only_changes(compositor):
+    """Check whether new images are only made when something changes."""
+    compositor.set_cell((0, 0), (0, 0, 20, 20), 'black.png')
+    first = compositor.render()
+    compositor.set_cell((0, 0), (0, 0, 20, 20), 'black.png')
+    assert compositor.render() is None
+
+    compositor.set_cell((0, 1), (20, 0, 20, 20), 'white.png')
+    second = compositor.render()
+    assert second != first
+    assert not path(first).exists()
+    assert pixel(second, 10, 10)[3] > 0
+    assert pixel(second, 30, 10)[3] > 0
+
+
+def test_remove_cell(compositor):
+    """Check whether removed cells get cleared."""
+    compositor.set_cell((0, 0), (0, 0, 20, 20), 'black.png')
+    compositor.render()
+    compositor.remove_cell((0, 0))
+    assert pixel(compositor.render(), 10, 10)[3] == 0
+
+    current = compositor.current
+    compositor.clear()
+    assert compositor.current is None
+    assert not compositor.cells
+    assert not path(current).exists()
+
+
+def test_atlas(compositor):
+    """Check whether images are taken from the atlas."""
+    atlas = Atlas(['black.png', 'white.png', 'empty.png'], lambda f: MEDIA / f, 2)
+    assert atlas.image.size == (162, 160)
+    assert 'white.png' in atlas and 'wall.png' not in atlas
+    assert atlas.sprite('white.png').size == (81, 80)
+
+    compositor.atlas = atlas
+    compositor.set_cell((0, 0), (0, 0, 20, 20), 'white.png')
+    compositor.set_cell((0, 1), (20, 0, 20, 20), 'wall.png')
+    image_file = compositor.render()
+    assert pixel(image_file, 10, 10) == (255, 255, 255, 255)
+    assert pixel(image_file, 30, 10)[3] > 0
@@ -0,0 +1,113 @@
+import json
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.dedup import (
+    DUPLICATES_FILE, excluded_problems, find_duplicates, save_duplicates,
+)
+from resources.lib.problems import Problems
+
+SIZE = 9
+# (colour, (column, row)) setup stones and moves, with the moves being two
+# variations of a single black move, followed by a white reply in the second
+SETUP = [('B', (0, 0)), ('B', (1, 0)), ('W', (2, 0)), ('W', (2, 1))]
+MOVES = [(1, 1), (0, 1)]
+REPLY = (3, 0)
+
+
+def identity(point):
+    return point
+
+
+def mirror(point):
+    return SIZE - 1 - point[0], point[1]
+
+
+def rotate(point):
+    return point[1], SIZE - 1 - point[0]
+
+
+def make_sgf(transform=identity, swap=False, setup=SETUP, right=0):
+    """Make the test problem, transformed by the given symmetry."""
+    def colour(value):
+        return {'B': 'W', 'W': 'B'}[value] if swap else value
+
+    def sgf_point(point):
+        col, row = transform(point)
+        return chr(ord('a') + col) + chr(ord('a') + row)
+
+    stones = ''.join(
+        '%s[%s]' % ('A' + colour(value), sgf_point(point))
+        for value, point in setup
+    )
+    first, second = [
+        ';%s[%s]%s' % (colour('B'), sgf_point(move),
+                       'C[RIGHT]' if i == right else '')
+        for i, move in enumerate(MOVES)
+    ]
+    return '(;SZ[%d]%s(%s)(%s;%s[%s]))' % (
+        SIZE, stones, first, second, colour('W'), sgf_point(REPLY))
+
+
+@pytest.yield_fixture
+def problems_dir():
+    """A library with a problem, its variants and some different problems."""
+    problems = path(mkdtemp())
+    (problems / '5_kyu').mkdir()
+    problem_files = {
+        '5_kyu_1.sgf': make_sgf(),
+        '5_kyu_2.sgf': make_sgf(mirror),
+        '5_kyu_3.sgf': make_sgf(rotate),
+        '5_kyu_4.sgf': make_sgf(lambda p: rotate(mirror(p)), swap=True),
+        '5_kyu_5.sgf': make_sgf(swap=True),
+        # a different setup
+        '5_kyu_6.sgf': make_sgf(setup=SETUP + [('W', (4, 4))]),
+        # the same moves, but the other one is right
+        '5_kyu_7.sgf': make_sgf(right=1),
+        '5_kyu_8.sgf': '(;SZ[9]',
+    }
+    for name, sgf_string in problem_files.iteritems():
+        (problems / '5_kyu' / name).write_text(sgf_string)
+    yield problems
+    problems.rmtree_p()
+
+
+def test_find_duplicates(problems_dir):
+    """Check whether rotated, mirrored and colour swapped copies are grouped."""
+    duplicates = find_duplicates(problems_dir, processes=1)
+    assert duplicates.values() == [
+        ['5_kyu/5_kyu_%d.sgf' % i for i in xrange(1, 6)]]
+    assert len(duplicates.keys()[0]) == 32
+
+
+def test_different_problems(problems_dir):
+    """Check whether problems with different setups or solutions are apart."""
+    for name in ('5_kyu_2.sgf', '5_kyu_3.sgf', '5_kyu_4.sgf', '5_kyu_5.sgf'):
+        (problems_dir / '5_kyu' / name).remove()
+    assert find_duplicates(problems_dir, processes=1) == {}
+
+
+def test_excluded_problems():
+    """Check whether the first problem of each group is kept."""
+    duplicates = {
+        'a': ['1_kyu/1.sgf', '1_kyu/2.sgf', '2_kyu/3.sgf'],
+        'b': ['3_kyu/4.sgf', '3_kyu/5.sgf'],
+    }
+    assert excluded_problems(duplicates) == [
+        '1_kyu/2.sgf', '2_kyu/3.sgf', '3_kyu/5.sgf']
+
+
+def test_save_duplicates(problems_dir):
+    """Check whether the saved exclusions make the game skip duplicates."""
+    duplicates = find_duplicates(problems_dir, processes=1)
+    save_duplicates(problems_dir, duplicates)
+
+    with open(problems_dir / DUPLICATES_FILE) as f:
+        assert json.load(f) == duplicates
+    problems = Problems(problems_dir)
+    assert not problems.is_excluded(problems_dir / '5_kyu' / '5_kyu_1.sgf')
+    for i in xrange(2, 6):
+        assert problems.is_excluded(problems_dir / '5_kyu' / ('5_kyu_%d.sgf' % i))
+    assert not problems.is_excluded(problems_dir / '5_kyu' / '5_kyu_6.sgf')
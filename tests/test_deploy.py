@@ -1,6 +1,8 @@
+import zipfile
+
 import pytest
 
-from deploy import tmp, copy, clean
+from deploy import ZIP_DATE, tmp, copy, clean, zip_file
 
 
 @pytest.yield_fixture
@@ -66,3 +68,48 @@ def test_clean(temp):
         assert not (temp / filename).exists()
         assert not (test_dir / filename).exists()
 
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_zip_file(temp, processes):
+    """Check whether text is deflated, and images stored as they are."""
+    package = temp / 'package'
+    (package / 'media').makedirs_p()
+    (package / 'game.py').write_text('print "bla"\n' * 100)
+    (package / 'problem.sgf').write_text('(;SZ[9]AB[aa];B[ba]C[RIGHT])' * 10)
+    (package / 'media' / 'stone.png').write_bytes('\x89PNG' * 100)
+    (package / 'media' / 'board.jpeg').write_bytes('\xff\xd8' * 100)
+    (package / 'empty.txt').touch()
+
+    zip_file(package, temp / 'package.zip', processes)
+
+    with zipfile.ZipFile(temp / 'package.zip') as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [
+            'empty.txt', 'game.py', 'media/', 'media/board.jpeg',
+            'media/stone.png', 'problem.sgf']
+        methods = dict(
+            (info.filename, info.compress_type) for info in zf.infolist())
+        assert zf.read('game.py') == 'print "bla"\n' * 100
+        assert zf.read('media/stone.png') == '\x89PNG' * 100
+        assert set(info.date_time for info in zf.infolist()) == {ZIP_DATE}
+    assert methods == {
+        'empty.txt': zipfile.ZIP_STORED,
+        'game.py': zipfile.ZIP_DEFLATED,
+        'media/': zipfile.ZIP_STORED,
+        'media/board.jpeg': zipfile.ZIP_STORED,
+        'media/stone.png': zipfile.ZIP_STORED,
+        'problem.sgf': zipfile.ZIP_DEFLATED,
+    }
+
+
+def test_reproducible_zip(temp):
+    """Check whether zipping the same files gives the same bytes."""
+    package = temp / 'package'
+    package.makedirs_p()
+    for i in xrange(20):
+        (package / ('file_%d.txt' % i)).write_text('bla %d\n' % i * i)
+
+    zip_file(package, temp / 'first.zip', processes=2)
+    (package / 'file_3.txt').utime((0, 0))
+    zip_file(package, temp / 'second.zip', processes=1)
+    assert (temp / 'first.zip').bytes() == (temp / 'second.zip').bytes()
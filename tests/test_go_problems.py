@@ -0,0 +1,148 @@
+import json
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from go_problems import SYNC_FILE, SyncState, get_problem, sync_problems
+
+PAGE = """<html><body>
+<div class="prob_id"><a>%(id)d</a></div>
+<div class="difficulty"><a>%(rank)s</a></div>
+<a id="flag_link">%(rating)s</a>
+<div id="player-container">(;AB[aa]C[%(comment)s];W[bb]C[RIGHT])</div>
+</body></html>"""
+
+
+class Site(object):
+    """The problems served by the stand-in server."""
+
+    def __init__(self):
+        self.problems = {
+            1: {'id': 1, 'rank': '5 kyu', 'rating': '2', 'comment': 'a'},
+            2: {'id': 2, 'rank': '1 dan', 'rating': '3', 'comment': 'b'},
+        }
+        self.versions = dict((problem_id, 1) for problem_id in self.problems)
+        self.requests = []
+        # {problem id: how many more requests get a server error}
+        self.failures = {}
+
+    def change(self, problem_id, **changes):
+        self.problems[problem_id].update(changes)
+        self.versions[problem_id] += 1
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body='', headers=None):
+        self.send_response(code)
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        site = self.server.site
+        if self.path.startswith('/api'):
+            data = {'aaData': [[max(site.problems)]]}
+            return self.send(200, json.dumps(data))
+
+        problem_id = int(self.path.strip('/'))
+        site.requests.append(problem_id)
+        if site.failures.get(problem_id):
+            site.failures[problem_id] -= 1
+            return self.send(500, 'error')
+        if problem_id not in site.problems:
+            return self.send(404, 'missing')
+
+        etag = '"%d-%d"' % (problem_id, site.versions[problem_id])
+        if self.headers.get('If-None-Match') == etag:
+            return self.send(304)
+        self.send(200, PAGE % site.problems[problem_id], {'ETag': etag})
+
+
+@pytest.yield_fixture
+def site():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.site = Site()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    server.site.url = 'http://127.0.0.1:%d' % server.server_port
+    yield server.site
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.yield_fixture
+def base_dir():
+    directory = path(mkdtemp())
+    yield directory
+    directory.rmtree_p()
+
+
+def sync(site, base_dir):
+    return sync_problems(
+        base_dir, site.url + '/%d', site.url + '/api', delay=0)
+
+
+def test_get_problem_conditional(site, base_dir):
+    """Check whether unchanged problems aren't downloaded again."""
+    cache = {}
+    assert get_problem(base_dir, 1, site.url + '/%d', cache=cache)
+    assert cache['etag'] == '"1-1"'
+    assert cache['problem_file'] == '5_kyu/[2]5_kyu_1.sgf'
+    assert (base_dir / cache['problem_file']).exists()
+
+    assert not get_problem(base_dir, 1, site.url + '/%d', cache=cache)
+
+
+def test_sync(site, base_dir):
+    """Check whether only new and changed problems get downloaded."""
+    assert sync(site, base_dir) == (2, 0)
+    assert site.requests == [0, 1, 2]
+    assert (base_dir / '5_kyu' / '[2]5_kyu_1.sgf').exists()
+    assert (base_dir / '1_dan' / '[3]1_dan_2.sgf').exists()
+
+    state = SyncState.load(base_dir / SYNC_FILE)
+    assert state.newest_id == 2
+    assert sorted(state.pages) == ['1', '2']
+
+    # nothing changed, so only conditional requests are made
+    site.requests = []
+    assert sync(site, base_dir) == (0, 0)
+    assert site.requests == [1, 2]
+
+    # a new problem, and a changed rating, which also changes the file name
+    site.problems[3] = {'id': 3, 'rank': '5 kyu', 'rating': '1', 'comment': 'c'}
+    site.versions[3] = 1
+    site.change(1, rating='4')
+    site.requests = []
+    assert sync(site, base_dir) == (1, 1)
+    assert site.requests == [3, 1, 2]
+    assert (base_dir / '5_kyu' / '[4]5_kyu_1.sgf').exists()
+    assert not (base_dir / '5_kyu' / '[2]5_kyu_1.sgf').exists()
+
+
+def test_sync_retries(site, base_dir):
+    """Check whether problems that got server errors are fetched next time."""
+    site.failures[1] = 1
+    assert sync(site, base_dir) == (1, 0)
+    state = SyncState.load(base_dir / SYNC_FILE)
+    assert state.newest_id == 2
+    assert state.failed == [1]
+    assert sorted(state.pages) == ['2']
+
+    # missing problems aren't retried, but the failed one is
+    site.requests = []
+    assert sync(site, base_dir) == (1, 0)
+    assert site.requests == [1, 2]
+    state = SyncState.load(base_dir / SYNC_FILE)
+    assert state.failed == []
+    assert (base_dir / '5_kyu' / '[2]5_kyu_1.sgf').exists()
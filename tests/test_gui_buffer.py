@@ -0,0 +1,50 @@
+from resources.lib.gui_buffer import CommandBuffer
+
+
+class Control(object):
+
+    """A fake control that records all calls made to it."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def setImage(self, image):
+        self.calls.append((self, 'setImage', image))
+
+    def setVisible(self, visible):
+        self.calls.append((self, 'setVisible', visible))
+
+
+def test_flush_merges_calls():
+    """Check whether only the last call of each method is made."""
+    calls = []
+    buffer = CommandBuffer()
+    first, second = Control(calls), Control(calls)
+
+    buffer.call(first, 'setImage', 'a.png')
+    buffer.call(second, 'setImage', 'b.png')
+    buffer.call(first, 'setVisible', False)
+    buffer.call(first, 'setImage', 'c.png')
+    assert not calls
+    assert len(buffer) == 3
+
+    assert buffer.flush() == 3
+    assert calls == [
+        (second, 'setImage', 'b.png'),
+        (first, 'setVisible', False),
+        (first, 'setImage', 'c.png'),
+    ]
+    assert buffer.flush() == 0
+
+
+def test_discard():
+    """Check whether calls of removed controls are dropped."""
+    calls = []
+    buffer = CommandBuffer()
+    first, second = Control(calls), Control(calls)
+
+    buffer.call(first, 'setImage', 'a.png')
+    buffer.call(second, 'setImage', 'b.png')
+    buffer.discard([first])
+    buffer.flush()
+    assert calls == [(second, 'setImage', 'b.png')]
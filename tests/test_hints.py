@@ -0,0 +1,49 @@
+import pytest
+
+from resources.lib.board import Goban
+
+SGF = '(;SZ[9]AB[cc]AW[dd]' \
+    '(;B[aa];W[ba](;B[ca]C[RIGHT])(;B[da]))' \
+    '(;B[bb];W[ab])' \
+    '(;B[ee]C[RIGHT]))'
+
+
+@pytest.mark.parametrize('extra', (
+    '',
+    # unknown properties make it go through gomill
+    'PL[B]',
+))
+def test_hint_overlay(extra):
+    """Check whether the moves from a node are marked as good or bad."""
+    goban = Goban(sgf_string=SGF.replace('AW[dd]', 'AW[dd]' + extra))
+    assert goban.hint_overlay() == {
+        (8, 0): 'good', (7, 1): 'bad', (4, 4): 'good',
+    }
+
+    goban.move(8, 0)
+    assert goban.hint_overlay() == {(8, 1): 'good'}
+    goban.move(8, 1)
+    assert goban.hint_overlay() == {(8, 2): 'good', (8, 3): 'bad'}
+    assert goban.hint_overlay(goban.root) == {
+        (8, 0): 'good', (7, 1): 'bad', (4, 4): 'good',
+    }
+
+
+def test_hint_overlay_cached():
+    """Check whether overlays are only worked out once per node."""
+    goban = Goban(sgf_string=SGF)
+    overlay = goban.hint_overlay()
+    assert goban.hint_overlay() is overlay
+
+    goban.move(0, 0)
+    goban.back()
+    assert goban.hint_overlay() is not overlay
+    assert goban.hint_overlay() == dict(overlay, **{(0, 0): 'bad'})
+
+
+def test_hint_overlay_reset():
+    """Check whether overlays are dropped when a new problem is loaded."""
+    goban = Goban(sgf_string=SGF)
+    goban.hint_overlay()
+    goban.load('(;SZ[9](;B[ee]C[RIGHT]))')
+    assert goban.hint_overlay() == {(4, 4): 'good'}
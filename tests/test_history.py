@@ -0,0 +1,90 @@
+import pytest
+
+from resources.lib.board import Goban
+from resources.lib.sgf_parser import point
+
+# a long line of moves, none of which capture anything
+MOVES = [
+    chr(97 + col) + chr(97 + row)
+    for row in xrange(0, 19, 3) for col in xrange(0, 19, 4)
+]
+LINE = ''.join(
+    ';%s[%s]' % ('BW'[i % 2], move) for i, move in enumerate(MOVES))
+SGF = '(;SZ[19]AB[jj](%s)(;B[jk]))' % LINE
+
+
+def played(moves):
+    """Get the board after playing the given number of moves by hand."""
+    goban = Goban(sgf_string=SGF)
+    for move in MOVES[:moves]:
+        goban.move(*point(move, 19))
+    return goban
+
+
+@pytest.fixture
+def goban():
+    return played(len(MOVES))
+
+
+@pytest.mark.parametrize('start', (0, 5, 16, len(MOVES)))
+@pytest.mark.parametrize('target', (0, 1, 7, 8, 9, 17, len(MOVES) - 1))
+def test_jump(start, target):
+    """Check whether jumping ends up in the same position as playing."""
+    goban = played(start)
+    goban.jump(target)
+    expected = played(target)
+    assert goban.move_number == target
+    assert goban.node.index == expected.node.index
+    assert goban.board.board == expected.board.board
+
+
+def test_jump_to_start(goban):
+    """Check whether the initial position can be jumped back to."""
+    assert goban.jump_to_start()
+    assert goban.node == goban.root
+    assert goban.board.list_occupied_points() == [('b', (9, 9))]
+    assert not goban.jump_to_start()
+
+
+def test_jump_uses_snapshots(goban, monkeypatch):
+    """Check whether far jumps restore saved positions, rather than go back."""
+    def back():
+        raise AssertionError('went back move by move')
+    monkeypatch.setattr(goban, 'back', back)
+    goban.jump(17)
+    assert goban.board.board == played(17).board.board
+
+
+def test_back_after_jump(goban):
+    """Check whether moves can still be taken back after a jump."""
+    goban.jump(10)
+    goban.back()
+    assert goban.board.board == played(9).board.board
+
+
+def test_jump_to_end(goban):
+    """Check whether the end of the line is remembered."""
+    goban.jump(3)
+    assert goban.jump_to_end()
+    assert goban.move_number == len(MOVES)
+    assert goban.board.board == played(len(MOVES)).board.board
+
+
+def test_jump_to_end_follows_problem():
+    """Check whether lines continue along the problem's first variations."""
+    goban = Goban(sgf_string=SGF)
+    goban.jump_to_end()
+    assert goban.move_number == len(MOVES)
+    assert goban.board.board == played(len(MOVES)).board.board
+
+
+def test_new_line():
+    """Check whether playing a new move starts a new line."""
+    goban = played(5)
+    goban.jump(2)
+    goban.move(18, 18)
+    assert not goban.on_path
+    goban.jump_to_start()
+    goban.jump_to_end()
+    assert goban.move_number == 3
+    assert goban.board.get(18, 18) is not None
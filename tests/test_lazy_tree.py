@@ -0,0 +1,173 @@
+import pytest
+from gomill import sgf
+
+from resources.lib.board import Goban
+from resources.lib.compiled_tree import CompiledTree
+from resources.lib.lazy_tree import LazyTree, load_tree
+from resources.lib.problems import MockProblems
+from resources.lib import sgf_parser
+
+
+def walk(node):
+    """Get the moves, flags, comments and markup of the whole tree."""
+    return [
+        (node.get_move(), node.tree.flags[node.index], node.comment, node.markup),
+        [walk(child) for child in node],
+    ]
+
+
+@pytest.mark.parametrize('sgf_string', (
+    MockProblems.sgf1, MockProblems.sgf2, MockProblems.sgf3,
+))
+def test_matches_gomill(sgf_string):
+    """Check whether the lazy tree ends up the same as one made by gomill."""
+    lazy = LazyTree.from_string(sgf_string)
+    compiled = CompiledTree.from_game(sgf.Sgf_game.from_string(sgf_string))
+    assert walk(lazy.root) == walk(compiled.root)
+    assert sorted(lazy.move_points()) == sorted(
+        move for move in (compiled.root.tree.move_points()))
+
+
+def test_parsed_on_demand():
+    """Check whether variations only get parsed when they're reached."""
+    tree = LazyTree.from_string(
+        '(;SZ[9](;B[aa](;W[bb])(;W[cc]C[RIGHT]))(;B[dd];W[ee]))')
+    assert len(tree) == 1
+    assert tree.root.on_correct_path
+    assert sorted(tree.move_points()) == [(4, 4), (5, 3), (6, 2), (7, 1), (8, 0)]
+
+    first, second = tree.root
+    assert len(tree) == 4
+    assert first.on_correct_path and first.index in tree.pending
+    assert not second.on_correct_path
+
+    assert first.find_child((6, 2)).is_right
+    assert len(tree) == 6
+    assert tree.pending == {}
+
+
+@pytest.mark.parametrize('value, text', (
+    (r'simple', 'simple'),
+    (r'a \] bracket', 'a ] bracket'),
+    (r'back\\slash', 'back\\slash'),
+    ('soft\\\nbreak', 'softbreak'),
+    ('tab\there', 'tab here'),
+))
+def test_text_value(value, text):
+    """Check whether escapes in texts are handled like gomill does."""
+    tree = LazyTree.from_string('(;SZ[9]C[%s])' % value)
+    assert tree.root.comment == text
+
+
+@pytest.mark.parametrize('values, points', (
+    (['aa'], {(8, 0)}),
+    (['aa:bb'], {(8, 0), (8, 1), (7, 0), (7, 1)}),
+    (['aa', 'ca:cc'], {(8, 0), (8, 2), (7, 2), (6, 2)}),
+))
+def test_point_list(values, points):
+    """Check whether compressed point lists get expanded."""
+    assert sgf_parser.point_list(values, 9) == points
+
+
+@pytest.mark.parametrize('values', (['bb:aa'], ['zz'], [''], ['a']))
+def test_bad_point_list(values):
+    """Check whether malformed point lists are rejected."""
+    with pytest.raises(ValueError):
+        sgf_parser.point_list(values, 9)
+
+
+@pytest.mark.parametrize('sgf_string', (
+    '', '(;SZ[9]', '(;SZ[9](;B[aa])', '(;SZ[99])', '(;B[aa](;W[bb]);W[cc])',
+))
+def test_bad_sgf(sgf_string):
+    """Check whether broken SGFs are reported as such."""
+    with pytest.raises(ValueError):
+        LazyTree.from_string(sgf_string)
+
+
+def test_goban_play():
+    """Check whether problems can be played through a lazy tree."""
+    goban = Goban(sgf_string=MockProblems.sgf3)
+    assert isinstance(goban.tree, LazyTree)
+    assert goban.size == 11
+    goban.move(8, 0)
+    assert goban.on_path and not goban.good_path
+    goban.move(7, 1)
+    assert goban.on_path
+    goban.back()
+    goban.back()
+    goban.move(7, 1)
+    assert goban.correct
+
+
+def test_goban_fallback():
+    """Check whether SGFs the small parser doesn't know go through gomill."""
+    sgf_string = MockProblems.sgf3.replace('SZ[11]', 'SZ[11]PL[W]')
+    goban = Goban(sgf_string=sgf_string)
+    assert not isinstance(goban.tree, LazyTree)
+    assert goban.size == 11
+    assert goban.region
+
+
+@pytest.mark.parametrize('sgf_string', (
+    MockProblems.sgf1, MockProblems.sgf2, MockProblems.sgf3,
+))
+def test_parse_all(sgf_string):
+    """Check whether parsing everything at once gives the same tree."""
+    tree = LazyTree.from_string(sgf_string, lazy=False)
+    assert not tree.pending
+    assert walk(tree.root) == walk(LazyTree.from_string(sgf_string).root)
+
+
+@pytest.mark.parametrize('lazy', (True, False))
+@pytest.mark.parametrize('sgf_string', (
+    '(;SZ[9]PL[B](;B[aa]))',
+    '(;SZ[9](;B[aa]KO[]))',
+))
+def test_unsupported_properties(sgf_string, lazy):
+    """Check whether unknown properties are refused, and left to gomill."""
+    with pytest.raises(ValueError):
+        LazyTree.from_string(sgf_string, lazy)
+    tree, board, size = load_tree(sgf_string, lazy)
+    assert not isinstance(tree, LazyTree)
+    assert size == 9 and tree.root[0].get_move() == ('b', (8, 0))
+
+
+def test_unsupported_in_values():
+    """Check whether things that look like properties in values are fine."""
+    assert not sgf_parser.unsupported_properties('(;C[see PL[B] below];B[aa])')
+
+
+@pytest.mark.parametrize('sgf_string', (
+    '(;SZ[9](;B[aa])', '(;SZ[9](;B[aa]);W[bb])', '(;SZ[9]())', '(;SZ[9]x)',
+))
+def test_iter_nodes_errors(sgf_string):
+    """Check whether broken trees are rejected when parsing everything."""
+    with pytest.raises(ValueError):
+        list(sgf_parser.iter_nodes(sgf_string))
+
+
+@pytest.mark.parametrize('sgf_string, children', (
+    ('(;SZ[5]AB[aa]C[x](;W[bb];B[cc](;W[dd]C[RIGHT])(;W[ee]junk))(;W[cc]C[no]))', 1),
+    ('(;SZ[5]AB[aa](;W[bb];B[cc](;W[zz]C[RIGHT])))', 0),
+    ('(;SZ[5]AB[aa](;W[bb];B[cc](;W[dd]TR[ab:ba]C[RIGHT])))', 0),
+))
+def test_broken_variations(sgf_string, children):
+    """Check whether broken variations are left out once they're reached."""
+    goban = Goban(sgf_string=sgf_string)
+    assert isinstance(goban.tree, LazyTree)
+    goban.move(3, 1)
+    goban.move(2, 2)
+    assert goban.on_path
+    assert goban.tree.count_children(goban.node.index) == children
+
+
+def test_broken_variation_played():
+    """Check whether playing a broken variation is like playing off the tree."""
+    goban = Goban(sgf_string='(;SZ[5]AB[aa](xW[bb]C[RIGHT])(;W[cc]))')
+    goban.move(3, 1)
+    assert not goban.on_path
+    assert goban.tree.count_children(0) == 2
+    goban.back()
+    goban.move(2, 2)
+    assert goban.on_path
@@ -0,0 +1,46 @@
+import pytest
+from path import path
+
+from resources.lib.media import (
+    STONE_IMAGES, POINT_IMAGES, Textures, marker_image,
+)
+
+MEDIA = path(__file__).parent.parent / 'resources' / 'skins' / 'default' / 'media'
+
+
+@pytest.mark.parametrize('player, mark, image', (
+    (None, '', 'empty.png'),
+    (None, 'triangle', 'empty.png'),
+    ('black', '', 'black.png'),
+    ('white', 'circle', 'white_circle.png'),
+    ('black', 'mark', 'black_mark.png'),
+))
+def test_stone_images(player, mark, image):
+    """Check whether stones get the right images."""
+    assert STONE_IMAGES[player, mark] == image
+
+
+@pytest.mark.parametrize('marker, image', (
+    (None, 'empty.png'),
+    ('good', 'good_spot.png'),
+    ('bad', 'bad_spot.png'),
+    ('wall', 'wall.png'),
+    ('selected', 'selected.png'),
+))
+def test_marker_image(marker, image):
+    """Check whether markers get the right images."""
+    assert marker_image(marker) == image
+
+
+def test_point_images_exist():
+    """Check whether all images that can be shown at a point exist."""
+    for image in POINT_IMAGES:
+        assert (MEDIA / image).exists(), image
+
+
+def test_textures():
+    """Check whether textures are resolved to their full paths."""
+    textures = Textures(MEDIA)
+    assert textures['black.png'] == MEDIA / 'black.png'
+    assert textures['missing.png'] == MEDIA / 'missing.png'
+    assert Textures(MEDIA / 'missing')['black.png'] == MEDIA / 'missing' / 'black.png'
@@ -0,0 +1,40 @@
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.positions import PositionIndex, problem_positions
+
+# the same position is reached by playing B[cc] and B[dd] in either order
+TRANSPOSED = '(;SZ[9]AB[aa]AW[ba](;B[cc];W[ca];B[dd])(;B[dd];W[ca];B[cc]))'
+# the first problem, mirrored and with the colours swapped
+MIRRORED = '(;SZ[9]AW[ia]AB[ha](;W[gc];B[ga];W[fd]))'
+
+
+@pytest.yield_fixture
+def problems_dir():
+    problems = path(mkdtemp())
+    (problems / '5_kyu').mkdir()
+    (problems / '5_kyu' / '1.sgf').write_text(TRANSPOSED)
+    (problems / '5_kyu' / '2.sgf').write_text(MIRRORED)
+    yield problems
+    problems.rmtree_p()
+
+
+def test_problem_positions(problems_dir):
+    """Check whether every node's position is hashed, with its path."""
+    _, positions = problem_positions(problems_dir / '5_kyu' / '1.sgf')
+    assert [node_path for _, node_path in positions] == [
+        '', '0', '0.0', '0.0.0', '1', '1.0', '1.0.0']
+    hashes = dict((node_path, position) for position, node_path in positions)
+    assert hashes['0.0.0'] == hashes['1.0.0']
+    assert len(set(hashes.values())) == 6
+
+    assert problem_positions(problems_dir / 'missing.sgf')[1] is None
+
+
+def test_transpositions(problems_dir):
+    """Check whether positions are matched across orders and symmetries."""
+    index = PositionIndex.build(problems_dir, processes=1)
+    assert index.similar('5_kyu/2.sgf') == [('5_kyu/1.sgf', 4)]
+    assert len(index.transpositions()) == 4
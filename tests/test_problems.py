@@ -3,7 +3,7 @@ from tempfile import mkdtemp
 import pytest
 from path import path
 
-from resources.lib.problems import Problems
+from resources.lib.problems import Problems, RankIndex, EXCLUDED_FILE
 
 
 @pytest.yield_fixture
@@ -94,6 +94,35 @@ def test_get_problems(problem_files, problems_dir):
     assert sorted(p._get_problems(problem_files)) == sorted(problems)
 
 
+def test_get_problems_excluded(problem_files):
+    """Check whether problems from the exclusion list are skipped."""
+    excluded = ['1_kyu_1.sgf', '[-5]5_kyu_25.sgf', 'missing.sgf']
+    with open(problem_files / EXCLUDED_FILE, 'w') as f:
+        f.write('\n'.join(excluded))
+
+    p = Problems(problem_files)
+    problems = [prob['problem_file'] for prob in p._get_problems(problem_files)]
+    assert len(problems) == 58
+    for problem in excluded:
+        assert p.is_excluded(problem_files / problem)
+        assert problem_files / problem not in problems
+    assert not p.is_excluded(problem_files / '2_kyu_2.sgf')
+
+
+def test_rank_problems(problems_dir):
+    """Check whether all problems of a rank are returned in order."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for name in ('b.sgf', 'a.sgf', '5_kyu_3.sgf', 'notes.txt'):
+        (rank_dir / name).touch()
+
+    p = Problems(problems_dir)
+    assert [problem['problem_file'] for problem in p.rank_problems((5, 'kyu'))] == [
+        rank_dir / '5_kyu_3.sgf', rank_dir / 'a.sgf', rank_dir / 'b.sgf',
+    ]
+    assert p.rank_problems((6, 'kyu')) == []
+
+
 @pytest.mark.parametrize('level, rank', (
     (12, (12, 'kyu')),
     (12.12, (13, 'kyu')),
@@ -130,3 +159,65 @@ def test_update_rank(level, offset, expected, problems_dir):
     p.update_rank()
     assert expected == (p.level, p.offset)
 
+
+@pytest.fixture
+def rank_index():
+    """A rank index with a couple of gaps, and an empty rank."""
+    return RankIndex([
+        (level, (abs(level), 'kyu' if level > 0 else 'dan'), count)
+        for level, count in ((-2, 4), (1, 3), (5, 1), (6, 0), (12, 9))
+    ])
+
+
+@pytest.mark.parametrize('level, ranks', (
+    (1, [(1, 'kyu'), (2, 'dan'), (5, 'kyu'), (12, 'kyu')]),
+    (3, [(5, 'kyu'), (1, 'kyu'), (2, 'dan'), (12, 'kyu')]),
+    (6, [(5, 'kyu'), (1, 'kyu'), (12, 'kyu'), (2, 'dan')]),
+    (8.4, [(5, 'kyu'), (12, 'kyu'), (1, 'kyu'), (2, 'dan')]),
+    (30, [(12, 'kyu'), (5, 'kyu'), (1, 'kyu'), (2, 'dan')]),
+    (-10, [(2, 'dan'), (1, 'kyu'), (5, 'kyu'), (12, 'kyu')]),
+))
+def test_rank_index_by_distance(rank_index, level, ranks):
+    """Check whether ranks are returned from the closest one outwards."""
+    assert len(rank_index) == 4
+    assert list(rank_index.by_distance(level)) == ranks
+    assert rank_index.nearest(level) == ranks[0]
+
+
+def test_empty_rank_index():
+    """Check whether an empty index doesn't return any ranks."""
+    assert RankIndex([(1, (1, 'kyu'), 0)]).nearest(1) is None
+
+
+def test_reviews(problems_dir):
+    """Check whether failed problems come back once they are due."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for name in ('5_kyu_1.sgf', '5_kyu_2.sgf'):
+        (rank_dir / name).write_text(u'(;SZ[9];B[aa]C[RIGHT])')
+
+    p = Problems(problems_dir, '5 kyu', problems_dir / 'reviews.txt')
+    p.failure((5, 'kyu'), problem_file=rank_dir / '5_kyu_1.sgf')
+    p.success((5, 'kyu'), problem_file=rank_dir / '5_kyu_2.sgf')
+    assert list(p.reviews.cards) == [path('5_kyu') / '5_kyu_1.sgf']
+
+    # make it due
+    p.reviews.grade(path('5_kyu') / '5_kyu_1.sgf', 1, now=0)
+    p.since_review = p.review_every
+    review = p.next()
+    assert review['review']
+    assert review['problem_file'] == rank_dir / '5_kyu_1.sgf'
+    assert review['rank'] == (5, 'kyu')
+    assert 'RIGHT' in review['sgf']
+
+    # reviews are remembered
+    assert len(Problems(problems_dir, reviews_file=problems_dir / 'reviews.txt').reviews) == 1
+
+
+def test_missing_reviews_dropped(problems_dir):
+    """Check whether reviews of problems that are gone get forgotten."""
+    p = Problems(problems_dir)
+    p.reviews.grade('5_kyu/missing.sgf', 1, now=0)
+    p.since_review = p.review_every
+    assert p.next_review() is None
+    assert not len(p.reviews)
@@ -0,0 +1,106 @@
+import time
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+from path import path
+
+from resources.lib.attempts import (
+    RATINGS_FILE, AttemptLog, load_ratings, read_attempts,
+)
+from resources.lib.problems import Problems
+from resources.lib.ratings import SLOPE, fit_ratings, problem_level, rate_library
+
+
+@pytest.yield_fixture
+def tmpdir():
+    directory = path(mkdtemp())
+    yield directory
+    directory.rmtree_p()
+
+
+def simulate(problem_levels, player_levels, attempts, seed=0):
+    """Get random attempts of the given players at the given problems."""
+    rng = np.random.RandomState(seed)
+    problems = rng.randint(0, len(problem_levels), attempts)
+    players = rng.randint(0, len(player_levels), attempts)
+    chances = 1 / (1 + np.exp(
+        -SLOPE * (problem_levels[problems] - player_levels[players])))
+    return players, problems, rng.uniform(size=attempts) < chances
+
+
+def test_fit_improves_ratings():
+    """Check whether fitted levels are closer to the truth than the priors."""
+    rng = np.random.RandomState(1)
+    true_levels = rng.uniform(-5, 30, 1000)
+    priors = np.round(true_levels + rng.normal(0, 3, 1000))
+    players, problems, solved = simulate(
+        true_levels, np.array([25.0, 15.0, 5.0]), 100000)
+
+    levels, deviations, player_levels, _ = fit_ratings(
+        players, problems, solved, priors)
+    assert np.abs(levels - true_levels).mean() < np.abs(priors - true_levels).mean()
+    assert np.abs(player_levels - [25, 15, 5]).max() < 1
+    assert (deviations < 3).all()
+
+
+def test_fit_without_attempts():
+    """Check whether problems nobody tried keep their original level."""
+    levels, deviations, player_levels, _ = fit_ratings(
+        [0, 0], [0, 0], [True, False], [10, 5, 3], player_count=2)
+    assert levels[1:].tolist() == [5, 3]
+    assert deviations[1:].tolist() == [3, 3]
+    assert len(player_levels) == 2
+
+
+@pytest.mark.parametrize('problem_key, level', (
+    ('5_kyu/[3]5_kyu_123.sgf', 5),
+    ('2_dan/2_dan_1.sgf', -2),
+    ('12_kyu/123.sgf', 12),
+    ('misc/123.sgf', None),
+))
+def test_problem_level(problem_key, level):
+    """Check whether the published levels of problems are found."""
+    assert problem_level(problem_key) == level
+
+
+def test_attempt_log(tmpdir):
+    """Check whether attempts are logged."""
+    log = AttemptLog(tmpdir / 'data' / 'attempts.txt')
+    log.record('5_kyu/1.sgf', True, now=10)
+    log.record('5_kyu/2.sgf', False, now=20)
+    with open(tmpdir / 'data' / 'attempts.txt', 'a') as f:
+        f.write('broken line\n')
+    assert list(read_attempts(tmpdir / 'data' / 'attempts.txt')) == [
+        ('5_kyu/1.sgf', True, 10), ('5_kyu/2.sgf', False, 20),
+    ]
+
+
+def test_rate_library(tmpdir):
+    """Check whether fitted difficulties are used to pick problems."""
+    for name in ('5_kyu_1.sgf', '5_kyu_2.sgf'):
+        (tmpdir / '5_kyu').makedirs_p()
+        (tmpdir / '5_kyu' / name).touch()
+    log = AttemptLog(tmpdir / 'attempts.txt')
+    # an easy player keeps failing the first problem, and solving the second
+    for i in xrange(50):
+        log.record('5_kyu/5_kyu_1.sgf', False, now=i)
+        log.record('5_kyu/5_kyu_2.sgf', True, now=i)
+        log.record('misc/1.sgf', True, now=i)
+
+    (level, deviation), = rate_library(tmpdir, [tmpdir / 'attempts.txt'])
+    ratings = load_ratings(tmpdir / RATINGS_FILE)
+    assert sorted(ratings) == ['5_kyu/5_kyu_1.sgf', '5_kyu/5_kyu_2.sgf']
+    assert ratings['5_kyu/5_kyu_1.sgf'][0] < 5 < ratings['5_kyu/5_kyu_2.sgf'][0]
+
+    problems = Problems(tmpdir)
+    while problems.problems is None:
+        time.sleep(0.01)
+    ranks = dict(
+        (problem['problem_file'].basename(), rank)
+        for rank, rank_problems in problems.problems.iteritems()
+        for problem in rank_problems
+    )
+    assert ranks['5_kyu_1.sgf'] == problems.get_rank(ratings['5_kyu/5_kyu_1.sgf'][0])
+    assert ranks['5_kyu_2.sgf'] == problems.get_rank(ratings['5_kyu/5_kyu_2.sgf'][0])
+    assert ranks['5_kyu_1.sgf'] != ranks['5_kyu_2.sgf']
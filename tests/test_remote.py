@@ -0,0 +1,152 @@
+import time
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.comments import COMMENTS_FILE, CommentIndex
+from resources.lib.problems import EXCLUDED_FILE, Problems
+from resources.lib.remote import NotFound, RemoteProblems, ServerUnavailable
+from resources.lib.server import ProblemServer
+
+SGF = '(;SZ[9]AB[aa]AW[ba]C[Capture it with a ladder](;B[ca]C[RIGHT]))'
+
+
+def wait_for(condition, timeout=5):
+    """Wait until the given condition is met."""
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    assert condition()
+
+
+@pytest.yield_fixture
+def problems_dir():
+    """A small library, that gets deleted after the test ends."""
+    problems = path(mkdtemp())
+    for rank, names in (('5_kyu', ('5_kyu_1.sgf', '5_kyu_2.sgf')),
+                        ('1_dan', ('1_dan_3.sgf', 'broken.sgf'))):
+        (problems / rank).mkdir()
+        for name in names:
+            (problems / rank / name).write_text(SGF if name[0] != 'b' else '(;')
+    (problems / EXCLUDED_FILE).write_text('5_kyu/5_kyu_2.sgf\n')
+    CommentIndex(problems / COMMENTS_FILE).update(problems, processes=1)
+    yield problems
+    problems.rmtree_p()
+
+
+@pytest.yield_fixture
+def server(problems_dir):
+    """A problem server on localhost."""
+    problems = Problems(problems_dir)
+    wait_for(lambda: problems.rank_index is not None)
+    server = ProblemServer(('127.0.0.1', 0), problems)
+    server.start(poll_interval=0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def remote(server):
+    problems = RemoteProblems(server.url, '5 kyu')
+    wait_for(lambda: problems.rank_index is not None)
+    return problems
+
+
+def test_ranks(remote):
+    """Check whether the ranks come from the server."""
+    assert remote.rank_index.ranks == [(1, 'dan'), (5, 'kyu')]
+    assert remote.rank_index.counts == [2, 1]
+
+
+def test_rank_problems(remote):
+    """Check whether a rank's problems are named relative to the library."""
+    problems = remote.rank_problems((1, 'dan'))
+    assert [p['problem_file'] for p in problems] == [
+        '1_dan/1_dan_3.sgf', '1_dan/broken.sgf']
+    assert [p['rank'] for p in problems] == [(1, 'dan'), (1, 'dan')]
+    assert problems[0]['problem_file'].namebase == '1_dan_3'
+    # the files are only on the server, so there are no thumbnails
+    assert not remote.local_files
+    assert remote.rank_problems((3, 'kyu')) == []
+
+
+def test_random_problem(remote):
+    """Check whether random problems come with their SGF."""
+    problem = remote.random_problem((5, 'kyu'))
+    assert problem['problem_file'] == '5_kyu/5_kyu_1.sgf'
+    assert problem['rank'] == (5, 'kyu')
+    assert problem['sgf'] == SGF
+    assert remote.random_problem((3, 'kyu')) is None
+    assert next(remote)['sgf'] == SGF
+
+
+def test_problem_at(remote):
+    """Check whether single problems can be got, but only from the library."""
+    assert remote.problem_at('1_dan/1_dan_3.sgf')['rank'] == (1, 'dan')
+    assert remote.problem_at('1_dan/missing.sgf') is None
+    # excluded problems aren't served
+    assert remote.problem_at('5_kyu/5_kyu_2.sgf') is None
+    with pytest.raises(NotFound):
+        remote.fetch('/sgf/' + remote.quote('../%s' % COMMENTS_FILE))
+    with pytest.raises(NotFound):
+        remote.fetch('/bla')
+    assert remote.read_problem({'problem_file': '1_dan/broken.sgf'}) is None
+
+
+def test_reviews(remote):
+    """Check whether failed problems are brought back through the server."""
+    remote.review_every = 1
+    remote.failure((5, 'kyu'), problem_file=path('5_kyu/5_kyu_1.sgf'))
+    remote.reviews.cards['5_kyu/5_kyu_1.sgf'].due = 0
+    remote.reviews.heap = [(0, '5_kyu/5_kyu_1.sgf')]
+
+    review = remote.next_review()
+    assert review['review']
+    assert review['sgf'] == SGF
+
+
+def test_search(remote):
+    """Check whether the server's comment index can be searched."""
+    found = remote.search('ladder')
+    assert [p['problem_file'] for p in found] == [
+        '1_dan/1_dan_3.sgf', '5_kyu/5_kyu_1.sgf']
+    assert remote.search('ko') == []
+    with pytest.raises(ValueError):
+        remote.search('"ladder')
+
+
+def test_keep_alive(remote):
+    """Check whether requests reuse the same connection."""
+    remote.rank_problems((1, 'dan'))
+    connection = remote.pool.idle.queue[-1]
+    remote.random_problem((5, 'kyu'))
+    remote.search('ladder')
+    assert remote.pool.idle.queue == [connection]
+
+
+def test_cache(remote, server):
+    """Check whether problems can be read again without the server."""
+    problem = remote.rank_problems((1, 'dan'))[0]
+    assert remote.read_problem(dict(problem))
+    server.shutdown()
+    server.server_close()
+    remote.pool.close()
+
+    assert remote.read_problem(dict(problem))['sgf'] == SGF
+    assert remote.rank_problems((1, 'dan'))[0] == problem
+    with pytest.raises(ServerUnavailable):
+        remote.fetch('/sgf/' + remote.quote('5_kyu/5_kyu_1.sgf'))
+
+
+def test_server_unavailable(monkeypatch):
+    """Check whether a missing server means no problems, and kept reviews."""
+    monkeypatch.setattr(RemoteProblems, 'index_attempts', 1)
+    remote = RemoteProblems('127.0.0.1:1', '5 kyu')
+    remote.review_every = 1
+    remote.reviews.grade('5_kyu/5_kyu_1.sgf', 0, now=0)
+    assert remote.random_problem((5, 'kyu')) is None
+    assert remote.next_review() is None
+    assert '5_kyu/5_kyu_1.sgf' in remote.reviews
+
@@ -0,0 +1,105 @@
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.reviews import DAY, Card, ReviewSchedule
+
+
+@pytest.yield_fixture
+def journal_file():
+    directory = path(mkdtemp())
+    yield directory / 'reviews.txt'
+    directory.rmtree_p()
+
+
+@pytest.mark.parametrize('qualities, interval, repetitions', (
+    ([1], 1, 0),
+    ([1, 4], 1, 1),
+    ([1, 4, 4], 6, 2),
+    ([1, 4, 4, 4], 12, 3),
+    ([1, 4, 4, 4, 0], 1, 0),
+    ([5, 5, 5], 16, 3),
+))
+def test_card_intervals(qualities, interval, repetitions):
+    """Check whether reviews are spaced out like in SM-2."""
+    card = Card('1.sgf')
+    for quality in qualities:
+        card.grade(quality, 1000)
+    assert card.interval == interval
+    assert card.repetitions == repetitions
+    assert card.due == 1000 + interval * DAY
+
+
+def test_easiness_floor():
+    """Check whether failing over and over doesn't make reviews too frequent."""
+    card = Card('1.sgf')
+    for _ in xrange(20):
+        card.grade(0, 0)
+    assert card.easiness == 1.3
+
+
+def test_only_failed_problems_scheduled():
+    """Check whether problems only get reviewed after being failed."""
+    schedule = ReviewSchedule()
+    schedule.grade('solved.sgf', 4, now=0)
+    schedule.grade('failed.sgf', 1, now=0)
+    assert 'solved.sgf' not in schedule
+    assert 'failed.sgf' in schedule
+    assert len(schedule) == 1
+
+
+def test_take_in_due_order():
+    """Check whether the problems that have waited longest come first."""
+    schedule = ReviewSchedule()
+    for i, problem in enumerate(('a.sgf', 'b.sgf', 'c.sgf')):
+        schedule.grade(problem, 1, now=100 - i)
+    # rescheduled, so its old entry must be skipped
+    schedule.grade('b.sgf', 4, now=1000)
+
+    assert schedule.take(now=10) is None
+    now = 200 + DAY
+    assert schedule.take(now) == 'c.sgf'
+    assert schedule.take(now) == 'a.sgf'
+    assert schedule.take(now) is None
+    # shown, but not graded - it comes back later
+    later = now + schedule.retry_delay
+    assert set([schedule.take(later), schedule.take(later)]) == set(['a.sgf', 'c.sgf'])
+
+
+def test_many_cards():
+    """Check whether the heap doesn't grow with every reschedule."""
+    schedule = ReviewSchedule()
+    for i in xrange(5000):
+        schedule.grade('%d.sgf' % (i % 500), i % 3 + (i > 2500) * 3, now=i)
+    assert len(schedule) == 500
+    assert len(schedule.heap) <= 2 * len(schedule) + 100
+    dues = [schedule.cards['%d.sgf' % i].due for i in xrange(500)]
+    assert schedule.next_due() == min(dues)
+
+
+def test_journal(journal_file):
+    """Check whether the schedule survives being reloaded."""
+    schedule = ReviewSchedule(journal_file)
+    schedule.grade('a.sgf', 1, now=0)
+    schedule.grade('b.sgf', 1, now=10)
+    schedule.grade('a.sgf', 4, now=DAY)
+    schedule.grade('c.sgf', 1, now=20)
+    schedule.forget('c.sgf')
+
+    loaded = ReviewSchedule(journal_file)
+    assert sorted(loaded.cards) == ['a.sgf', 'b.sgf']
+    assert loaded.cards['a.sgf'].repetitions == 1
+    assert loaded.cards['a.sgf'].due == 2 * DAY
+    assert loaded.take(now=DAY + 10) == 'b.sgf'
+
+
+def test_journal_compacted(journal_file):
+    """Check whether the journal gets rewritten once it's too long."""
+    schedule = ReviewSchedule(journal_file)
+    for i in xrange(1000):
+        schedule.grade('a.sgf', 1, now=i)
+    assert len(journal_file.lines()) <= 102
+
+    loaded = ReviewSchedule(journal_file)
+    assert loaded.cards['a.sgf'].due == 999 + DAY
@@ -0,0 +1,62 @@
+import pytest
+from gomill import boards
+
+from resources.lib.board import Goban
+from resources.lib.problems import MockProblems
+from resources.lib.search import (
+    best_reply, group_liberties, other_player, region_around,
+)
+
+
+@pytest.fixture
+def board():
+    """A board where the white stone in the corner is in atari."""
+    board = boards.Board(9)
+    board.apply_setup([(1, 0)], [(0, 0), (1, 1), (2, 2)], [])
+    return board
+
+
+def test_region_around():
+    """Check whether the region is the bounding box plus the margin."""
+    region = region_around([(0, 0), (2, 3)], 9)
+    assert len(region) == 20
+    assert (0, 0) in region and (3, 4) in region and (4, 4) not in region
+    assert region_around([(4, 4)], 9, 2) == [
+        (row, col) for row in xrange(2, 7) for col in xrange(2, 7)
+    ]
+    assert region_around([], 9) == []
+
+
+def test_group_liberties(board):
+    """Check whether groups and their liberties are found."""
+    assert group_liberties(board, (0, 0)) == (set([(0, 0)]), set([(0, 1)]))
+    assert group_liberties(board, (1, 0)) == (set([(1, 0)]), set([(2, 0)]))
+
+
+def test_other_player():
+    assert other_player('b') == 'w'
+    assert other_player('w') == 'b'
+
+
+@pytest.mark.parametrize('player, move', (
+    ('b', (0, 1)),  # capture the white stone
+    ('w', (2, 0)),  # capture the black stone
+))
+def test_best_reply(board, player, move):
+    """Check whether the search finds the obvious captures."""
+    region = region_around([(0, 0), (2, 2)], 9)
+    assert best_reply(board, player, region, 0.2) == move
+
+
+def test_goban_answers_off_path_moves():
+    """Check whether moves that aren't in the problem get answered."""
+    goban = Goban(sgf_string=MockProblems.sgf3)
+    goban.move(0, 10)
+    assert not goban.on_path
+    goban.random_move()
+    assert goban.current_player == 'b'
+
+    goban.search_time = 0
+    goban.move(0, 9)
+    goban.random_move()
+    assert goban.current_player == 'w'
@@ -0,0 +1,149 @@
+from random import Random
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.board import Goban
+from resources.lib.problems import Problems
+from resources.lib.sessions import (
+    SessionRecorder, read_session, replay_event, replay_session,
+)
+
+# black can start in two places, and white has two replies to each
+SGF = '(;SZ[9]AB[cc]AW[dd]' \
+    '(;B[aa](;W[ba];B[ca]C[RIGHT])(;W[ca];B[ba]C[RIGHT]))' \
+    '(;B[ee](;W[ef];B[fe]C[RIGHT])(;W[fe];B[ef]C[RIGHT])))'
+
+
+class Clock(object):
+    """A clock that moves on by 10ms every time it's read."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 0.01
+        return self.now
+
+
+@pytest.yield_fixture
+def problems_dir():
+    """A small library, that gets deleted after the test ends."""
+    problems = path(mkdtemp())
+    (problems / '5_kyu').mkdir()
+    for i in xrange(10):
+        (problems / '5_kyu' / ('5_kyu_%d.sgf' % i)).write_text(SGF)
+    yield problems
+    problems.rmtree_p()
+
+
+def record_session(log_file, seed, moves):
+    """Play the given moves like the GUI does, recording them."""
+    recorder = SessionRecorder(log_file, seed, Clock())
+    goban = Goban(sgf_string=SGF, rng=recorder.rng())
+    goban.search_time = 0
+    recorder.record('problem', '5_kyu/5_kyu_1.sgf')
+    for move in moves:
+        if move == 'back':
+            goban.take_back()
+            recorder.record('back')
+        else:
+            started = recorder.clock()
+            reply = goban.play(*move)
+            recorder.record('move', *move + (reply or ()), started=started)
+    return goban
+
+
+def test_record(problems_dir):
+    """Check whether events are logged with their times."""
+    log_file = problems_dir / 'session.log'
+    recorder = SessionRecorder(log_file, 1234, Clock())
+    recorder.record('problem', u'5_kyu/\u0142.sgf')
+    started = recorder.clock()
+    recorder.record('move', 3, 4, started=started)
+    recorder.record('hints', 1)
+
+    assert open(log_file).readlines() == [
+        'seed\t1234\n',
+        '10\t0\tproblem\t5_kyu/\xc5\x82.sgf\n',
+        '20\t10\tmove\t3\t4\n',
+        '40\t0\thints\t1\n',
+    ]
+    assert read_session(log_file) == (1234, [
+        (10, 0, 'problem', ['5_kyu/\xc5\x82.sgf']),
+        (20, 10, 'move', ['3', '4']),
+        (40, 0, 'hints', ['1']),
+    ])
+
+
+def test_read_bad_session(problems_dir):
+    """Check whether malformed logs are handled."""
+    log_file = problems_dir / 'session.log'
+    log_file.write_text('seed\t12\n10\t0\tbla\n1\n10\t0\tback\n')
+    assert read_session(log_file) == (12, [(10, 0, 'back', [])])
+
+    log_file.write_text('10\t0\tback\n')
+    with pytest.raises(ValueError):
+        read_session(log_file)
+
+
+def test_no_recording():
+    """Check whether sessions without a log still have a seed."""
+    recorder = SessionRecorder(seed=5)
+    recorder.record('back')
+    assert recorder.rng().random() == Random(5).random()
+    assert SessionRecorder().seed != SessionRecorder().seed
+
+
+def test_seeded_problems(problems_dir):
+    """Check whether the same seed picks the same problems."""
+    def picks(seed):
+        problems = Problems(problems_dir, '5 kyu', rng=Random(seed))
+        return [
+            problems.random_problem((5, 'kyu'))['problem_file']
+            for _ in xrange(10)
+        ]
+    assert picks(1) == picks(1)
+    assert picks(1) != picks(2)
+
+
+@pytest.mark.parametrize('seed', xrange(5))
+def test_replay(problems_dir, seed):
+    """Check whether replays end up where the recorded session did."""
+    log_file = problems_dir / 'session.log'
+    moves = [(4, 4), 'back', (8, 0)]
+    record_session(log_file, seed, moves)
+
+    stats = replay_session(log_file, Problems(problems_dir), search_time=0)
+    assert stats.counts['problem'] == 1
+    assert stats.counts['move'] == 2
+    assert stats.counts['back'] == 1
+    assert stats.recorded['move'] == 20
+    assert stats.diverged == 0
+    assert stats.skipped == 0
+    assert stats.total >= 0
+
+
+def test_replay_diverged(problems_dir):
+    """Check whether replies that differ are replaced by the recorded ones."""
+    goban = Goban(sgf_string=SGF, rng=Random(1))
+    goban.choose_reply = lambda: (0, 0)
+
+    class Stats(object):
+        diverged = 0
+
+    replay_event(goban, None, Stats, 'move', ['4', '4', '3', '4'])
+    assert Stats.diverged == 1
+    assert goban.node.get_move() == ('w', (3, 4))
+
+
+def test_replay_missing_problem(problems_dir):
+    """Check whether the events of missing problems are skipped."""
+    log_file = problems_dir / 'session.log'
+    log_file.write_text(
+        'seed\t1\n0\t0\tproblem\t5_kyu/bla.sgf\n0\t0\tmove\t4\t4\n'
+        '0\t0\tproblem\t5_kyu/5_kyu_1.sgf\n0\t0\tmove\t4\t4\t4\t3\n')
+    stats = replay_session(log_file, Problems(problems_dir), search_time=0)
+    assert stats.skipped == 2
+    assert stats.counts['move'] == 1
@@ -0,0 +1,79 @@
+import pytest
+from tempfile import mkdtemp
+
+from path import path
+
+from resources.lib.problems import MockProblems
+from resources.lib.stats import COLUMNS, ProblemStats, problem_stats
+
+
+STATS = {
+    'size': 19,
+    'nodes': 12,
+    'max_depth': 5,
+    'max_branching': 3,
+    'leaves': 4,
+    'right_nodes': 2,
+    'right_leaves': 1,
+    'properties': 'AB,AW,B,C,W',
+}
+
+
+def test_add_stats():
+    """Check whether added stats can be retrieved per problem."""
+    stats = ProblemStats()
+    stats.add('1_kyu/1.sgf', STATS)
+    stats.add('2_kyu/2.sgf', dict(STATS, size=9))
+
+    assert len(stats) == 2
+    assert '1_kyu/1.sgf' in stats
+    assert 'bla.sgf' not in stats
+    assert stats.get('1_kyu/1.sgf') == dict(STATS, problem_file='1_kyu/1.sgf')
+    assert stats.get('bla.sgf') is None
+    assert stats.columns['size'] == [19, 9]
+    assert sorted(stats.columns) == sorted(COLUMNS)
+
+
+def test_save_stats():
+    """Check whether stats can be saved and loaded."""
+    stats_file = path(mkdtemp()) / 'stats.json'
+    stats = ProblemStats()
+    stats.add('1_kyu/1.sgf', STATS)
+    stats.save(stats_file)
+
+    loaded = ProblemStats.load(stats_file)
+    assert loaded.columns == stats.columns
+    assert loaded.get('1_kyu/1.sgf') == stats.get('1_kyu/1.sgf')
+    stats_file.parent.rmtree_p()
+
+
+def test_load_missing_stats():
+    """Check whether missing stats files result in empty stats."""
+    assert len(ProblemStats.load('/this/does/not/exist.json')) == 0
+
+
+def reject(sgf_string):
+    """Stand in for the small parser, refusing every SGF."""
+    raise ValueError('not parsed')
+
+
+@pytest.mark.parametrize('small_parser', (True, False))
+def test_problem_stats(small_parser, monkeypatch):
+    """Check whether the stats of a problem's tree are worked out."""
+    if not small_parser:
+        # gomill rejects anything the small parser does, so it gets broken
+        monkeypatch.setattr('resources.lib.stats.iter_nodes', reject)
+    problem_file = path(mkdtemp()) / '1.sgf'
+    problem_file.write_bytes(MockProblems.sgf3)
+
+    assert problem_stats(problem_file)[1] == {
+        'size': 11,
+        'nodes': 4,
+        'max_depth': 2,
+        'max_branching': 2,
+        'leaves': 2,
+        'right_nodes': 1,
+        'right_leaves': 1,
+        'properties': 'AB,AP,AW,B,C,SZ,W',
+    }
+    problem_file.parent.rmtree_p()
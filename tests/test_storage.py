@@ -0,0 +1,167 @@
+from tempfile import mkdtemp
+
+import pytest
+from path import path
+
+from resources.lib.attempts import RATINGS_FILE, save_ratings
+from resources.lib.problems import EXCLUDED_FILE, MockProblems, Problems
+from resources.lib.stats import COLUMNS, STATS_FILE, ProblemStats
+from resources.lib.storage import (
+    DICTIONARY_FILE, Codec, compress_library, problem_name, read_sgf,
+    train_dictionary,
+)
+
+PROBLEMS = [MockProblems.sgf, MockProblems.sgf1, MockProblems.sgf2, MockProblems.sgf3]
+
+
+@pytest.yield_fixture
+def problems_dir():
+    directory = path(mkdtemp())
+    yield directory
+    directory.rmtree_p()
+
+
+def test_train_dictionary():
+    """Check whether only shared snippets are put into the dictionary."""
+    dictionary = train_dictionary(PROBLEMS)
+    assert 'AP[goproblems]' in dictionary
+    assert 'AW[cq]' in dictionary
+    assert 'W to kill' not in dictionary
+    assert len(train_dictionary(PROBLEMS, 20)) <= 20
+
+
+@pytest.mark.parametrize('sgf_string', PROBLEMS)
+def test_codec(sgf_string):
+    """Check whether problems survive compression."""
+    codec = Codec(train_dictionary(PROBLEMS))
+    compressed = codec.compress(sgf_string)
+    assert codec.decompress(compressed) == sgf_string
+    # the same SGF can be compressed any number of times
+    assert codec.compress(sgf_string) == compressed
+
+
+def test_dictionary_helps():
+    """Check whether the dictionary makes problems smaller."""
+    dictionary = train_dictionary(PROBLEMS)
+    with_dictionary = Codec(dictionary).compress(MockProblems.sgf3)
+    without = Codec('').compress(MockProblems.sgf3)
+    assert len(with_dictionary) < len(without)
+
+
+def test_wrong_dictionary():
+    """Check whether problems from a different library are refused."""
+    compressed = Codec('AB[aa]AW[bb]').compress(MockProblems.sgf3)
+    with pytest.raises(ValueError):
+        Codec('C[RIGHT]').decompress(compressed)
+
+
+def test_compress_library(problems_dir):
+    """Check whether compressed problems can be read transparently."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for i, sgf_string in enumerate(PROBLEMS):
+        (rank_dir / ('5_kyu_%d.sgf' % i)).write_text(sgf_string)
+
+    before, after = compress_library(
+        sorted(rank_dir.files('*.sgf')), problems_dir)
+    assert after < before
+    assert (problems_dir / DICTIONARY_FILE).exists()
+    assert not rank_dir.files('*.sgf')
+    for i, sgf_string in enumerate(PROBLEMS):
+        assert read_sgf(rank_dir / ('5_kyu_%d.sgz' % i)) == sgf_string
+
+
+def test_recompress_library(problems_dir):
+    """Check whether compressed and kept problems can be compressed again."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for i, sgf_string in enumerate(PROBLEMS):
+        (rank_dir / ('5_kyu_%d.sgf' % i)).write_text(sgf_string)
+    compress_library(sorted(rank_dir.files('*.sgf'))[:2], problems_dir, keep=True)
+
+    # the dictionary changes, so the old one must be used to read problems
+    compress_library(sorted(rank_dir.files()), problems_dir, sample=2)
+    assert sorted(f.basename() for f in rank_dir.files()) == [
+        '5_kyu_%d.sgz' % i for i in xrange(len(PROBLEMS))]
+    for i, sgf_string in enumerate(PROBLEMS):
+        assert read_sgf(rank_dir / ('5_kyu_%d.sgz' % i)) == sgf_string
+
+
+def test_unreadable_problem(problems_dir):
+    """Check whether problems that can't be read are skipped."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for i, sgf_string in enumerate(PROBLEMS):
+        (rank_dir / ('5_kyu_%d.sgf' % i)).write_text(sgf_string)
+    compress_library(sorted(rank_dir.files()), problems_dir)
+    (rank_dir / '5_kyu_3.sgz').write_bytes('SGZ broken')
+    (rank_dir / '5_kyu_4.sgf').write_text(MockProblems.sgf)
+
+    compress_library(sorted(rank_dir.files()), problems_dir, sample=1)
+    for i, sgf_string in enumerate(PROBLEMS[:3] + [MockProblems.sgf]):
+        if i != 3:
+            assert read_sgf(rank_dir / ('5_kyu_%d.sgz' % i)) == sgf_string
+    assert (rank_dir / '5_kyu_3.sgz').bytes() == 'SGZ broken'
+
+
+def test_failed_compression(problems_dir, monkeypatch):
+    """Check whether a failure partway through leaves the library as it was."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for i, sgf_string in enumerate(PROBLEMS):
+        (rank_dir / ('5_kyu_%d.sgf' % i)).write_text(sgf_string)
+    compress_library(sorted(rank_dir.files()), problems_dir)
+    dictionary = (problems_dir / DICTIONARY_FILE).bytes()
+    (rank_dir / '5_kyu_4.sgf').write_text(MockProblems.sgf)
+
+    def compress(codec, sgf_string):
+        if sgf_string == PROBLEMS[2]:
+            raise IOError('No space left on device')
+        return original(codec, sgf_string)
+    original = Codec.compress
+    monkeypatch.setattr(Codec, 'compress', compress)
+    with pytest.raises(IOError):
+        compress_library(sorted(rank_dir.files()), problems_dir, sample=1)
+
+    assert (problems_dir / DICTIONARY_FILE).bytes() == dictionary
+    assert not list(problems_dir.walkfiles('*.tmp'))
+    assert (rank_dir / '5_kyu_4.sgf').exists()
+    for i, sgf_string in enumerate(PROBLEMS):
+        assert read_sgf(rank_dir / ('5_kyu_%d.sgz' % i)) == sgf_string
+
+
+@pytest.mark.parametrize('problem_file, name', (
+    ('5_kyu/1.sgf', '5_kyu/1'),
+    ('5_kyu/1.sgz', '5_kyu/1'),
+    ('5_kyu/1.txt', '5_kyu/1.txt'),
+))
+def test_problem_name(problem_file, name):
+    """Check whether problems are named the same, compressed or not."""
+    assert problem_name(problem_file) == name
+
+
+def test_compressed_library_data(problems_dir):
+    """Check whether exclusions, stats, ratings and reviews survive compression."""
+    rank_dir = problems_dir / '5_kyu'
+    rank_dir.makedirs_p()
+    for i in xrange(3):
+        (rank_dir / ('5_kyu_%d.sgf' % i)).write_text(MockProblems.sgf3)
+    (problems_dir / EXCLUDED_FILE).write_text('5_kyu/5_kyu_0.sgf\n')
+    stats = ProblemStats()
+    stats.add('5_kyu/5_kyu_1.sgf', dict.fromkeys(COLUMNS[1:], 0))
+    stats.save(problems_dir / STATS_FILE)
+    save_ratings(problems_dir / RATINGS_FILE, {'5_kyu/5_kyu_2.sgf': (10, 1)})
+    compress_library(sorted(rank_dir.files()), problems_dir)
+
+    problems = Problems(problems_dir)
+    assert problems.is_excluded(rank_dir / '5_kyu_0.sgz')
+    # unsolvable problems aren't read
+    assert problems.read_problem(problems.problem_at('5_kyu/5_kyu_1.sgz')) is None
+    assert problems.problem_at('5_kyu/5_kyu_2.sgz')['difficulty'] == 10
+
+    problems.review_every = 1
+    problems.reviews.grade('5_kyu/5_kyu_2.sgf', 0, now=0)
+    review = problems.next_review()
+    assert review['problem_file'] == rank_dir / '5_kyu_2.sgz'
+    assert '5_kyu/5_kyu_2.sgz' in problems.reviews
+    assert '5_kyu/5_kyu_2.sgf' not in problems.reviews
@@ -0,0 +1,60 @@
+import pytest
+
+from resources.lib.symmetry import (
+    transform_point, position_variants, canonical_position, position_hash,
+)
+
+
+STONES = [('b', (0, 1)), ('b', (1, 1)), ('w', (0, 2)), ('w', (2, 0))]
+
+
+@pytest.mark.parametrize('symmetry, result', (
+    (0, (1, 2)),
+    (1, (7, 2)),
+    (2, (1, 6)),
+    (3, (7, 6)),
+    (4, (2, 1)),
+    (5, (6, 1)),
+    (6, (2, 7)),
+    (7, (6, 7)),
+))
+def test_transform_point(symmetry, result):
+    """Check whether all symmetries are applied correctly."""
+    assert transform_point((1, 2), 9, symmetry) == result
+
+
+def test_all_symmetries_differ():
+    """Make sure that the symmetries make up the whole dihedral group."""
+    assert len(set(
+        transform_point((1, 2), 9, symmetry) for symmetry in xrange(8)
+    )) == 8
+
+
+def test_position_variants():
+    """Check whether all rotations, reflections and colour swaps are found."""
+    variants = list(position_variants(STONES, 9, 'b'))
+    assert len(variants) == 16
+    assert ('b', tuple(sorted(STONES))) in variants
+    swapped = tuple(sorted(
+        ('w' if c == 'b' else 'b', p) for c, p in STONES
+    ))
+    assert ('w', swapped) in variants
+
+
+@pytest.mark.parametrize('symmetry', range(8))
+def test_canonical_position(symmetry):
+    """Check whether equivalent positions have the same canonical form."""
+    transformed = [
+        ('w' if c == 'b' else 'b', transform_point(p, 9, symmetry))
+        for c, p in STONES
+    ]
+    assert canonical_position(transformed, 9, 'w') == \
+        canonical_position(STONES, 9, 'b')
+    assert position_hash(transformed, 9, 'w') == position_hash(STONES, 9, 'b')
+
+
+def test_different_positions():
+    """Check whether different positions get different hashes."""
+    assert position_hash(STONES, 9) != position_hash(STONES[1:], 9)
+    assert position_hash(STONES, 9, 'b') != position_hash(STONES, 9, 'w')
+    assert position_hash(STONES, 9) != position_hash(STONES, 13)
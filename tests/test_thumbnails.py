@@ -0,0 +1,71 @@
+import time
+from tempfile import mkdtemp
+
+import pytest
+from gomill import sgf, sgf_moves
+from path import path
+from PIL import Image
+
+from resources.lib.problems import MockProblems
+from resources.lib.thumbnails import (
+    ThumbnailCache, make_thumbnail, render_thumbnail, thumbnail_name,
+    BOARD_COLOUR,
+)
+
+
+@pytest.yield_fixture
+def tmpdir():
+    directory = path(mkdtemp())
+    yield directory
+    directory.rmtree_p()
+
+
+@pytest.fixture
+def problem_file(tmpdir):
+    problem_file = tmpdir / 'problem.sgf'
+    problem_file.write_text(MockProblems.sgf3)
+    return problem_file
+
+
+def test_render_thumbnail():
+    """Check whether only the area around the stones is drawn."""
+    board, _ = sgf_moves.get_setup_and_moves(
+        sgf.Sgf_game.from_string(MockProblems.sgf3))
+    image = render_thumbnail(board, 64)
+    assert image.size == (64, 64)
+    # the region is 9 rows high, so each point is 7 pixels wide
+    assert image.getpixel((0, 0)) == BOARD_COLOUR
+    assert image.getpixel((3, 10)) == (255, 255, 255)
+    assert image.getpixel((3, 24)) == (0, 0, 0)
+
+
+def test_make_thumbnail(tmpdir, problem_file):
+    """Check whether thumbnails get saved under the problem's hash."""
+    thumbnail_file = tmpdir / 'cache' / thumbnail_name(problem_file.bytes(), 32)
+    assert make_thumbnail((problem_file, tmpdir / 'cache', 32)) == \
+        (problem_file, thumbnail_file)
+    assert Image.open(thumbnail_file).size == (32, 32)
+
+    assert make_thumbnail((tmpdir / 'missing.sgf', tmpdir, 32))[1] is None
+
+
+def test_cache(tmpdir, problem_file):
+    """Check whether thumbnails get drawn in the background and cached."""
+    cache = ThumbnailCache(tmpdir / 'cache', size=32, threads=1)
+    try:
+        assert cache.get(problem_file) is None
+        for _ in xrange(100):
+            if not cache.pending:
+                break
+            time.sleep(0.05)
+        thumbnail_file = cache.get(problem_file)
+        assert thumbnail_file and path(thumbnail_file).exists()
+
+        # changing the problem means that a new thumbnail is needed
+        problem_file.write_text(MockProblems.sgf)
+        assert cache.get(problem_file) is None
+
+        # problems that were removed (or are on a server) have none
+        assert cache.get(tmpdir / '5_kyu' / 'missing.sgf') is None
+    finally:
+        cache.close()
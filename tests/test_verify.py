@@ -0,0 +1,50 @@
+import pytest
+
+from resources.lib import verify
+from resources.lib.problems import MockProblems
+
+
+def issues(sgf_string):
+    """Get the (issue, node) pairs of the given SGF."""
+    return sorted(
+        (issue['issue'], issue['node'])
+        for issue in verify.Verifier(sgf_string).verify()
+    )
+
+
+def test_valid_problem():
+    """Check whether correct problems don't have any issues."""
+    assert issues(MockProblems.sgf3) == []
+
+
+@pytest.mark.parametrize('sgf_string, expected', (
+    ('(;SZ[5]AB[ba];W[ba]C[RIGHT])', [
+        (verify.NO_SOLUTION, ''),
+        (verify.OCCUPIED, '0'),
+        (verify.UNREACHABLE_RIGHT, '0'),
+    ]),
+    ('(;SZ[5]AB[ba]AB[ab];W[aa]C[RIGHT])', [(verify.SUICIDE, '0')]),
+    ('(;SZ[5]AB[ba](;W[aa];W[cc]C[RIGHT])(;W[bb];B[cc]C[RIGHT]))', [
+        (verify.OUT_OF_TURN, '0.0'),
+        (verify.WRONG_PLAYER_RIGHT, '1.0'),
+    ]),
+    ('(;SZ[5]AB[ba]AB[ab]AB[bc]AW[ca]AW[bb]AW[db]AW[cc]'
+     ';B[cb];W[bb];B[ee]C[RIGHT])', [(verify.KO, '0.0')]),
+    ('(;SZ[5](;B[aa];W[bb])(;B[aa]C[RIGHT]))', [
+        (verify.DUPLICATE, '1'),
+        (verify.NO_SOLUTION, ''),
+        (verify.UNREACHABLE_RIGHT, '1'),
+    ]),
+))
+def test_broken_problems(sgf_string, expected):
+    """Check whether problems with issues get them all reported."""
+    assert issues(sgf_string) == expected
+
+
+def test_unloadable_problem(tmpdir):
+    """Check whether problems that can't be parsed are reported."""
+    problem = tmpdir.join('bad.sgf')
+    problem.write('this is not an SGF')
+    problem_file, result = verify.verify_problem(str(problem))
+    assert problem_file == str(problem)
+    assert [issue['issue'] for issue in result] == [verify.UNLOADABLE]